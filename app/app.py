@@ -2,12 +2,14 @@ from flask import Flask
 from flask_restful import Api
 from flask_jwt_extended import JWTManager
 from flask_mongoengine import MongoEngine
-import os
+from werkzeug.middleware.proxy_fix import ProxyFix
 from .config import Config
-from app.dashboard import dashboard
-from dotenv import load_dotenv
-
-load_dotenv()
+from .cache import init_cache
+from .logger import setup_logger
+from .metrics import command_listener, init_metrics
+from .passwords import init_hasher
+from .ratelimit import init_ratelimit
+from .identity import is_token_revoked
 
 jwt = JWTManager()
 db = MongoEngine()
@@ -28,6 +30,7 @@ def create_app() -> Flask:
     - **Authentification** :
         - `POST /register` : Inscription d'un nouvel utilisateur.
         - `POST /login` : Connexion et génération du token JWT.
+        - `POST /logout` : Révocation du token JWT courant.
     - **Gestion des auteurs** :
         - `GET /authors` : Récupérer tous les auteurs.
         - `GET /authors/<id>` : Récupérer un auteur spécifique.
@@ -37,48 +40,122 @@ def create_app() -> Flask:
         - `GET /books` : Récupérer tous les livres.
         - `GET /books/<id>` : Récupérer un livre spécifique.
         - `POST /books` : Ajouter un livre.
+        - `POST /books/bulk` : Import massif CSV/NDJSON (JWT requis).
         - `DELETE /books/<id>` : Supprimer un livre.
         - `GET /search/books` : Rechercher des livres par titre.
     - **Gestion des emprunts** :
         - `GET /borrow` : Récupérer tous les emprunts.
         - `GET /borrow/<id>` : Récupérer un emprunt spécifique.
-        - `POST /borrow` : Enregistrer un nouvel emprunt.
-        - `DELETE /borrow/<id>` : Supprimer un emprunt.
+        - `POST /borrow` : Enregistrer un nouvel emprunt (par défaut pour l'utilisateur authentifié).
+        - `POST /borrow/batch` : Emprunter une pile de livres (résultat par livre).
+        - `POST /borrow/returns` : Retourner une pile d'emprunts (résultat par emprunt).
+        - `DELETE /borrow/<id>` : Retourner un emprunt (conservé avec sa `date_retour`).
+    - **Portail usager** :
+        - `GET /users/<id>/borrows?status=active|returned&since=...` : Emprunts de l'utilisateur (JWT requis).
+    - **Statistiques** (agrégats précalculés, voir `app.stats`) :
+        - `GET /stats/books/top` : Livres les plus empruntés.
+        - `GET /stats/users/active` : Utilisateurs ayant le plus d'emprunts en cours.
+        - `GET /stats/overdue` : Emprunts en retard.
+        - `GET /stats/authors/monthly` : Emprunts par auteur et par mois.
     - **Tableau de bord** :
         - `GET /dashboard` : Accéder à une interface web pour suivre les logs.
+        - `GET /dashboard/cache` : Compteurs du cache (hits, misses, évictions).
+        - `GET /dashboard/stats` : Synthèse de circulation (agrégats précalculés).
+    - **Observabilité** :
+        - `GET /metrics` : Histogrammes par endpoint et commandes MongoDB (format Prometheus).
+        - `?profile=1` sur n'importe quelle route : rapport cProfile (si `PROFILING=true`).
+
+    Toutes les routes (sauf `/metrics`) sont soumises à la limitation de débit
+    par client et au délestage des requêtes coûteuses (voir `app.ratelimit`) :
+    `429` ou `503` avec `Retry-After`.
+    - **Export** :
+        - `GET /export/<collection>` : Export NDJSON en streaming (JWT requis).
+
+    Commandes CLI :
+    - `flask --app run ensure-indexes` : Construit les index MongoDB et signale
+      les index manquants ou inutilisés.
+    - `flask --app run export <collection> -o fichier.ndjson.gz` : Export NDJSON.
+    - `flask --app run import-books fichier.csv` : Import massif de livres.
+    - `flask --app run reconcile-counters` : Répare les compteurs de disponibilité des livres.
+    - `flask --app run refresh-stats` : Rafraîchit les statistiques de circulation.
+    - `flask --app run send-reminders` : Envoie les relances des emprunts en retard.
 
     Returns:
         Flask: Une instance de l'application Flask configurée.
     """
     app = Flask(__name__)
+    setup_logger()
 
-    # Configuration de l'application
-    print(f"SECRET_KEY: {os.getenv('SECRET_KEY')}")
-    print(f"JWT_SECRET_KEY: {os.getenv('JWT_SECRET_KEY')}")
-    print(f"MONGODB_URI: {os.getenv('MONGODB_URI')}")
+    # Configuration de l'application (la connexion MongoDB n'est ouverte qu'à la première requête)
     app.config["SECRET_KEY"] = Config.SECRET_KEY
     app.config["JWT_SECRET_KEY"] = Config.JWT_SECRET_KEY
-    app.config["MONGODB_SETTINGS"] = {"host": Config.MONGODB_URI}
+    app.config["MONGODB_SETTINGS"] = dict(Config.MONGODB_SETTINGS, event_listeners=[command_listener])
+    app.config["CACHE_BACKEND"] = Config.CACHE_BACKEND
+    app.config["CACHE_TTL"] = Config.CACHE_TTL
+    app.config["CACHE_MAX_ENTRIES"] = Config.CACHE_MAX_ENTRIES
+    app.config["CACHE_REDIS_URL"] = Config.CACHE_REDIS_URL
+    app.config["PROFILING"] = Config.PROFILING
+    app.config["PASSWORD_HASH_METHOD"] = Config.PASSWORD_HASH_METHOD
+    app.config["PASSWORD_SALT_LENGTH"] = Config.PASSWORD_SALT_LENGTH
+    app.config["HASH_WORKERS"] = Config.HASH_WORKERS
+    app.config["HASH_QUEUE_SIZE"] = Config.HASH_QUEUE_SIZE
+    for key in ("RATE_LIMIT_ENABLED", "RATE_LIMIT_BACKEND", "RATE_LIMIT_REDIS_URL", "RATE_LIMIT_CAPACITY",
+                "RATE_LIMIT_REFILL_PER_SECOND", "RATE_LIMIT_MAX_KEYS", "RATE_LIMIT_COSTS",
+                "RATE_LIMIT_EXPENSIVE_COST", "MAX_EXPENSIVE_IN_FLIGHT"):
+        app.config[key] = getattr(Config, key)
     # Initialisation des extensions
     db.init_app(app)
     jwt.init_app(app)
+    jwt.token_in_blocklist_loader(is_token_revoked)
+    init_cache(app)
+    init_metrics(app)
+    init_hasher(app)
+    init_ratelimit(app)
+    if Config.PROXY_FIX_X_FOR:
+        # Derrière un reverse proxy : `remote_addr` (clé de limitation des clients anonymes) vient de `X-Forwarded-For`
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.PROXY_FIX_X_FOR)
 
     # Initialisation de l'API RESTful
     api = Api(app)
 
     # Importation des ressources API
-    from .resources import AuthorResource, BookResource, BorrowResource, BookSearchResource
-    from .auth import UserRegister, UserLogin
+    from .resources import (
+        AuthorResource, BookResource, BookBulkResource, BorrowResource, BorrowBatchResource, BorrowReturnsResource,
+        BookSearchResource, StatsResource, UserBorrowsResource,
+    )
+    from .auth import UserRegister, UserLogin, UserLogout
 
     # Ajout des endpoints à l'API
     api.add_resource(UserRegister, "/register")
     api.add_resource(UserLogin, "/login")
+    api.add_resource(UserLogout, "/logout")
     api.add_resource(AuthorResource, "/authors", "/authors/<string:id>")
+    api.add_resource(BookBulkResource, "/books/bulk")
     api.add_resource(BookResource, "/books", "/books/<string:id>")
+    api.add_resource(BorrowBatchResource, "/borrow/batch")
+    api.add_resource(BorrowReturnsResource, "/borrow/returns")
     api.add_resource(BorrowResource, "/borrow", "/borrow/<string:id>")
+    api.add_resource(UserBorrowsResource, "/users/<string:id>/borrows")
+    api.add_resource(StatsResource, "/stats/<path:report>")
     api.add_resource(BookSearchResource, "/search/books") #search/books?titre=Les Misérables
 
     # Enregistrement du Blueprint pour le tableau de bord
+    from .dashboard import dashboard
+    from .export import export
     app.register_blueprint(dashboard, url_prefix="/dashboard")
+    app.register_blueprint(export, url_prefix="/export")
+
+    # Commandes de maintenance (`flask --app run <commande>`)
+    from .commands import (
+        dedupe_users_command, ensure_indexes_command, export_command, import_books_command, reconcile_counters_command,
+        refresh_stats_command, send_reminders_command,
+    )
+    app.cli.add_command(ensure_indexes_command)
+    app.cli.add_command(dedupe_users_command)
+    app.cli.add_command(export_command)
+    app.cli.add_command(import_books_command)
+    app.cli.add_command(reconcile_counters_command)
+    app.cli.add_command(refresh_stats_command)
+    app.cli.add_command(send_reminders_command)
 
     return app
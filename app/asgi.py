@@ -0,0 +1,494 @@
+import asyncio
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+import jwt as pyjwt
+from bson import ObjectId
+from pymongo import AsyncMongoClient, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+from app.config import Config
+from app.cache import LRUCache
+from app.circulation import give_back, lend
+from app.identity import user_claims
+from app.logger import get_logger
+from app.models import Author, Book, Borrow, User, CollectionVersion, RevokedToken, due_date
+from app.passwords import HashingBusy, PasswordHasher
+from app.utils import serialize_raw, dumps, duplicates_pipeline, encode_cursor, decode_cursor, parse_fields
+
+logger = get_logger()
+
+# Durée de validité par défaut des tokens de flask_jwt_extended
+ACCESS_TOKEN_EXPIRES = timedelta(minutes=15)
+
+
+def json_response(data, status=200, headers=None):
+    """ Réponse JSON encodée avec `app.utils.dumps` (orjson si installé) """
+    return Response(dumps(data), status_code=status, media_type="application/json", headers=headers)
+
+
+def busy_response():
+    return json_response(
+        {"message": "Serveur surchargé, réessayez dans quelques instants"}, 503, headers={"Retry-After": "1"}
+    )
+
+
+def _object_id(value):
+    """ Convertit un identifiant en ObjectId, ou None s'il est invalide """
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+def _collection(request, model):
+    return request.app.state.db[model._get_collection_name()]
+
+
+async def ensure_indexes(db):
+    """
+    Crée les index déclarés dans `meta["indexes"]` (unicité, texte), comme `flask ensure-indexes`.
+    Un index unique bloqué par des doublons est signalé sans empêcher le démarrage.
+    """
+    for model in (User, Author, Book, Borrow, RevokedToken):
+        collection = db[model._get_collection_name()]
+        for spec in model._meta["index_specs"]:
+            options = {k: v for k, v in spec.items() if k != "fields"}
+            try:
+                await collection.create_index(spec["fields"], background=True, **options)
+            except DuplicateKeyError:
+                fields = [field for field, _ in spec["fields"]]
+                duplicates = await (await collection.aggregate(duplicates_pipeline(fields))).to_list()
+                logger.error("Index unique %s.%s impossible, valeurs en double : %s",
+                             collection.name, "_".join(fields), [d["_id"] for d in duplicates])
+
+
+async def bump_version(request, namespace):
+    """ Incrémente la version d'un espace, comme `app.versions.bump_version` (ETag de l'API synchrone) """
+    now = datetime.utcnow()
+    await _collection(request, CollectionVersion).update_one(
+        {"_id": namespace}, {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True
+    )
+
+
+# --- JWT (compatible flask_jwt_extended) ---
+
+def create_access_token(identity, additional_claims=None):
+    """ Crée un token d'accès avec les mêmes claims que `flask_jwt_extended.create_access_token` """
+    now = datetime.now(timezone.utc)
+    claims = {
+        **(additional_claims or {}),
+        "fresh": False,
+        "iat": now,
+        "jti": str(uuid.uuid4()),
+        "type": "access",
+        "sub": identity,
+        "nbf": now,
+        "exp": now + ACCESS_TOKEN_EXPIRES,
+    }
+    return pyjwt.encode(claims, Config.JWT_SECRET_KEY, algorithm="HS256")
+
+
+async def is_token_revoked(request, jti):
+    """ Révocation d'un token, lue en base au plus une fois par `CACHE_TTL` (comme `app.identity`) """
+    revoked = request.app.state.revoked.get(jti)
+    if revoked is None:
+        revoked = await _collection(request, RevokedToken).find_one({"_id": jti}, {"_id": 1}) is not None
+        request.app.state.revoked.set(jti, revoked)
+    return revoked
+
+
+def jwt_required(handler):
+    """ Équivalent asynchrone de `@jwt_required()` : mêmes codes et messages d'erreur """
+    @wraps(handler)
+    async def wrapper(request):
+        header = request.headers.get("Authorization", "")
+        if not header.startswith("Bearer "):
+            return json_response({"msg": "Missing Authorization Header"}, 401)
+        try:
+            claims = pyjwt.decode(header[7:], Config.JWT_SECRET_KEY, algorithms=["HS256"])
+        except pyjwt.ExpiredSignatureError:
+            return json_response({"msg": "Token has expired"}, 401)
+        except pyjwt.InvalidTokenError as e:
+            return json_response({"msg": str(e)}, 422)
+        if claims.get("type") != "access":
+            return json_response({"msg": "Only non-refresh tokens are allowed"}, 422)
+        if await is_token_revoked(request, claims["jti"]):
+            return json_response({"msg": "Token has been revoked"}, 401)
+        request.state.identity = claims["sub"]
+        request.state.claims = claims
+        return await handler(request)
+    return wrapper
+
+
+async def parse_body(request, **required):
+    """
+    Lit le corps JSON et vérifie les champs obligatoires, comme `reqparse`.
+
+    Args:
+        required: Champ -> message d'aide renvoyé s'il est absent.
+
+    Returns:
+        tuple: (données, réponse d'erreur 400 ou None).
+    """
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    if not isinstance(data, dict):
+        data = {}
+    for field, help in required.items():
+        if data.get(field) in (None, ""):
+            return data, json_response({"message": {field: help}}, 400)
+    return data, None
+
+
+async def paginated(request, model, query=None):
+    """ Liste paginée par curseur sur `_id`, mêmes paramètres que `paginated_response` """
+    params = request.query_params
+    try:
+        limit = max(1, min(int(params.get("limit", Config.PAGE_SIZE)), Config.PAGE_SIZE_MAX))
+        query = dict(query or {})
+        if params.get("cursor"):
+            last_id = decode_cursor(params["cursor"])[0]
+            if not isinstance(last_id, ObjectId):
+                raise ValueError("Curseur invalide")
+            query["_id"] = {"$gt": last_id}
+        fields = parse_fields(model, params.get("fields"))
+    except ValueError as e:
+        return json_response({"message": str(e)}, 400)
+
+    projection = {model._fields[f].db_field: 1 for f in fields} if fields else None
+    cursor = _collection(request, model).find(query, projection).sort("_id", 1).limit(limit + 1)
+    page = await cursor.to_list(None)
+
+    headers = {}
+    if len(page) > limit:
+        page = page[:limit]
+        headers["X-Next-Cursor"] = encode_cursor([page[-1]["_id"]])
+    return json_response(serialize_raw(model, page), headers=headers)
+
+
+async def get_one(request, model, message):
+    object_id = _object_id(request.path_params["id"])
+    doc = await _collection(request, model).find_one({"_id": object_id}) if object_id else None
+    if doc is None:
+        return json_response({"message": message}, 404)
+    return json_response(serialize_raw(model, [doc])[0])
+
+
+# --- Authentification ---
+
+async def register(request):
+    data, error = await parse_body(
+        request,
+        username="Le nom d'utilisateur est obligatoire",
+        password="Le mot de passe est obligatoire",
+        email="L'adresse e-mail est obligatoire",
+    )
+    if error:
+        return error
+    try:
+        password = await asyncio.wrap_future(request.app.state.hasher.submit_hash(data["password"]))
+    except HashingBusy:
+        return busy_response()
+    try:
+        await _collection(request, User).insert_one(
+            {"username": data["username"], "password": password, "email": data["email"]}
+        )
+    except DuplicateKeyError:
+        return json_response({"message": "Utilisateur déjà existant"}, 400)
+    return json_response({"message": "Inscription réussie"}, 201)
+
+
+async def login(request):
+    data, error = await parse_body(
+        request,
+        email="L'adresse e-mail est obligatoire",
+        username="Le nom d'utilisateur est requis",
+        password="Le mot de passe est requis",
+    )
+    if error:
+        return error
+    users = _collection(request, User)
+    user = await users.find_one({"email": data["email"]}, {"username": 1, "email": 1, "password": 1})
+    if not user or user["username"] != data["username"]:
+        return json_response({"message": "Identifiants invalides"}, 401)
+
+    hasher = request.app.state.hasher
+    try:
+        if not await asyncio.wrap_future(hasher.submit_verify(user["password"], data["password"])):
+            return json_response({"message": "Identifiants invalides"}, 401)
+    except HashingBusy:
+        return busy_response()
+
+    if hasher.needs_rehash(user["password"]):
+        try:
+            password = await asyncio.wrap_future(hasher.submit_hash(data["password"]))
+            await users.update_one({"_id": user["_id"], "password": user["password"]}, {"$set": {"password": password}})
+        except HashingBusy:
+            pass  # Recalcul reporté à une prochaine connexion
+    return json_response({"access_token": create_access_token(str(user["_id"]), user_claims(user))}, 200)
+
+
+@jwt_required
+async def logout(request):
+    """ Révoque le token courant jusqu'à son expiration, comme `UserLogout.post` """
+    claims = request.state.claims
+    expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc).replace(tzinfo=None)
+    await _collection(request, RevokedToken).update_one(
+        {"_id": claims["jti"]}, {"$set": {"expires_at": expires_at}}, upsert=True
+    )
+    request.app.state.revoked.set(claims["jti"], True)
+    return json_response({"message": "Déconnexion réussie"}, 200)
+
+
+# --- Auteurs ---
+
+async def list_authors(request):
+    return await paginated(request, Author)
+
+
+async def get_author(request):
+    return await get_one(request, Author, "Auteur non trouvé")
+
+
+@jwt_required
+async def create_author(request):
+    data, error = await parse_body(request, nom="Le nom est obligatoire", prenom="Le prénom est obligatoire")
+    if error:
+        return error
+    result = await _collection(request, Author).insert_one({"nom": data["nom"], "prenom": data["prenom"]})
+    await bump_version(request, "authors")
+    return json_response({"message": "Auteur ajouté", "id": str(result.inserted_id)}, 201)
+
+
+@jwt_required
+async def delete_author(request):
+    object_id = _object_id(request.path_params["id"])
+    result = await _collection(request, Author).delete_one({"_id": object_id}) if object_id else None
+    if not result or not result.deleted_count:
+        return json_response({"message": "Auteur non trouvé"}, 404)
+    await bump_version(request, "authors")
+    return json_response({"message": "Auteur supprimé"}, 200)
+
+
+# --- Livres ---
+
+async def list_books(request):
+    return await paginated(request, Book)
+
+
+async def get_book(request):
+    return await get_one(request, Book, "Livre non trouvé")
+
+
+@jwt_required
+async def create_book(request):
+    data, error = await parse_body(
+        request,
+        titre="Le titre est obligatoire",
+        auteur_id="L'ID de l'auteur est obligatoire",
+        stock="Le stock est obligatoire",
+    )
+    if error:
+        return error
+    try:
+        stock = int(data["stock"])
+    except (TypeError, ValueError):
+        return json_response({"message": {"stock": "Le stock est obligatoire"}}, 400)
+
+    auteur_id = _object_id(data["auteur_id"])
+    if not auteur_id or not await _collection(request, Author).find_one({"_id": auteur_id}, {"_id": 1}):
+        return json_response({"message": "Auteur non trouvé"}, 404)
+    result = await _collection(request, Book).insert_one(
+        {"titre": data["titre"], "auteur": auteur_id, "stock": stock, "exemplaires": stock, "en_pret": 0}
+    )
+    await bump_version(request, "books")
+    return json_response({"message": "Livre ajouté", "id": str(result.inserted_id)}, 201)
+
+
+@jwt_required
+async def delete_book(request):
+    object_id = _object_id(request.path_params["id"])
+    result = await _collection(request, Book).delete_one({"_id": object_id}) if object_id else None
+    if not result or not result.deleted_count:
+        return json_response({"message": "Livre non trouvé"}, 404)
+    await bump_version(request, "books")
+    return json_response({"message": "Livre supprimé"}, 200)
+
+
+async def search_books(request):
+    """ Recherche plein texte par titre et/ou auteur, comme `BookSearchResource` """
+    params = request.query_params
+    titre, auteur = params.get("titre"), params.get("auteur")
+    if not titre and not auteur:
+        return json_response({"message": "Le titre ou l'auteur est obligatoire pour la recherche"}, 400)
+    try:
+        limit = max(1, min(int(params.get("limit", Config.PAGE_SIZE)), Config.PAGE_SIZE_MAX))
+        # Curseur : rang (tri par pertinence) ou dernier `_id` (tri par `_id`)
+        position = decode_cursor(params["cursor"])[0] if params.get("cursor") else None
+        offset = 0
+        if titre:
+            offset = position or 0
+            if not isinstance(offset, int) or offset < 0:
+                raise ValueError("Curseur invalide")
+        elif position is not None and not isinstance(position, ObjectId):
+            raise ValueError("Curseur invalide")
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+
+    query, projection, sort = {}, None, [("_id", 1)]
+    headers = {}
+    if auteur:
+        score = {"score": {"$meta": "textScore"}}
+        auteurs = _collection(request, Author).find({"$text": {"$search": auteur}}, score)
+        auteurs = await auteurs.sort([("score", {"$meta": "textScore"}), ("_id", 1)]).limit(
+            Config.SEARCH_AUTHORS_MAX + 1
+        ).to_list(None)
+        if len(auteurs) > Config.SEARCH_AUTHORS_MAX:
+            headers["X-Authors-Truncated"] = "true"
+        query["auteur"] = {"$in": [a["_id"] for a in auteurs[:Config.SEARCH_AUTHORS_MAX]]}
+    if titre:
+        # Le score n'est pas filtrable : pagination par rang, départagée par `_id`
+        query["$text"] = {"$search": titre}
+        projection = {"score": {"$meta": "textScore"}}
+        sort = [("score", {"$meta": "textScore"}), ("_id", 1)]
+    elif position is not None:
+        query["_id"] = {"$gt": position}
+
+    cursor = _collection(request, Book).find(query, projection).sort(sort).skip(offset).limit(limit + 1)
+    page = await cursor.to_list(None)
+    if not page:
+        return json_response({"message": "Aucun livre trouvé"}, 404)
+
+    if len(page) > limit:
+        page = page[:limit]
+        headers["X-Next-Cursor"] = encode_cursor([offset + limit if titre else page[-1]["_id"]])
+    return json_response(serialize_raw(Book, page), headers=headers)
+
+
+# --- Emprunts ---
+
+async def list_borrows(request):
+    return await paginated(request, Borrow)
+
+
+async def get_borrow(request):
+    return await get_one(request, Borrow, "Emprunt non trouvé")
+
+
+@jwt_required
+async def create_borrow(request):
+    """ Emprunt avec décrément atomique du stock, comme `BorrowResource.post` """
+    data, error = await parse_body(request, book_id="L'ID du livre est obligatoire")
+    if error:
+        return error
+
+    # Utilisateur du token (claims, sinon relu depuis son identité comme
+    # `load_user_record`), ou utilisateur dont l'e-mail est fourni
+    claims = request.state.claims
+    users = _collection(request, User)
+    if claims.get("email"):
+        user = {"_id": _object_id(claims["sub"]), "email": claims["email"]}
+    else:
+        user_id = _object_id(claims.get("sub"))
+        user = await users.find_one({"_id": user_id}, {"_id": 1, "email": 1}) if user_id else None
+    if data.get("email") and (not user or data["email"] != user.get("email")):
+        user = await users.find_one({"email": data["email"]}, {"_id": 1})
+        if not user:
+            return json_response({"message": "Utilisateur non trouvé"}, 404)
+    elif not user or user["_id"] is None:
+        return json_response({"message": {"email": "L'email de l'utilisateur est obligatoire"}}, 400)
+
+    books = _collection(request, Book)
+    book_id = _object_id(data["book_id"])
+    book = await books.find_one_and_update(
+        {"_id": book_id, "stock": {"$gt": 0}}, lend(),
+        projection={"_id": 1}, return_document=ReturnDocument.AFTER,
+    ) if book_id else None
+    if book is None:
+        if not book_id or not await books.find_one({"_id": book_id}, {"_id": 1}):
+            return json_response({"message": "Utilisateur ou livre non trouvé"}, 404)
+        return json_response({"message": "Livre non disponible"}, 400)
+
+    now = datetime.utcnow()
+    try:
+        result = await _collection(request, Borrow).insert_one(
+            {"user": user["_id"], "book": book_id, "date_emprunt": now, "date_echeance": due_date(now), "date_retour": None}
+        )
+    except Exception:
+        await books.update_one({"_id": book_id}, give_back())
+        raise
+    finally:
+        await bump_version(request, "books")
+    return json_response({"message": "Emprunt enregistré avec succès", "borrow_id": str(result.inserted_id)}, 201)
+
+
+@jwt_required
+async def delete_borrow(request):
+    """ Retour d'un emprunt, atomique comme `BorrowResource.delete` """
+    object_id = _object_id(request.path_params["id"])
+    borrow = await _collection(request, Borrow).find_one_and_update(
+        {"_id": object_id, "date_retour": None}, {"$set": {"date_retour": datetime.utcnow()}},
+        projection={"book": 1, "date_retour": 1}, return_document=ReturnDocument.AFTER,
+    ) if object_id else None
+    if borrow is None:
+        return json_response({"message": "Emprunt non trouvé"}, 404)
+    await _collection(request, Book).update_one({"_id": borrow["book"]}, give_back())
+    await bump_version(request, "books")
+    return json_response({"message": "Livre retourné", "date_retour": borrow["date_retour"].isoformat()}, 200)
+
+
+routes = [
+    Route("/register", register, methods=["POST"]),
+    Route("/login", login, methods=["POST"]),
+    Route("/logout", logout, methods=["POST"]),
+    Route("/authors", list_authors, methods=["GET"]),
+    Route("/authors", create_author, methods=["POST"]),
+    Route("/authors/{id}", get_author, methods=["GET"]),
+    Route("/authors/{id}", delete_author, methods=["DELETE"]),
+    Route("/books", list_books, methods=["GET"]),
+    Route("/books", create_book, methods=["POST"]),
+    Route("/books/{id}", get_book, methods=["GET"]),
+    Route("/books/{id}", delete_book, methods=["DELETE"]),
+    Route("/search/books", search_books, methods=["GET"]),
+    Route("/borrow", list_borrows, methods=["GET"]),
+    Route("/borrow", create_borrow, methods=["POST"]),
+    Route("/borrow/{id}", get_borrow, methods=["GET"]),
+    Route("/borrow/{id}", delete_borrow, methods=["DELETE"]),
+]
+
+
+def create_asgi_app(client=None):
+    """
+    Crée la variante ASGI asynchrone de l'API (Starlette + client MongoDB
+    asynchrone de pymongo).
+
+    Expose les mêmes URL et la même sémantique JWT que `create_app` pour
+    l'authentification, les auteurs, les livres, la recherche et les emprunts,
+    mais chaque requête libère la boucle d'événements pendant les accès à
+    MongoDB : un seul processus garde des milliers de requêtes en vol.
+
+    Lancement :
+        uvicorn --factory app.asgi:create_asgi_app --workers 4
+
+    Args:
+        client: Client MongoDB asynchrone à utiliser (créé depuis `Config.MONGODB_URI` sinon).
+    """
+    @asynccontextmanager
+    async def lifespan(app):
+        settings = {k: v for k, v in Config.MONGODB_SETTINGS.items() if k not in ("host", "connect")}
+        mongo = client or AsyncMongoClient(Config.MONGODB_URI, **settings)
+        app.state.db = mongo.get_default_database("library")
+        app.state.revoked = LRUCache(max_entries=Config.CACHE_MAX_ENTRIES, ttl=Config.CACHE_TTL)
+        app.state.hasher = PasswordHasher(
+            Config.PASSWORD_HASH_METHOD, Config.PASSWORD_SALT_LENGTH, Config.HASH_WORKERS, Config.HASH_QUEUE_SIZE
+        )
+        await ensure_indexes(app.state.db)
+        yield
+        app.state.hasher.shutdown()
+        if client is None:
+            await mongo.close()
+
+    return Starlette(routes=routes, lifespan=lifespan)
@@ -1,7 +1,15 @@
 from flask_restful import Resource, reqparse
-from flask_jwt_extended import create_access_token
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask_jwt_extended import create_access_token, get_jwt, jwt_required
+from mongoengine.errors import NotUniqueError
+from app.logger import get_logger
+from app.identity import revoke_token, user_claims
 from app.models import User
+from app.passwords import HashingBusy, get_hasher
+
+logger = get_logger()
+
+# Réponse renvoyée quand le pool de hachage est saturé
+BUSY = {"message": "Serveur surchargé, réessayez dans quelques instants"}, 503, {"Retry-After": "1"}
 
 
 class UserRegister(Resource):
@@ -15,19 +23,22 @@ class UserRegister(Resource):
     - **POST `/register`** : Inscrit un nouvel utilisateur.
 
     Erreurs possibles :
-    - 400 : Si le `username` existe déjà.
+    - 400 : Si le `username` ou l'`email` existe déjà.
+    - 503 : Si le pool de hachage des mots de passe est saturé.
     """
 
     def post(self):
         """
         Inscrit un nouvel utilisateur.
 
-        Reçoit un `username` et un `password`, vérifie si l'utilisateur existe déjà, et stocke
-        les informations après hachage du mot de passe.
+        Reçoit un `username` et un `password` et stocke les informations après hachage du
+        mot de passe. L'unicité est garantie par les index uniques (`username`, `email`) :
+        l'insertion échoue atomiquement si l'utilisateur existe déjà.
 
         Retour :
         - 201 : Succès, utilisateur créé.
         - 400 : Utilisateur déjà existant.
+        - 503 : Pool de hachage saturé.
         """
         parser = reqparse.RequestParser()
         parser.add_argument("username", required=True, help="Le nom d'utilisateur est obligatoire")
@@ -35,13 +46,16 @@ class UserRegister(Resource):
         parser.add_argument("email", required=True, help="L'adresse e-mail est obligatoire")
         args = parser.parse_args()
 
-        # Vérifie si l'utilisateur existe déjà
-        if User.objects(username=args["username"]):
-            return {"message": "Utilisateur déjà existant"}, 400
+        try:
+            password = get_hasher().hash(args["password"])
+        except HashingBusy:
+            return BUSY
 
-        # Crée un nouvel utilisateur avec un mot de passe haché
-        user = User(username=args["username"], password=generate_password_hash(args["password"]), email=args["email"])
-        user.save()
+        # Insertion directe : un doublon est rejeté par l'index unique
+        try:
+            User(username=args["username"], password=password, email=args["email"]).save(force_insert=True)
+        except NotUniqueError:
+            return {"message": "Utilisateur déjà existant"}, 400
         return {"message": "Inscription réussie"}, 201
 
 
@@ -57,6 +71,7 @@ class UserLogin(Resource):
 
     Erreurs possibles :
     - 401 : Identifiants incorrects.
+    - 503 : Si le pool de hachage des mots de passe est saturé.
     """
 
     def post(self):
@@ -64,10 +79,13 @@ class UserLogin(Resource):
         Authentifie un utilisateur.
 
         Vérifie l'`email`, le `username` et le `password`, et retourne un **JWT** si les informations sont correctes.
+        Si le hash stocké a été produit avec d'anciens paramètres (`PASSWORD_HASH_METHOD`),
+        il est recalculé avec les paramètres actuels.
 
         Retour :
         - 200 : Succès, retourne un token JWT.
         - 401 : Identifiants invalides.
+        - 503 : Pool de hachage saturé.
         """
         parser = reqparse.RequestParser()
         parser.add_argument("email", required=True, help="L'adresse e-mail est obligatoire")
@@ -75,11 +93,50 @@ class UserLogin(Resource):
         parser.add_argument("password", required=True, help="Le mot de passe est requis")
         args = parser.parse_args()
 
-        # Recherche de l'utilisateur en fonction de l'email et du username
-        user = User.objects(email=args["email"], username=args["username"]).first()
+        # Recherche par l'index unique sur l'email, le username est vérifié ensuite
+        users = User._get_collection()
+        user = users.find_one({"email": args["email"]}, {"username": 1, "email": 1, "password": 1})
+        if not user or user["username"] != args["username"]:
+            return {"message": "Identifiants invalides"}, 401
+
+        hasher = get_hasher()
+        try:
+            if not hasher.verify(user["password"], args["password"]):
+                return {"message": "Identifiants invalides"}, 401
+        except HashingBusy:
+            return BUSY
+
+        if hasher.needs_rehash(user["password"]):
+            try:
+                # Conditionnel : ne pas écraser un mot de passe modifié entre-temps
+                users.update_one(
+                    {"_id": user["_id"], "password": user["password"]},
+                    {"$set": {"password": hasher.hash(args["password"])}},
+                )
+                logger.info("Hash du mot de passe de l'utilisateur %s mis à jour", user["_id"])
+            except HashingBusy:
+                pass  # Recalcul reporté à une prochaine connexion
+
+        # La fiche de l'utilisateur est portée par le token (voir `current_user_record`)
+        access_token = create_access_token(identity=str(user["_id"]), additional_claims=user_claims(user))
+        return {"access_token": access_token}, 200
+
+
+class UserLogout(Resource):
+    """
+    API de déconnexion.
+
+    Endpoints :
+    - **POST `/logout`** : Révoque le token JWT utilisé jusqu'à son expiration.
+    """
 
-        if user and check_password_hash(user.password, args["password"]):
-            access_token = create_access_token(identity=str(user.id))
-            return {"access_token": access_token}, 200
+    @jwt_required()
+    def post(self):
+        """
+        Révoque le token courant : toute requête suivante avec ce token reçoit 401.
 
-        return {"message": "Identifiants invalides"}, 401
\ No newline at end of file
+        Retour :
+        - 200 : Token révoqué.
+        """
+        revoke_token(get_jwt())
+        return {"message": "Déconnexion réussie"}, 200
\ No newline at end of file
@@ -0,0 +1,168 @@
+import csv
+import io
+import json
+import time
+from itertools import islice
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+from app.logger import get_logger
+from app.models import Author, Book
+from app.versions import invalidate
+
+logger = get_logger()
+
+FORMATS = ("csv", "ndjson")
+
+
+def read_rows(stream, fmt):
+    """
+    Lit un flux binaire CSV (avec en-tête) ou NDJSON ligne par ligne.
+
+    Colonnes attendues : `titre`, `stock` et soit `auteur_id`, soit
+    `auteur_nom` + `auteur_prenom` (l'auteur est alors créé s'il n'existe pas).
+    Les lignes NDJSON illisibles sont transmises sous forme d'exception pour
+    être rapportées avec leur numéro de ligne.
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        yield from csv.DictReader(text)
+        return
+    for line in text:
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield e
+            continue
+        yield row if isinstance(row, dict) else ValueError("Objet JSON attendu")
+
+
+def _schema_error(e):
+    """ Résume une erreur de validation pydantic en une ligne """
+    return "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors())
+
+
+def _validate(row):
+    """
+    Valide une ligne avec `BookSchema` (et `AuthorSchema` si l'auteur est donné par son nom).
+
+    Returns:
+        tuple: (titre, stock, auteur_id ou None, (nom, prenom) ou None).
+    """
+    from app.schemas import AuthorSchema, BookSchema
+    if row.get("auteur_id"):
+        book = BookSchema(titre=row.get("titre"), auteur_id=row["auteur_id"], stock=row.get("stock"))
+        if not ObjectId.is_valid(book.auteur_id):
+            raise ValueError(f"auteur_id invalide : {book.auteur_id}")
+        return book.titre, book.stock, ObjectId(book.auteur_id), None
+    author = AuthorSchema(nom=row.get("auteur_nom"), prenom=row.get("auteur_prenom"))
+    book = BookSchema(titre=row.get("titre"), auteur_id="", stock=row.get("stock"))
+    return book.titre, book.stock, None, (author.nom, author.prenom)
+
+
+def _resolve_authors(names):
+    """
+    Résout des couples (nom, prénom) en identifiants d'auteurs : une requête
+    `$or` pour les auteurs existants, un `insert_many` pour les autres.
+
+    Returns:
+        tuple: (dict (nom, prénom) -> ObjectId, nombre d'auteurs créés).
+    """
+    if not names:
+        return {}, 0
+    collection = Author._get_collection()
+    query = {"$or": [{"nom": nom, "prenom": prenom} for nom, prenom in names]}
+    resolved = {(a["nom"], a["prenom"]): a["_id"] for a in collection.find(query, {"nom": 1, "prenom": 1})}
+    missing = [{"nom": nom, "prenom": prenom} for nom, prenom in names if (nom, prenom) not in resolved]
+    if missing:
+        result = collection.insert_many(missing, ordered=False)
+        for doc, author_id in zip(missing, result.inserted_ids):
+            resolved[(doc["nom"], doc["prenom"])] = author_id
+    return resolved, len(missing)
+
+
+def import_books(rows, chunk_size=1000, max_errors=1000):
+    """
+    Importe des livres par lots : validation, résolution groupée des auteurs
+    et écriture non ordonnée (`insert_many(ordered=False)`) par lots de
+    `chunk_size` lignes.
+
+    Args:
+        rows: Itérable de dictionnaires (voir `read_rows`).
+        chunk_size (int): Nombre de lignes par lot.
+        max_errors (int): Nombre maximal d'erreurs détaillées dans le rapport.
+
+    Returns:
+        dict: Rapport (`total`, `inserted`, `authors_created`, `errors` par
+        ligne, `duration`, `rows_per_second`).
+    """
+    # pydantic n'est chargé qu'au premier import, pas au démarrage de l'application
+    from pydantic import ValidationError as SchemaError
+
+    report = {"total": 0, "inserted": 0, "authors_created": 0, "error_count": 0, "errors": []}
+
+    def error(line, message):
+        report["error_count"] += 1
+        if len(report["errors"]) < max_errors:
+            report["errors"].append({"ligne": line, "erreur": message})
+
+    start = time.perf_counter()
+    numbered = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered, chunk_size))
+        if not chunk:
+            break
+        report["total"] += len(chunk)
+
+        # 1. Validation du lot
+        valid = []
+        for line, row in chunk:
+            if isinstance(row, Exception):
+                error(line, str(row))
+                continue
+            try:
+                valid.append((line, *_validate(row)))
+            except SchemaError as e:
+                error(line, _schema_error(e))
+            except ValueError as e:
+                error(line, str(e))
+
+        # 2. Résolution groupée des auteurs (par identifiant et par nom)
+        ids = {author_id for _, _, _, author_id, _ in valid if author_id}
+        known_ids = set(Author._get_collection().distinct("_id", {"_id": {"$in": list(ids)}})) if ids else set()
+        names = {name for _, _, _, _, name in valid if name}
+        by_name, created = _resolve_authors(names)
+        report["authors_created"] += created
+
+        # 3. Écriture non ordonnée du lot
+        docs, lines = [], []
+        for line, titre, stock, author_id, name in valid:
+            if author_id and author_id not in known_ids:
+                error(line, f"Auteur {author_id} non trouvé")
+                continue
+            docs.append({
+                "titre": titre, "auteur": author_id or by_name[name], "stock": stock, "exemplaires": stock, "en_pret": 0,
+            })
+            lines.append(line)
+        if not docs:
+            continue
+        try:
+            report["inserted"] += len(Book._get_collection().insert_many(docs, ordered=False).inserted_ids)
+        except BulkWriteError as e:
+            report["inserted"] += e.details["nInserted"]
+            for write_error in e.details["writeErrors"]:
+                error(lines[write_error["index"]], write_error["errmsg"])
+
+    if report["inserted"]:
+        invalidate("books")
+    if report["authors_created"]:
+        invalidate("authors")
+
+    report["duration"] = round(time.perf_counter() - start, 3)
+    report["rows_per_second"] = round(report["total"] / report["duration"]) if report["duration"] else report["total"]
+    logger.info(
+        "Import de livres : %s/%s lignes insérées, %s erreur(s), %s lignes/s",
+        report["inserted"], report["total"], report["error_count"], report["rows_per_second"],
+    )
+    return report
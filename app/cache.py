@@ -0,0 +1,210 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils import dumps
+
+
+class LRUCache:
+    """
+    Cache LRU en mémoire du processus, avec expiration (TTL) et thread-safe.
+
+    Attributs:
+    - max_entries (int) : Nombre maximal d'entrées avant éviction de la moins récemment utilisée
+    - ttl (int) : Durée de vie par défaut d'une entrée, en secondes
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        """ Retourne la valeur associée à `key`, ou None si absente ou expirée """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        """ Enregistre `value` pour `ttl` secondes (TTL par défaut sinon) """
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + (ttl or self.ttl))
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key):
+        """ Incrémente un compteur (jamais évincé) et retourne sa nouvelle valeur """
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._counters.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+            }
+
+
+class RedisCache:
+    """
+    Cache partagé entre processus, adossé à Redis (dépendance optionnelle `redis`).
+
+    Les valeurs sont stockées en JSON ; l'éviction est déléguée à la politique
+    `maxmemory-policy` du serveur Redis.
+    """
+
+    def __init__(self, url, ttl=60, prefix="library:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        if raw is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, dumps(value), ex=ttl or self.ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def counter(self, key):
+        return int(self.client.get(self.prefix + key) or 0)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+    def stats(self):
+        info = self.client.info("stats")
+        return {
+            "backend": "redis",
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": info.get("evicted_keys", 0),
+            "expirations": info.get("expired_keys", 0),
+        }
+
+
+class Cache:
+    """
+    Cache de lecture (read-through) des livres et auteurs.
+
+    - Les entrées unitaires sont indexées par `<espace>:item:<id>` et invalidées
+      individuellement.
+    - Les pages de liste sont indexées par une génération `<espace>:gen` :
+      invalider un espace incrémente sa génération, ce qui rend toutes ses
+      pages obsolètes en O(1), y compris sur un backend partagé.
+    - Si la version MongoDB de l'espace est connue (`app.versions`), elle est
+      ajoutée à la clé : une écriture traitée par un autre processus rend
+      donc aussi les entrées du cache local obsolètes.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def item(self, namespace, id, loader, version=None):
+        """ Retourne l'élément `id` depuis le cache, ou l'y charge via `loader()` """
+        key = f"{namespace}:item:{id}"
+        if version is not None:
+            key += f":v{version}"
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value)
+        return value
+
+    def put(self, namespace, id, value):
+        """ Enregistre directement l'élément `id` (lu ensuite par `item` sans version) """
+        self.backend.set(f"{namespace}:item:{id}", value)
+
+    def list(self, namespace, query_key, loader, version=None):
+        """ Retourne une page de liste depuis le cache, ou l'y charge via `loader()` """
+        generation = self.backend.counter(f"{namespace}:gen")
+        key = f"{namespace}:list:{generation}:{version}:{query_key}"
+        value = self.backend.get(key)
+        if value is None:
+            value = loader()
+            self.backend.set(key, value)
+        return value
+
+    def invalidate(self, namespace, id=None, ids=()):
+        """ Invalide les listes d'un espace et, si `id` (ou `ids`) est fourni, les éléments correspondants """
+        for item_id in ([id] if id is not None else []) + list(ids):
+            # L'entrée non versionnée ; les entrées versionnées deviennent inaccessibles
+            self.backend.delete(f"{namespace}:item:{item_id}")
+        self.backend.incr(f"{namespace}:gen")
+
+    def stats(self):
+        return self.backend.stats()
+
+
+def init_cache(app):
+    """
+    Crée le cache de l'application selon la configuration :
+    - `CACHE_BACKEND` : `memory` (par défaut) ou `redis`
+    - `CACHE_TTL` : durée de vie des entrées en secondes
+    - `CACHE_MAX_ENTRIES` : taille maximale du cache mémoire
+    - `CACHE_REDIS_URL` : URL du serveur Redis
+    """
+    if app.config["CACHE_BACKEND"] == "redis":
+        backend = RedisCache(app.config["CACHE_REDIS_URL"], ttl=app.config["CACHE_TTL"])
+    else:
+        backend = LRUCache(max_entries=app.config["CACHE_MAX_ENTRIES"], ttl=app.config["CACHE_TTL"])
+    app.extensions["cache"] = Cache(backend)
+    return app.extensions["cache"]
+
+
+def get_cache():
+    """ Retourne le cache de l'application courante """
+    return current_app.extensions["cache"]
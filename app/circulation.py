@@ -0,0 +1,318 @@
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+from app.config import Config
+from app.logger import get_logger
+from app.models import Book, Borrow, due_date
+from app.versions import invalidate
+from app.utils import decode_cursor, encode_cursor, keyset_after
+
+logger = get_logger()
+
+
+def _item(key, value, status, **extra):
+    return {key: value, "status": status, **extra}
+
+
+def lend(n=1):
+    """ Mise à jour des compteurs d'un livre dont `n` exemplaires partent en prêt """
+    return {"$inc": {"stock": -n, "en_pret": n}}
+
+
+def give_back(n=1):
+    """ Mise à jour des compteurs d'un livre dont `n` exemplaires reviennent de prêt """
+    return {"$inc": {"stock": n, "en_pret": -n}}
+
+
+def _restock(counts):
+    """ Remet en rayon les exemplaires des livres (`{book_id: quantité}`) en une écriture groupée """
+    if counts:
+        Book._get_collection().bulk_write(
+            [UpdateOne({"_id": book_id}, give_back(n)) for book_id, n in counts.items()],
+            ordered=False,
+        )
+
+
+def borrow_books(user_id, book_ids):
+    """
+    Emprunte une pile de livres pour un même utilisateur.
+
+    1. Une requête `$in` lit le stock de tous les livres : les livres
+       inexistants ou en rupture sont écartés sans aucune écriture.
+    2. Chaque livre restant est réservé par une mise à jour conditionnelle
+       (`stock >= n`, sans upsert) qui décrémente le stock et incrémente
+       `en_pret` d'autant d'exemplaires que demandés ; un résultat vide
+       signale un livre épuisé ou supprimé entre-temps. Une écriture par
+       livre distinct : une mise à jour groupée ne dirait pas lesquelles
+       ont échoué.
+    3. Un `insert_many` non ordonné crée les emprunts des livres réservés ;
+       le stock des emprunts non créés est restitué.
+
+    Args:
+        user_id (ObjectId): Emprunteur.
+        book_ids (list): Identifiants des livres, dans l'ordre de la pile
+            (un identifiant répété emprunte plusieurs exemplaires).
+
+    Returns:
+        list: Un résultat par livre (`book_id`, `status` HTTP, `borrow_id` ou `message`).
+    """
+    results = [None] * len(book_ids)
+    wanted = {}
+    for index, book_id in enumerate(book_ids):
+        if ObjectId.is_valid(book_id):
+            wanted.setdefault(ObjectId(book_id), []).append(index)
+        else:
+            results[index] = _item("book_id", book_id, 404, message="Livre non trouvé")
+
+    books = Book._get_collection()
+    stock = {doc["_id"]: doc.get("stock", 0) for doc in books.find({"_id": {"$in": list(wanted)}}, {"stock": 1})}
+    for book_id in [b for b in wanted if b not in stock]:
+        for index in wanted.pop(book_id):
+            results[index] = _item("book_id", book_ids[index], 404, message="Livre non trouvé")
+
+    order = list(wanted)
+    unavailable, errors = set(), set()
+    for book_id in order:
+        n = len(wanted[book_id])
+        if stock[book_id] < n:
+            unavailable.add(book_id)
+            continue
+        try:
+            if books.find_one_and_update({"_id": book_id, "stock": {"$gte": n}}, lend(n), projection={"_id": 1}) is None:
+                unavailable.add(book_id)
+        except PyMongoError as e:
+            logger.error("Erreur lors de la réservation du livre %s: %s", book_id, e)
+            errors.add(book_id)
+
+    docs, indexes = [], []
+    now = datetime.utcnow()
+    for book_id in order:
+        for index in wanted[book_id]:
+            if book_id in unavailable:
+                results[index] = _item("book_id", book_ids[index], 400, message="Livre non disponible")
+            elif book_id in errors:
+                results[index] = _item("book_id", book_ids[index], 500, message="Erreur serveur")
+            else:
+                docs.append({
+                    "_id": ObjectId(), "user": user_id, "book": book_id,
+                    "date_emprunt": now, "date_echeance": due_date(now), "date_retour": None,
+                })
+                indexes.append(index)
+
+    failed = set()
+    if docs:
+        try:
+            Borrow._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details["writeErrors"]}
+            _restock(Counter(docs[i]["book"] for i in failed))
+    for position, (doc, index) in enumerate(zip(docs, indexes)):
+        if position in failed:
+            results[index] = _item("book_id", book_ids[index], 500, message="Erreur serveur")
+        else:
+            results[index] = _item("book_id", book_ids[index], 201, borrow_id=str(doc["_id"]))
+
+    touched = [str(b) for b in order if b not in unavailable and b not in errors]
+    if touched:
+        invalidate("books", ids=touched)
+    logger.info("📚 Emprunt groupé : %s/%s livre(s) pour l'utilisateur %s", len(docs) - len(failed), len(book_ids), user_id)
+    return results
+
+
+def return_borrows(borrow_ids):
+    """
+    Retourne une pile d'emprunts.
+
+    1. Un `update_many` marque atomiquement les emprunts en cours comme
+       retournés (`date_retour`) en y inscrivant un identifiant de lot
+       (`lot_retour`) : un emprunt ne peut être retourné qu'une fois, même
+       par des lots concurrents.
+    2. Les emprunts retournés par ce lot sont lus en une requête, et les
+       compteurs de leurs livres sont mis à jour en un seul `bulk_write`.
+
+    Returns:
+        list: Un résultat par emprunt (`borrow_id`, `status` HTTP, `message`).
+    """
+    valid = [ObjectId(b) for b in borrow_ids if ObjectId.is_valid(b)]
+    lot = uuid.uuid4().hex
+    borrows = Borrow._get_collection()
+    claimed = {}
+    if valid:
+        borrows.update_many(
+            {"_id": {"$in": valid}, "date_retour": None},
+            {"$set": {"date_retour": datetime.utcnow(), "lot_retour": lot}},
+        )
+        claimed = {
+            doc["_id"]: doc["book"] for doc in borrows.find({"_id": {"$in": valid}, "lot_retour": lot}, {"book": 1})
+        }
+        _restock(Counter(claimed.values()))
+
+    results, returned = [], set()
+    for borrow_id in borrow_ids:
+        oid = ObjectId(borrow_id) if ObjectId.is_valid(borrow_id) else None
+        if oid in claimed and oid not in returned:
+            returned.add(oid)
+            results.append(_item("borrow_id", borrow_id, 200, message="Livre retourné"))
+        else:
+            results.append(_item("borrow_id", borrow_id, 404, message="Emprunt non trouvé"))
+
+    if claimed:
+        invalidate("books", ids=sorted({str(b) for b in claimed.values()}))
+    logger.info("📚 Retour groupé : %s/%s emprunt(s) (lot %s)", len(claimed), len(borrow_ids), lot)
+    return results
+
+
+# Statut -> (filtre, tri) de `user_borrows`, servis par l'index `(user, -date_retour,
+# -date_emprunt, -_id, book)` (avec statut) ou `(user, -date_emprunt, -_id, book, date_retour)`
+# (sans statut) ; `since` porte sur le premier champ trié.
+HISTORY = {
+    "active": ({"date_retour": None}, [("date_emprunt", -1), ("_id", -1)]),
+    "returned": ({"date_retour": {"$ne": None}}, [("date_retour", -1), ("date_emprunt", -1), ("_id", -1)]),
+    None: ({}, [("date_emprunt", -1), ("_id", -1)]),
+}
+HISTORY_FIELDS = {"_id": 1, "book": 1, "date_emprunt": 1, "date_retour": 1}
+
+
+def user_borrows(user_id, status=None, since=None, cursor=None, limit=50):
+    """
+    Page de l'historique des emprunts d'un utilisateur, du plus récent au plus ancien.
+
+    - `active` : emprunts en cours, triés par `date_emprunt` ;
+    - `returned` : emprunts retournés, triés par `date_retour` ;
+    - sans statut : tous les emprunts, triés par `date_emprunt`.
+
+    Chaque page est une plage bornée d'un index trié comme elle, sans tri en
+    mémoire : `(user, date_retour, date_emprunt, _id, book)` avec statut,
+    `(user, date_emprunt, _id, book, date_retour)` sans statut (pagination par
+    curseur, projection compacte), quel que soit le volume total d'emprunts.
+
+    Args:
+        user_id (ObjectId): Utilisateur.
+        status (str): `active`, `returned` ou None.
+        since (datetime): Ne retourne que les emprunts (ou retours) postérieurs à cette date.
+        cursor (str): Curseur opaque renvoyé par la page précédente.
+        limit (int): Taille de la page.
+
+    Returns:
+        tuple: (documents BSON bruts de la page, curseur suivant ou None).
+
+    Raises:
+        ValueError: Si le curseur est invalide.
+    """
+    condition, sort = HISTORY[status]
+    query = {"user": user_id, **condition}
+    if since:
+        query[sort[0][0]] = dict(query.get(sort[0][0]) or {}, **{"$gte": since})
+    if cursor:
+        query = {"$and": [query, keyset_after(sort, decode_cursor(cursor))]}
+
+    page = list(Borrow._get_collection().find(query, HISTORY_FIELDS).sort(sort).limit(limit + 1))
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor([page[-1].get(field) for field, _ in sort])
+    return page, next_cursor
+
+
+def _active_loans(borrows, book_ids):
+    """ Nombre d'emprunts en cours par livre, en une agrégation sur l'index `(book, date_retour)` """
+    return {row["_id"]: row["n"] for row in borrows.aggregate([
+        {"$match": {"book": {"$in": book_ids}, "date_retour": None}},
+        {"$group": {"_id": "$book", "n": {"$sum": 1}}},
+    ])}
+
+
+def _expected_counters(before, en_pret):
+    """ Compteurs attendus d'un livre ayant `en_pret` emprunts en cours """
+    exemplaires = before["exemplaires"]
+    if exemplaires is None:
+        exemplaires = (before["stock"] or 0) + en_pret
+    exemplaires = max(exemplaires, en_pret)
+    return {"stock": exemplaires - en_pret, "exemplaires": exemplaires, "en_pret": en_pret}
+
+
+def reconcile_counters(batch_size=1000, dry_run=False, grace=None):
+    """
+    Recalcule les compteurs des livres à partir des emprunts et répare les écarts.
+
+    Les livres sont parcourus par lots (pagination sur `_id`) ; pour chaque lot,
+    une agrégation `$match`/`$group` sur l'index `(book, date_retour)` compte
+    les emprunts en cours. Attendu : `en_pret` = nombre d'emprunts en cours,
+    `stock` = `exemplaires` - `en_pret` (`exemplaires` est déduit de
+    `stock` pour les livres antérieurs aux compteurs).
+
+    Un emprunt décompte le livre avant d'insérer son document : un écart
+    observé peut donc n'être qu'une écriture en cours. Les écarts ne sont
+    réparés qu'après un délai de grâce (`grace` secondes depuis leur
+    observation), s'ils sont toujours identiques : même livre (valeurs lues)
+    et même nombre d'emprunts en cours. La réparation reste conditionnée aux
+    valeurs lues ; un livre modifié entre-temps est ignoré et sera vérifié
+    au passage suivant.
+
+    Args:
+        batch_size (int): Nombre de livres par lot.
+        dry_run (bool): Signale les écarts sans les réparer.
+        grace (float): Délai de grâce en secondes (`RECONCILE_GRACE_SECONDS` par défaut).
+
+    Returns:
+        dict: `checked` (livres vérifiés), `repaired` (écarts réparés ou à
+        réparer : `book_id`, valeurs `before`/`after`) et `skipped` (écarts
+        disparus ou livres modifiés pendant le délai de grâce).
+    """
+    grace = Config.RECONCILE_GRACE_SECONDS if grace is None else grace
+    books = Book._get_collection()
+    borrows = Borrow._get_collection()
+    report = {"checked": 0, "repaired": [], "skipped": 0}
+    fields = ("stock", "exemplaires", "en_pret")
+    suspects, last_seen = [], None
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        page = list(books.find(query, dict.fromkeys(fields, 1)).sort("_id", 1).limit(batch_size))
+        if not page:
+            break
+        last_id = page[-1]["_id"]
+        report["checked"] += len(page)
+
+        active = _active_loans(borrows, [book["_id"] for book in page])
+        for book in page:
+            before = {field: book.get(field) for field in fields}
+            after = _expected_counters(before, active.get(book["_id"], 0))
+            if after != before:
+                suspects.append((book["_id"], before, after))
+                last_seen = time.monotonic()
+
+    if suspects:
+        time.sleep(max(0.0, grace - (time.monotonic() - last_seen)))
+    for start in range(0, len(suspects), batch_size):
+        batch = suspects[start:start + batch_size]
+        ids = [book_id for book_id, _, _ in batch]
+        current = {book["_id"]: {field: book.get(field) for field in fields}
+                   for book in books.find({"_id": {"$in": ids}}, dict.fromkeys(fields, 1))}
+        active = _active_loans(borrows, ids)
+
+        repairs = []
+        for book_id, before, after in batch:
+            # Écart disparu (emprunt ou retour achevé) ou livre modifié : rien à réparer maintenant
+            if current.get(book_id) != before or _expected_counters(before, active.get(book_id, 0)) != after:
+                report["skipped"] += 1
+                continue
+            report["repaired"].append({"book_id": str(book_id), "before": before, "after": after})
+            repairs.append(UpdateOne(dict(before, _id=book_id), {"$set": after}))
+
+        if repairs and not dry_run:
+            result = books.bulk_write(repairs, ordered=False)
+            report["skipped"] += len(repairs) - result.matched_count
+            invalidate("books", ids=[r["book_id"] for r in report["repaired"][-len(repairs):]])
+
+    for repair in report["repaired"]:
+        logger.warning("Compteurs du livre %s : %s -> %s", repair["book_id"], repair["before"], repair["after"])
+    logger.info(
+        "🔎 Réconciliation : %s livre(s) vérifié(s), %s écart(s)%s",
+        report["checked"], len(report["repaired"]), " (simulation)" if dry_run else "",
+    )
+    return report
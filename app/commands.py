@@ -0,0 +1,210 @@
+import json
+import sys
+import time
+import click
+from flask.cli import with_appcontext
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+from app.models import User, Author, Book, Borrow, RevokedToken, BookStats, UserStats, AuthorMonthStats
+from app.export import EXPORTABLE, gzip_stream, iter_ndjson
+from app.bulk import FORMATS, import_books, read_rows
+from app.circulation import reconcile_counters
+from app.stats import refresh_stats
+from app.reminders import backfill_due_dates, send_reminders
+from app.notifications import load_notifier
+from app.config import Config
+from app.logger import get_logger
+from app.utils import duplicates_pipeline
+
+logger = get_logger()
+
+INDEXED_MODELS = (User, Author, Book, Borrow, RevokedToken, BookStats, UserStats, AuthorMonthStats)
+
+
+def ensure_indexes():
+    """
+    Construit en arrière-plan les index déclarés dans `meta["indexes"]` des modèles.
+
+    Un index unique que les données existantes empêchent de construire
+    (valeurs en double) n'interrompt pas les autres : il est signalé avec
+    les valeurs en cause, à corriger avec `flask --app run dedupe-users`.
+
+    Returns:
+        tuple: (nom de la collection -> index créés ou déjà présents,
+        `<collection>.<champs>` -> valeurs en double empêchant la création).
+    """
+    created, conflicts = {}, {}
+    for model in INDEXED_MODELS:
+        collection = model._get_collection()
+        created[collection.name] = []
+        for spec in model._meta["index_specs"]:
+            options = {k: v for k, v in spec.items() if k != "fields"}
+            options["background"] = True
+            try:
+                created[collection.name].append(collection.create_index(spec["fields"], **options))
+            except DuplicateKeyError:
+                fields = [field for field, _ in spec["fields"]]
+                name = f"{collection.name}.{'_'.join(fields)}"
+                conflicts[name] = list(collection.aggregate(duplicates_pipeline(fields)))
+                logger.error("Index unique %s impossible : %s valeur(s) en double", name, len(conflicts[name]))
+    return created, conflicts
+
+
+def dedupe_users(dry_run=False):
+    """
+    Rend uniques `email` et `username` avant la création des index uniques :
+    dans chaque groupe de doublons, le compte le plus ancien (plus petit
+    `_id`) garde sa valeur et les autres sont renommés `<valeur>~doublon-<_id>`.
+    Les comptes renommés et leurs emprunts sont conservés ; un administrateur
+    peut ensuite les fusionner ou les supprimer.
+
+    Returns:
+        list: Renommages effectués (ou prévus avec `dry_run`).
+    """
+    users = User._get_collection()
+    renames = []
+    for field in ("email", "username"):
+        for group in users.aggregate(duplicates_pipeline([field], limit=None)):
+            for _id in sorted(group["ids"])[1:]:
+                renames.append({"_id": _id, "champ": field, "avant": group["_id"][field],
+                                "apres": f"{group['_id'][field]}~doublon-{_id}"})
+    if renames and not dry_run:
+        users.bulk_write([UpdateOne({"_id": r["_id"]}, {"$set": {r["champ"]: r["apres"]}}) for r in renames], ordered=False)
+    logger.info("Doublons d'utilisateurs : %s renommage(s)%s", len(renames), " (simulation)" if dry_run else "")
+    return renames
+
+
+def index_report():
+    """
+    Compare les index déclarés et existants, et détecte les index inutilisés
+    grâce à `$indexStats` (aucun accès depuis le dernier redémarrage de mongod).
+
+    Returns:
+        dict: Nom de la collection -> {"missing", "extra", "unused"}.
+    """
+    report = {}
+    for model in INDEXED_MODELS:
+        collection = model._get_collection()
+        comparison = model.compare_indexes()
+        stats = collection.aggregate([{"$indexStats": {}}])
+        unused = [s["name"] for s in stats if s["name"] != "_id_" and s["accesses"]["ops"] == 0]
+        report[collection.name] = {
+            "missing": comparison["missing"],
+            "extra": comparison["extra"],
+            "unused": unused,
+        }
+    return report
+
+
+@click.command("ensure-indexes")
+@click.option("--report-only", is_flag=True, help="N'affiche que le rapport, sans créer d'index.")
+@with_appcontext
+def ensure_indexes_command(report_only):
+    """ Crée les index MongoDB et affiche les index manquants ou inutilisés. """
+    if not report_only:
+        created, conflicts = ensure_indexes()
+        for collection, names in created.items():
+            click.echo(f"{collection}: {', '.join(names) or 'aucun index déclaré'}")
+        for name, duplicates in conflicts.items():
+            click.echo(f"{name} [doublons]: {json.dumps(duplicates, default=str, ensure_ascii=False)}", err=True)
+        if conflicts:
+            click.echo("Index uniques non créés : corriger les doublons (flask --app run dedupe-users) puis relancer.", err=True)
+
+    for collection, report in index_report().items():
+        for key in ("missing", "extra", "unused"):
+            if report[key]:
+                click.echo(f"{collection} [{key}]: {report[key]}")
+
+
+@click.command("dedupe-users")
+@click.option("--dry-run", is_flag=True, help="Affiche les renommages sans les appliquer.")
+@with_appcontext
+def dedupe_users_command(dry_run):
+    """ Renomme les emails et noms d'utilisateur en double, préalable aux index uniques. """
+    click.echo(json.dumps(dedupe_users(dry_run=dry_run), default=str, ensure_ascii=False, indent=2))
+
+
+@click.command("export")
+@click.argument("collection", type=click.Choice(sorted(EXPORTABLE)))
+@click.option("-o", "--output", type=click.Path(dir_okay=False), help="Fichier de sortie (stdout par défaut).")
+@click.option("--gzip", "compress", is_flag=True, help="Compresse la sortie en gzip (automatique si le fichier finit par .gz).")
+@click.option("--batch-size", type=click.IntRange(min=1), default=None, help="Taille des lots lus depuis MongoDB.")
+@with_appcontext
+def export_command(collection, output, compress, batch_size):
+    """ Exporte une collection complète en NDJSON, à mémoire constante. """
+    chunks = iter_ndjson(EXPORTABLE[collection], batch_size)
+    if compress or (output and output.endswith(".gz")):
+        chunks = gzip_stream(chunks)
+
+    stream = open(output, "wb") if output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            stream.write(chunk)
+    finally:
+        if output:
+            stream.close()
+
+
+@click.command("import-books")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Format du fichier (déduit de l'extension sinon).")
+@click.option("--chunk-size", type=int, default=1000, show_default=True, help="Nombre de lignes par lot.")
+@with_appcontext
+def import_books_command(path, fmt, chunk_size):
+    """ Importe un fichier CSV ou NDJSON de livres par lots (insert_many non ordonné). """
+    fmt = fmt or ("csv" if path.endswith(".csv") else "ndjson")
+    with open(path, "rb") as stream:
+        report = import_books(read_rows(stream, fmt), chunk_size=chunk_size)
+    click.echo(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+@click.command("reconcile-counters")
+@click.option("--batch-size", type=int, default=1000, show_default=True, help="Nombre de livres par lot.")
+@click.option("--dry-run", is_flag=True, help="Signale les écarts sans les réparer.")
+@click.option("--interval", type=float, help="Relance la réconciliation toutes les N secondes (tâche de fond).")
+@with_appcontext
+def reconcile_counters_command(batch_size, dry_run, interval):
+    """ Recalcule les compteurs des livres (stock, exemplaires, en_pret) et répare les écarts. """
+    while True:
+        report = reconcile_counters(batch_size=batch_size, dry_run=dry_run)
+        click.echo(json.dumps(report, ensure_ascii=False, default=str))
+        if not interval:
+            break
+        time.sleep(interval)
+
+
+@click.command("refresh-stats")
+@click.option("--rebuild", is_flag=True, help="Vide les agrégats et les recalcule depuis l'origine.")
+@click.option("--interval", type=float, help="Relance le rafraîchissement toutes les N secondes (tâche de fond).")
+@with_appcontext
+def refresh_stats_command(rebuild, interval):
+    """ Rafraîchit les statistiques de circulation depuis le dernier point de reprise. """
+    while True:
+        report = refresh_stats(rebuild=rebuild)
+        click.echo(json.dumps(report, ensure_ascii=False, default=str))
+        if not interval:
+            break
+        rebuild = False
+        time.sleep(interval)
+
+
+@click.command("send-reminders")
+@click.option("--notifier", "spec", help="Canal d'envoi : stdout, file:<chemin> ou <module>:<classe> (REMINDER_NOTIFIER).")
+@click.option("--batch-size", type=int, default=None, help="Emprunts lus par lot (REMINDER_BATCH_SIZE).")
+@click.option("--backfill", is_flag=True, help="Renseigne d'abord l'échéance des emprunts en cours qui n'en ont pas.")
+@click.option("--interval", type=float, help="Relance le traitement toutes les N secondes (tâche de fond).")
+@with_appcontext
+def send_reminders_command(spec, batch_size, backfill, interval):
+    """ Envoie les relances des emprunts en retard depuis le dernier point de reprise. """
+    if backfill:
+        click.echo(json.dumps({"echeances_renseignees": backfill_due_dates(batch_size)}))
+    notifier = load_notifier(spec or Config.REMINDER_NOTIFIER)
+    try:
+        while True:
+            # Rapport sur stderr : stdout peut être le canal des relances
+            click.echo(json.dumps(send_reminders(notifier, batch_size=batch_size), ensure_ascii=False), err=True)
+            if not interval:
+                break
+            time.sleep(interval)
+    finally:
+        notifier.close()
@@ -1,6 +1,6 @@
+import json
 import os
 from dotenv import load_dotenv
-from mongoengine import connect
 
 
 load_dotenv()
@@ -11,7 +11,80 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "secret_key")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt_secret_key")
     MONGODB_URI = os.getenv("MONGODB_URI","mongodb://localhost:27017/library")
+    # Pool de connexions MongoDB (par processus : à dimensionner selon les threads du worker)
+    MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 100))
+    MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+    MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", 5000))
+    MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+    # `connect=False` : aucune socket ni thread de surveillance avant la première requête,
+    # le client peut donc être créé avant un fork sans être partagé entre workers
+    MONGODB_SETTINGS = {
+        "host": MONGODB_URI,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connect": False,
+    }
+    # Pagination des listes (GET /books, /authors, /borrow)
+    PAGE_SIZE = int(os.getenv("PAGE_SIZE", 50))
+    PAGE_SIZE_MAX = int(os.getenv("PAGE_SIZE_MAX", 500))
+    # Auteurs retenus (les plus pertinents) pour filtrer `/search/books?auteur=`
+    SEARCH_AUTHORS_MAX = int(os.getenv("SEARCH_AUTHORS_MAX", 1000))
+    # Nombre maximal de livres/emprunts par requête groupée (POST /borrow/batch, /borrow/returns)
+    BORROW_BATCH_MAX = int(os.getenv("BORROW_BATCH_MAX", 100))
+    # Durée de prêt (jours) : échéance (`date_echeance`) des nouveaux emprunts
+    LOAN_PERIOD_DAYS = int(os.getenv("LOAN_PERIOD_DAYS", 21))
+    # Relances de retard : délais après l'échéance (jours, un niveau par délai), taille des lots, canal
+    REMINDER_DELAYS_DAYS = tuple(int(d) for d in os.getenv("REMINDER_DELAYS_DAYS", "0,7,14").split(","))
+    REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", 1000))
+    REMINDER_NOTIFIER = os.getenv("REMINDER_NOTIFIER", "stdout")
+    # Réconciliation des compteurs : délai (s) avant de réparer un écart (emprunt ou retour en cours d'écriture)
+    RECONCILE_GRACE_SECONDS = float(os.getenv("RECONCILE_GRACE_SECONDS", 5))
+    # Statistiques : emprunts plus récents que ce délai (s) laissés au rafraîchissement suivant
+    STATS_SAFETY_LAG = int(os.getenv("STATS_SAFETY_LAG", 60))
+    # Taille des lots lus depuis MongoDB pour les exports NDJSON
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", 1000))
+    # Plafond du paramètre `batch_size` de `GET /export/<collection>` (mémoire par requête)
+    EXPORT_BATCH_SIZE_MAX = int(os.getenv("EXPORT_BATCH_SIZE_MAX", 10000))
+    # Cache de lecture des livres et auteurs (`memory` ou `redis`)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 60))
+    CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", 10000))
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    # Limitation de débit par client (identité JWT, sinon IP) : seau de `RATE_LIMIT_CAPACITY` jetons
+    # regagnés à `RATE_LIMIT_REFILL_PER_SECOND` jetons/s ; stockage `memory` (par processus) ou `redis`
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+    RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", CACHE_REDIS_URL)
+    RATE_LIMIT_CAPACITY = int(os.getenv("RATE_LIMIT_CAPACITY", 100))
+    RATE_LIMIT_REFILL_PER_SECOND = float(os.getenv("RATE_LIMIT_REFILL_PER_SECOND", 20))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+    # Nombre de proxys de confiance devant l'application : l'adresse du client est alors lue dans
+    # `X-Forwarded-For` (0 : adresse de la connexion, l'en-tête est ignoré)
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    # Poids (en jetons) des routes coûteuses, 1 pour les autres ; JSON `{"[MÉTHODE ]<règle>": poids}`
+    RATE_LIMIT_COSTS = json.loads(os.getenv("RATE_LIMIT_COSTS", "null")) or {
+        "GET /books": 5,
+        "GET /borrow": 5,
+        "GET /authors": 3,
+        "/search/books": 10,
+        "/books/bulk": 20,
+        "/export/<string:collection>": 20,
+        "/borrow/batch": 5,
+        "/borrow/returns": 5,
+        "/users/<string:id>/borrows": 2,
+        "/login": 3,
+        "/register": 3,
+    }
+    # Délestage : requêtes simultanées de poids >= RATE_LIMIT_EXPENSIVE_COST par processus (503 au-delà)
+    RATE_LIMIT_EXPENSIVE_COST = int(os.getenv("RATE_LIMIT_EXPENSIVE_COST", 5))
+    MAX_EXPENSIVE_IN_FLIGHT = int(os.getenv("MAX_EXPENSIVE_IN_FLIGHT", 16))
+    # Hachage des mots de passe (les hash existants sont recalculés à la connexion si la méthode change)
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:260000")
+    PASSWORD_SALT_LENGTH = int(os.getenv("PASSWORD_SALT_LENGTH", 16))
+    HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+    HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 64))
+    # `?profile=1` renvoie le rapport cProfile d'une requête (à n'activer qu'en diagnostic)
+    PROFILING = os.getenv("PROFILING", "false").lower() == "true"
 
-
-# Connexion MongoDB
-connect(host=Config.MONGODB_URI)
@@ -1,27 +1,130 @@
-from flask import Blueprint, render_template, jsonify
-from app.logger import setup_logger
+import os
+from flask import Blueprint, render_template, jsonify, request
+from app.logger import get_logger, LOG_FILE
+from app.cache import get_cache
+from app import stats
 
-logger = setup_logger()
+logger = get_logger()
 
 dashboard = Blueprint("dashboard", __name__, template_folder="../templates")
 
+# Volume maximal renvoyé par appel (le client rappelle tant que `more` est vrai)
+MAX_CHUNK = 256 * 1024
+# Volume lu à la fin du fichier lors du premier appel (sans `since`)
+TAIL_BYTES = 64 * 1024
+
+
+def _read_lines(path, offset, limit, final=False):
+    """
+    Lit au plus `limit` octets de `path` à partir de `offset`, en s'arrêtant
+    à la dernière ligne complète (sauf si `final` : fichier qui n'est plus
+    écrit, lu jusqu'au bout). Une ligne plus longue que `limit` est découpée
+    en morceaux de `limit` octets.
+
+    Returns:
+        tuple: (lignes lues, nouvel offset, True si `limit` a été atteint et que la lecture a avancé).
+    """
+    with open(path, "rb") as log_file:
+        log_file.seek(offset)
+        data = log_file.read(limit)
+    full = len(data) == limit
+    end = len(data) if final else data.rfind(b"\n") + 1
+    if end == 0 and full:
+        end = limit
+    return data[:end].decode("utf-8", errors="replace").splitlines(), offset + end, full and end > 0
+
+
+def read_logs_since(offset=None, inode=None):
+    """
+    Lit les nouvelles lignes du fichier de log depuis un offset en octets.
+
+    - Sans `offset`, renvoie la fin du fichier (`TAIL_BYTES`).
+    - Si le fichier a tourné (`RotatingFileHandler`) depuis l'appel précédent,
+      la fin de l'ancien fichier (`app.log.1`, reconnu par son inode) est lue
+      avant le début du nouveau : aucune ligne n'est perdue ni dupliquée.
+
+    Returns:
+        dict: `logs`, `offset` et `inode` à renvoyer au prochain appel, et
+        `more` si l'appel a atteint `MAX_CHUNK` (le client rappelle aussitôt).
+        Une dernière ligne en cours d'écriture ne compte pas : elle sera lue
+        au prochain appel périodique.
+    """
+    inode_now = os.stat(LOG_FILE).st_ino
+    lines = []
+    budget = MAX_CHUNK
+    if offset is None:
+        start = max(0, os.stat(LOG_FILE).st_size - TAIL_BYTES)
+        lines, offset, _ = _read_lines(LOG_FILE, start, TAIL_BYTES)
+        # En milieu de fichier, la première ligne lue est tronquée
+        return {"logs": lines[1:] if start else lines, "offset": offset, "inode": inode_now, "more": False}
+
+    if inode is not None and inode != inode_now:
+        rotated = f"{LOG_FILE}.1"
+        if os.path.exists(rotated) and os.stat(rotated).st_ino == inode:
+            lines, end, more = _read_lines(rotated, offset, MAX_CHUNK, final=True)
+            if more:
+                return {"logs": lines, "offset": end, "inode": inode, "more": True}
+            budget -= end - offset
+        offset = 0
+    elif offset > os.stat(LOG_FILE).st_size:
+        # Fichier tronqué ou recréé avec le même inode
+        offset = 0
+
+    new_lines, offset, more = _read_lines(LOG_FILE, offset, budget)
+    return {"logs": lines + new_lines, "offset": offset, "inode": inode_now, "more": more}
+
 
 @dashboard.route("/logs")
 def get_logs():
     """
-    Endpoint pour récupérer les logs de l'application.
+    Endpoint pour récupérer les logs de l'application de façon incrémentale.
+
+    Paramètres :
+    - `since` : offset en octets renvoyé par l'appel précédent (sinon, fin du fichier).
+    - `inode` : inode renvoyé par l'appel précédent, pour détecter la rotation.
 
     Returns:
-        dict: JSON contenant les logs en format texte.
+        dict: JSON contenant les nouvelles lignes de log, le prochain `offset` et l'`inode`.
     """
     try:
-        with open("logs/app.log", "r") as log_file:
-            logs = log_file.readlines()
-        return jsonify({"logs": logs})
+        return jsonify(read_logs_since(
+            request.args.get("since", type=int),
+            request.args.get("inode", type=int),
+        ))
     except FileNotFoundError:
         return jsonify({"error": "Log file not found"}), 404
 
 
+@dashboard.route("/cache")
+def get_cache_stats():
+    """
+    Endpoint exposant les compteurs du cache de lecture, pour le dimensionner.
+
+    Returns:
+        dict: JSON contenant hits, misses, évictions et taille du cache.
+    """
+    return jsonify(get_cache().stats())
+
+
+@dashboard.route("/stats")
+def get_circulation_stats():
+    """
+    Synthèse de circulation lue depuis les agrégats précalculés (`app.stats`),
+    sans parcourir l'historique des emprunts.
+
+    Returns:
+        dict: JSON contenant les livres les plus empruntés, les emprunts en
+        cours et en retard, et la fraîcheur des agrégats (`as_of`).
+    """
+    as_of = stats.as_of()
+    return jsonify({
+        "as_of": as_of.isoformat() if as_of else None,
+        "top_livres": stats.top_books(10),
+        "emprunteurs_actifs": stats.active_users(10),
+        "retards": stats.overdue(10),
+    })
+
+
 @dashboard.route("/")
 def index():
     """
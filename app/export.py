@@ -0,0 +1,81 @@
+import zlib
+from flask import Blueprint, Response, request
+from flask_jwt_extended import jwt_required
+from app.config import Config
+from app.logger import get_logger
+from app.models import Author, Book, Borrow, User
+from app.utils import HIDDEN_FIELDS, dumps, serialize_raw
+
+logger = get_logger()
+
+export = Blueprint("export", __name__)
+
+# Collections exportables : nom dans l'URL -> modèle
+EXPORTABLE = {"authors": Author, "books": Book, "borrows": Borrow, "users": User}
+
+
+def iter_ndjson(model, batch_size=None):
+    """
+    Parcourt une collection avec un curseur serveur et produit du NDJSON
+    (un document JSON par ligne), par blocs de `batch_size` documents.
+
+    La mémoire utilisée ne dépend que de `batch_size`, pas de la taille de la
+    collection.
+    """
+    batch_size = batch_size or Config.EXPORT_BATCH_SIZE
+    projection = {name: 0 for name in HIDDEN_FIELDS.get(model.__name__, ())} or None
+    cursor = model._get_collection().find({}, projection, batch_size=batch_size, no_cursor_timeout=True)
+    try:
+        batch = []
+        for raw in cursor:
+            batch.append(raw)
+            if len(batch) >= batch_size:
+                yield b"".join(dumps(doc) + b"\n" for doc in serialize_raw(model, batch))
+                batch = []
+        if batch:
+            yield b"".join(dumps(doc) + b"\n" for doc in serialize_raw(model, batch))
+    finally:
+        cursor.close()
+
+
+def gzip_stream(chunks, level=6):
+    """ Compresse au fil de l'eau un flux de blocs d'octets au format gzip """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@export.route("/<string:collection>")
+@jwt_required()
+def export_collection(collection):
+    """
+    Exporte une collection complète en NDJSON, en streaming.
+
+    - `GET /export/<books|authors|borrows|users>` (JWT requis)
+    - `batch_size` : taille des lots lus depuis MongoDB (optionnel, plafonnée à `EXPORT_BATCH_SIZE_MAX`)
+    - Réponse compressée en gzip si le client envoie `Accept-Encoding: gzip`.
+
+    Returns:
+        Response: Flux `application/x-ndjson`, 400 si `batch_size` n'est pas un
+        entier positif, ou 404 si la collection est inconnue.
+    """
+    model = EXPORTABLE.get(collection)
+    if model is None:
+        return {"message": "Collection inconnue"}, 404
+
+    # Validé avant le début du flux : une erreur pendant l'envoi ne peut plus changer le statut
+    batch_size = request.args.get("batch_size", type=int)
+    if "batch_size" in request.args and (batch_size is None or batch_size <= 0):
+        return {"message": {"batch_size": "Entier strictement positif attendu"}}, 400
+    batch_size = min(batch_size or Config.EXPORT_BATCH_SIZE, Config.EXPORT_BATCH_SIZE_MAX)
+    chunks = iter_ndjson(model, batch_size)
+    headers = {"Content-Disposition": f'attachment; filename="{collection}.ndjson"'}
+    if "gzip" in request.accept_encodings:
+        chunks = gzip_stream(chunks)
+        headers["Content-Encoding"] = "gzip"
+
+    logger.info("Export NDJSON de la collection %s", collection)
+    return Response(chunks, mimetype="application/x-ndjson", headers=headers)
@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from bson import ObjectId
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from app.cache import get_cache
+from app.models import RevokedToken, User
+
+
+def user_claims(user):
+    """
+    Claims ajoutés au token à la connexion : le token porte lui-même la fiche
+    compacte de l'utilisateur, aucune requête n'est nécessaire pour l'identifier.
+    """
+    return {"email": user["email"], "username": user["username"]}
+
+
+def load_user_record(identity):
+    """
+    Fiche compacte `{id, email, username}` d'un utilisateur, lue une fois puis
+    servie par le cache (durée `CACHE_TTL`). Retourne None si l'utilisateur n'existe pas.
+    """
+    if not ObjectId.is_valid(identity):
+        return None
+
+    def loader():
+        user = User._get_collection().find_one({"_id": ObjectId(identity)}, {"email": 1, "username": 1})
+        return {"id": identity, **user_claims(user)} if user else None
+
+    return get_cache().item("users", identity, loader)
+
+
+def current_user_record():
+    """
+    Utilisateur authentifié de la requête courante (`@jwt_required()`) : depuis
+    les claims du token s'ils sont présents, sinon via `load_user_record`.
+    """
+    claims = get_jwt()
+    identity = get_jwt_identity()
+    if claims.get("email"):
+        return {"id": identity, "email": claims["email"], "username": claims.get("username")}
+    return load_user_record(identity)
+
+
+def revoke_token(claims):
+    """ Révoque un token jusqu'à son expiration (base + cache) """
+    expires_at = datetime.fromtimestamp(claims["exp"], tz=timezone.utc).replace(tzinfo=None)
+    RevokedToken.objects(jti=claims["jti"]).update_one(set__expires_at=expires_at, upsert=True)
+    get_cache().put("revoked", claims["jti"], True)
+
+
+def is_token_revoked(jwt_header, jwt_payload):
+    """
+    Callback `token_in_blocklist_loader` : la révocation d'un token est lue en
+    base au plus une fois par durée de cache (`CACHE_TTL`), puis servie par le
+    cache. Avec le cache mémoire, un autre processus peut donc accepter un token
+    révoqué pendant au plus `CACHE_TTL` secondes ; le cache Redis est partagé.
+    """
+    jti = jwt_payload["jti"]
+    return get_cache().item("revoked", jti, lambda: RevokedToken.objects(jti=jti).count() > 0)
@@ -1,27 +1,102 @@
+import atexit
+import copy
+import json
 import os
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 LOG_DIR = "logs"
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
+LOGGER_NAME = "library_management"
 
-if not os.path.exists(LOG_DIR):
-    os.makedirs(LOG_DIR)
+_listener = None
+_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formate chaque enregistrement en une ligne JSON (logs structurés).
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        # Via `TracebackQueueHandler`, la trace arrive déjà formatée dans `exc_text`
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class TracebackQueueHandler(QueueHandler):
+    """
+    `QueueHandler` qui garde la trace d'une exception à part du message.
+
+    `QueueHandler.prepare` fusionne la trace dans le message et vide
+    `exc_info` (non sérialisable) : le formateur du listener ne peut alors
+    plus la distinguer. Ici, le message est seulement interpolé et la trace
+    formatée est conservée dans `exc_text`, que `logging.Formatter` ajoute
+    à la suite du message et que `JsonFormatter` émet dans `exception`.
+    """
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def get_logger():
+    """
+    Retourne le logger de l'application, sans effet de bord : les handlers
+    sont installés par `setup_logger`, appelé depuis `create_app`.
+    """
+    return logging.getLogger(LOGGER_NAME)
 
 
 def setup_logger():
     """
     Configure le logger pour écrire les logs dans un fichier tournant.
-    """
-    logger = logging.getLogger("library_management")
-    logger.setLevel(logging.INFO)
 
-    handler = RotatingFileHandler(LOG_FILE, maxBytes=100000, backupCount=3)
-    handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    Les appels de log ne font que déposer l'enregistrement dans une file
+    (`QueueHandler`) ; l'écriture sur disque est faite par un thread dédié
+    (`QueueListener`). La configuration n'est appliquée qu'une seule fois,
+    quel que soit le nombre d'appels.
 
-    logger.addHandler(handler)
-    return logger
+    Variables d'environnement :
+    - `LOG_LEVEL` : niveau minimal (`INFO` par défaut)
+    - `LOG_FORMAT` : `text` (par défaut) ou `json` pour des lignes JSON structurées
+    """
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    with _lock:
+        if _listener is not None:
+            return logger
 
+        os.makedirs(LOG_DIR, exist_ok=True)
+        handler = RotatingFileHandler(LOG_FILE, maxBytes=100000, backupCount=3)
+        if os.getenv("LOG_FORMAT", "text") == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
 
-logger = setup_logger()
-logger.info("Logger initialisé")  # pragma: no cover
+        log_queue = queue.SimpleQueue()
+        logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+        logger.addHandler(TracebackQueueHandler(log_queue))
+
+        _listener = QueueListener(log_queue, handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)
+        logger.info("Logger initialisé")
+    return logger
@@ -0,0 +1,214 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from flask import Response, current_app, g, request
+from pymongo import monitoring
+
+# Bornes des histogrammes (secondes, puis nombre de commandes par requête)
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# Nom -> (type, description, bornes)
+METRICS = {
+    "http_request_duration_seconds": ("histogram", "Durée des requêtes HTTP par endpoint", DURATION_BUCKETS),
+    "http_requests_total": ("counter", "Nombre de requêtes HTTP par endpoint et code", None),
+    "http_request_mongo_commands": ("histogram", "Commandes MongoDB émises par requête HTTP", COUNT_BUCKETS),
+    "http_request_mongo_duration_seconds": ("histogram", "Temps passé dans MongoDB par requête HTTP", DURATION_BUCKETS),
+    "mongo_command_duration_seconds": ("histogram", "Durée des commandes MongoDB", DURATION_BUCKETS),
+    "mongo_command_failures_total": ("counter", "Commandes MongoDB en échec", None),
+}
+
+
+class Histogram:
+    """ Histogramme cumulatif au sens Prometheus (compte par borne, somme, total) """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Registre des métriques du processus (histogrammes et compteurs étiquetés),
+    exporté au format texte de Prometheus.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, name, value, **labels):
+        """ Ajoute une observation à l'histogramme `name` """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._series.get(key)
+            if histogram is None:
+                histogram = self._series[key] = Histogram(METRICS[name][2])
+            histogram.observe(value)
+
+    def inc(self, name, value=1, **labels):
+        """ Incrémente le compteur `name` """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + value
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        """ Retourne toutes les séries au format d'exposition texte de Prometheus """
+        with self._lock:
+            series = sorted(self._series.items(), key=lambda item: item[0])
+            lines, current = [], None
+            for (name, labels), value in series:
+                if name != current:
+                    kind, description, _ = METRICS[name]
+                    lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+                    current = name
+                if isinstance(value, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(value.buckets, value.counts):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{_labels(labels, le=bound)} {cumulative}")
+                    lines.append(f"{name}_bucket{_labels(labels, le='+Inf')} {value.count}")
+                    lines.append(f"{name}_sum{_labels(labels)} {value.sum}")
+                    lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                else:
+                    lines.append(f"{name}{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _labels(labels, **extra):
+    """ Formate les étiquettes `{a="x",b="y"}` en échappant les valeurs """
+    items = list(labels) + list(extra.items())
+    if not items:
+        return ""
+    escape = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in items) + "}"
+
+
+class RequestStats:
+    """ Commandes MongoDB émises pendant la requête en cours """
+
+    __slots__ = ("commands", "mongo_seconds")
+
+    def __init__(self):
+        self.commands = 0
+        self.mongo_seconds = 0.0
+
+
+_request_stats = ContextVar("request_stats", default=None)
+
+registry = Metrics()
+
+
+class CommandListener(monitoring.CommandListener):
+    """
+    Écouteur de commandes pymongo : durée par commande et, pendant une
+    requête HTTP, nombre et temps cumulé des commandes de cette requête.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event, failed=False)
+
+    def failed(self, event):
+        self._record(event, failed=True)
+
+    def _record(self, event, failed):
+        seconds = event.duration_micros / 1e6
+        registry.observe("mongo_command_duration_seconds", seconds, command=event.command_name)
+        if failed:
+            registry.inc("mongo_command_failures_total", command=event.command_name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.commands += 1
+            stats.mongo_seconds += seconds
+
+
+# Instance unique : MongoEngine refuse de réenregistrer une connexion avec des réglages différents
+command_listener = CommandListener()
+
+
+def _profiling_requested():
+    return request.args.get("profile") == "1" and current_app.config.get("PROFILING", False)
+
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    g.metrics_token = _request_stats.set(RequestStats())
+    if _profiling_requested():
+        g.profiler = cProfile.Profile()
+        g.profiler.enable()
+
+
+def _end_request(response):
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        response = _profile_report(profiler, response)
+
+    token = g.pop("metrics_token", None)
+    if token is None:
+        return response
+    stats = _request_stats.get()
+    _request_stats.reset(token)
+    elapsed = time.perf_counter() - g.pop("metrics_start")
+
+    # Étiquette = règle de routage (`/books/<string:id>`), jamais l'URL : cardinalité bornée
+    endpoint = request.url_rule.rule if request.url_rule else "non_trouve"
+    registry.observe("http_request_duration_seconds", elapsed, endpoint=endpoint, method=request.method)
+    registry.inc("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    registry.observe("http_request_mongo_commands", stats.commands, endpoint=endpoint)
+    registry.observe("http_request_mongo_duration_seconds", stats.mongo_seconds, endpoint=endpoint)
+    response.headers["Server-Timing"] = (
+        f'mongo;dur={stats.mongo_seconds * 1000:.2f};desc="{stats.commands} commande(s)", '
+        f"app;dur={elapsed * 1000:.2f}"
+    )
+    return response
+
+
+def _profile_report(profiler, response):
+    """ Remplace la réponse par le rapport cProfile de la requête (30 fonctions les plus coûteuses) """
+    output = io.StringIO()
+    output.write(f"{request.method} {request.full_path} -> {response.status_code}\n\n")
+    pstats.Stats(profiler, stream=output).sort_stats("cumulative").print_stats(30)
+    return Response(output.getvalue(), mimetype="text/plain")
+
+
+def metrics_view():
+    """ Endpoint `/metrics` : métriques du processus au format Prometheus """
+    return Response(registry.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_metrics(app):
+    """
+    Instrumente l'application :
+    - histogrammes de durée par endpoint et nombre/durée des commandes MongoDB
+      par requête (écouteur pymongo `command_listener`), exposés sur `/metrics` ;
+    - en-tête `Server-Timing` (temps MongoDB et temps total) sur chaque réponse ;
+    - si `PROFILING` est activé, `?profile=1` renvoie le rapport cProfile de la requête.
+
+    `command_listener` doit être passé au client MongoDB (`event_listeners`).
+    """
+    app.before_request(_start_request)
+    app.after_request(_end_request)
+    app.add_url_rule("/metrics", "metrics", metrics_view)
+    app.extensions["metrics"] = registry
+    return registry
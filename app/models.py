@@ -1,5 +1,11 @@
-from mongoengine import Document, StringField, IntField, ReferenceField, DateTimeField
-from datetime import datetime
+from mongoengine import Document, StringField, IntField, ReferenceField, DateTimeField, ObjectIdField, DictField
+from datetime import datetime, timedelta
+from app.config import Config
+
+
+def due_date(date_emprunt):
+    """ Date de retour prévue d'un emprunt (`LOAN_PERIOD_DAYS` jours après l'emprunt) """
+    return date_emprunt + timedelta(days=Config.LOAN_PERIOD_DAYS)
 
 
 class User(Document):
@@ -15,6 +21,14 @@ class User(Document):
     password = StringField(required=True)
     email = StringField(required=True)
 
+    meta = {
+        "indexes": [
+            {"fields": ["email"], "unique": True},
+            {"fields": ["username"], "unique": True},
+        ],
+        "index_background": True,
+    }
+
 
 class Author(Document):
     """
@@ -27,6 +41,12 @@ class Author(Document):
     nom = StringField(required=True)
     prenom = StringField(required=True)
 
+    meta = {
+        # Index texte pour la recherche de livres par nom d'auteur
+        "indexes": [{"fields": ["$nom", "$prenom"], "default_language": "french"}],
+        "index_background": True,
+    }
+
 
 class Book(Document):
     """
@@ -36,10 +56,31 @@ class Book(Document):
     - titre (str) : Titre du livre
     - auteur (ReferenceField) : Référence à un auteur
     - stock (int) : Nombre d'exemplaires disponibles
+    - exemplaires (int) : Nombre total d'exemplaires (par défaut `stock` + `en_pret`)
+    - en_pret (int) : Nombre d'exemplaires en prêt (emprunts sans `date_retour`)
+
+    Les compteurs sont mis à jour atomiquement avec chaque emprunt et retour
+    (`stock` = `exemplaires` - `en_pret`) et réparés par
+    `flask --app run reconcile-counters` (voir `app.circulation.reconcile_counters`).
     """
     titre = StringField(required=True)
     auteur = ReferenceField(Author, required=True)
     stock = IntField(default=1)
+    exemplaires = IntField()
+    en_pret = IntField(default=0)
+
+    meta = {
+        "indexes": [
+            "auteur",
+            # Index texte (insensible à la casse et aux accents) pour /search/books
+            {"fields": ["$titre"], "default_language": "french"},
+        ],
+        "index_background": True,
+    }
+
+    def clean(self):
+        if self.exemplaires is None:
+            self.exemplaires = (self.stock or 0) + (self.en_pret or 0)
 
 
 class Borrow(Document):
@@ -50,9 +91,147 @@ class Borrow(Document):
     - user (ReferenceField) : Utilisateur ayant emprunté le livre
     - book (ReferenceField) : Livre emprunté
     - date_emprunt (DateTime) : Date d'emprunt (par défaut, date actuelle)
-    - date_retour (DateTime) : Date de retour (facultatif)
+    - date_retour (DateTime) : Date de retour (absente tant que le livre est en prêt)
+    - date_echeance (DateTime) : Date de retour prévue (par défaut `date_emprunt` + `LOAN_PERIOD_DAYS`)
+    - relances (int) : Nombre de relances de retard envoyées (voir `app.reminders`)
+    - lot_relance (str) : Dernier lot de relances ayant réservé l'emprunt
+    - lot_retour (str) : Lot de retour groupé (`POST /borrow/returns`) ayant réservé l'emprunt
     """
     user = ReferenceField(User, required=True)
     book = ReferenceField(Book, required=True)
     date_emprunt = DateTimeField(default=datetime.utcnow)
     date_retour = DateTimeField(null=True)
+    date_echeance = DateTimeField()
+    lot_retour = StringField(null=True)
+    relances = IntField(default=0)
+    lot_relance = StringField(null=True)
+
+    meta = {
+        "indexes": [
+            # Historique complet d'un utilisateur (`GET /users/<id>/borrows` sans statut), index couvrant
+            ("user", "-date_emprunt", "-id", "book", "date_retour"),
+            ("book", "date_retour"),
+            # Fenêtres incrémentales des statistiques (`app.stats`), retours
+            # et emprunts en retard parcourus par échéance (`app.reminders`)
+            "date_emprunt",
+            ("date_retour", "date_echeance", "id"),
+            # Historique d'un utilisateur par statut (`GET /users/<id>/borrows?status=`) : index
+            # couvrant, trié comme les pages (emprunts en cours par date, retours par date de retour)
+            ("user", "-date_retour", "-date_emprunt", "-id", "book"),
+        ],
+        "index_background": True,
+    }
+
+    def clean(self):
+        if self.date_echeance is None:
+            self.date_echeance = due_date(self.date_emprunt or datetime.utcnow())
+
+
+class CollectionVersion(Document):
+    """
+    Compteur de version d'une collection, incrémenté à chaque écriture.
+
+    Sert à calculer les ETag et `Last-Modified` des endpoints du catalogue sans
+    lire ni sérialiser les documents.
+
+    Attributs:
+    - name (str) : Nom de l'espace versionné (`books`, `authors`, ...)
+    - version (int) : Numéro de version courant
+    - updated_at (DateTime) : Date de la dernière écriture
+    """
+    name = StringField(primary_key=True)
+    version = IntField(default=0)
+    updated_at = DateTimeField()
+
+
+class RevokedToken(Document):
+    """
+    Token JWT révoqué (déconnexion), conservé jusqu'à son expiration.
+
+    Attributs:
+    - jti (str) : Identifiant unique du token
+    - expires_at (DateTime) : Date d'expiration du token ; le document est
+      ensuite supprimé par l'index TTL
+    """
+    jti = StringField(primary_key=True)
+    expires_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [{"fields": ["expires_at"], "expireAfterSeconds": 0}],
+        "index_background": True,
+    }
+
+
+class Checkpoint(Document):
+    """
+    Point de reprise (high-water mark) d'un traitement incrémental.
+
+    Attributs:
+    - name (str) : Nom du traitement (`stats.emprunts`, `stats.retours`, ...)
+    - value (DateTime) : Borne supérieure de la dernière fenêtre traitée
+    - position (ObjectId) : Dernier `_id` traité à la date `value` (reprise exacte d'un parcours par curseur)
+    - pending (DateTime) : Borne supérieure d'une fenêtre réservée, pas encore confirmée
+    - updated_at (DateTime) : Date du dernier traitement
+    """
+    name = StringField(primary_key=True)
+    value = DateTimeField()
+    position = ObjectIdField()
+    pending = DateTimeField()
+    updated_at = DateTimeField()
+
+
+class BookStats(Document):
+    """
+    Agrégat précalculé : nombre total d'emprunts par livre (`GET /stats/books/top`).
+
+    Attributs:
+    - book (ObjectId) : Livre
+    - emprunts (int) : Nombre d'emprunts depuis l'origine
+    - fenetres (dict) : Borne de la dernière fenêtre agrégée, par point de reprise
+    """
+    book = ObjectIdField(primary_key=True)
+    emprunts = IntField(default=0)
+    fenetres = DictField()
+
+    meta = {"indexes": ["-emprunts"], "index_background": True}
+
+
+class UserStats(Document):
+    """
+    Agrégat précalculé : emprunts en cours et en retard par utilisateur
+    (`GET /stats/users/active`, `GET /stats/overdue`).
+
+    Attributs:
+    - user (ObjectId) : Utilisateur
+    - emprunts (int) : Nombre d'emprunts depuis l'origine
+    - en_cours (int) : Emprunts non retournés
+    - en_retard (int) : Emprunts non retournés dont l'échéance est dépassée
+    - fenetres (dict) : Borne de la dernière fenêtre agrégée, par point de reprise
+    """
+    user = ObjectIdField(primary_key=True)
+    emprunts = IntField(default=0)
+    en_cours = IntField(default=0)
+    en_retard = IntField(default=0)
+    fenetres = DictField()
+
+    meta = {"indexes": ["-en_cours", "-en_retard"], "index_background": True}
+
+
+class AuthorMonthStats(Document):
+    """
+    Agrégat précalculé : emprunts par auteur et par mois (`GET /stats/authors/monthly`).
+
+    Attributs:
+    - id (str) : `<auteur>:<mois>`
+    - auteur (ObjectId) : Auteur des livres empruntés
+    - mois (str) : Mois de l'emprunt (`AAAA-MM`, UTC)
+    - emprunts (int) : Nombre d'emprunts
+    - fenetres (dict) : Borne de la dernière fenêtre agrégée, par point de reprise
+    """
+    id = StringField(primary_key=True)
+    auteur = ObjectIdField(required=True)
+    mois = StringField(required=True)
+    emprunts = IntField(default=0)
+    fenetres = DictField()
+
+    meta = {"indexes": [("auteur", "mois"), ("mois", "-emprunts")], "index_background": True}
@@ -0,0 +1,70 @@
+import importlib
+import sys
+import threading
+from app.utils import dumps
+
+
+class Notifier:
+    """
+    Canal d'envoi des relances de retard.
+
+    Une implémentation reçoit les relances par lots (`send`) et retourne les
+    identifiants d'emprunts effectivement notifiés ; les autres seront
+    proposés à nouveau au passage suivant.
+    """
+
+    def send(self, reminders):
+        """
+        Args:
+            reminders (list): Relances (`borrow_id`, `email`, `titre`, `date_echeance`, `niveau`, ...).
+
+        Returns:
+            set: Identifiants (`borrow_id`) des relances envoyées.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class StreamNotifier(Notifier):
+    """ Écrit chaque relance en NDJSON sur un flux (stdout par défaut) : pour les tests et le développement """
+
+    def __init__(self, stream=None):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def send(self, reminders):
+        stream = self.stream or sys.stdout
+        with self._lock:
+            for reminder in reminders:
+                stream.write(dumps(reminder).decode() + "\n")
+            stream.flush()
+        return {reminder["borrow_id"] for reminder in reminders}
+
+
+class FileNotifier(StreamNotifier):
+    """ Ajoute chaque relance en NDJSON à la fin d'un fichier """
+
+    def __init__(self, path):
+        super().__init__(open(path, "a", encoding="utf-8"))
+
+    def close(self):
+        self.stream.close()
+
+
+def load_notifier(spec):
+    """
+    Crée le canal de relances décrit par `spec` (voir `REMINDER_NOTIFIER`) :
+    - `stdout` : NDJSON sur la sortie standard ;
+    - `file:<chemin>` : NDJSON ajouté au fichier ;
+    - `<module>:<classe>` : classe `Notifier` fournie par l'application (e-mail, SMS, file de messages...).
+    """
+    if spec == "stdout":
+        return StreamNotifier()
+    if spec.startswith("file:"):
+        return FileNotifier(spec[len("file:"):])
+    module, _, name = spec.partition(":")
+    if not name:
+        raise ValueError(f"Canal de relances inconnu : {spec}")
+    return getattr(importlib.import_module(module), name)()
@@ -0,0 +1,94 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """ Levée quand le pool de hachage est saturé (la requête doit être rejetée en 503) """
+
+
+class PasswordHasher:
+    """
+    Hachage et vérification des mots de passe dans un pool de threads borné.
+
+    Au plus `workers` hachages s'exécutent en parallèle et `queue_size`
+    attendent leur tour ; au-delà, `HashingBusy` est levée immédiatement :
+    une rafale de connexions ne peut ni monopoliser le CPU ni bloquer les
+    threads des autres endpoints.
+
+    Attributs:
+    - method (str) : Méthode werkzeug, par ex. `pbkdf2:sha256:260000` ou `pbkdf2:sha512:600000`
+    - salt_length (int) : Longueur du sel
+    """
+
+    def __init__(self, method, salt_length=16, workers=4, queue_size=64):
+        self.method = method
+        self.salt_length = salt_length
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._canonical_method = None
+
+    def submit(self, func, *args):
+        """ Soumet un calcul au pool et retourne son `Future`, ou lève `HashingBusy` """
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy()
+        try:
+            future = self._pool.submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def submit_hash(self, password):
+        return self.submit(generate_password_hash, password, self.method, self.salt_length)
+
+    def submit_verify(self, password_hash, password):
+        return self.submit(check_password_hash, password_hash, password)
+
+    def hash(self, password):
+        return self.submit_hash(password).result()
+
+    def verify(self, password_hash, password):
+        return self.submit_verify(password_hash, password).result()
+
+    def needs_rehash(self, password_hash):
+        """ Vrai si le hash a été produit avec d'autres paramètres que `method` ou une autre longueur de sel """
+        parts = password_hash.split("$", 2)
+        return len(parts) < 3 or parts[0] != self.canonical_method() or len(parts[1]) != self.salt_length
+
+    def canonical_method(self):
+        """
+        Forme complète de `method` écrite par werkzeug en tête des hash
+        (`pbkdf2:sha256` -> `pbkdf2:sha256:260000`), déduite d'un hash de
+        référence calculé une seule fois, à la première comparaison.
+        """
+        if self._canonical_method is None:
+            self._canonical_method = generate_password_hash("reference", self.method, self.salt_length).split("$", 1)[0]
+        return self._canonical_method
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
+
+
+def init_hasher(app):
+    """
+    Crée le hacheur de mots de passe de l'application selon la configuration :
+    - `PASSWORD_HASH_METHOD` : méthode et paramètres werkzeug
+    - `PASSWORD_SALT_LENGTH` : longueur du sel
+    - `HASH_WORKERS` : hachages simultanés au maximum
+    - `HASH_QUEUE_SIZE` : hachages en attente au-delà desquels les requêtes sont rejetées (503)
+    """
+    app.extensions["hasher"] = PasswordHasher(
+        app.config["PASSWORD_HASH_METHOD"],
+        salt_length=app.config["PASSWORD_SALT_LENGTH"],
+        workers=app.config["HASH_WORKERS"],
+        queue_size=app.config["HASH_QUEUE_SIZE"],
+    )
+    return app.extensions["hasher"]
+
+
+def get_hasher():
+    """ Retourne le hacheur de l'application courante """
+    return current_app.extensions["hasher"]
@@ -0,0 +1,209 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, g, request
+from flask_jwt_extended import decode_token
+from app.logger import get_logger
+from app.utils import json_response
+
+logger = get_logger()
+
+# Routes jamais limitées (supervision)
+EXEMPT = {"metrics", "static"}
+
+
+class MemoryBuckets:
+    """
+    Seaux à jetons en mémoire du processus (un seau par client), thread-safe.
+
+    Chaque seau contient au plus `capacity` jetons et se remplit de `rate`
+    jetons par seconde ; les seaux les moins récemment utilisés sont évincés
+    au-delà de `max_keys` clients.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def take(self, key, cost, capacity, rate):
+        """
+        Retire `cost` jetons du seau `key` s'il en contient assez.
+
+        Returns:
+            tuple: (accepté, jetons restants, secondes avant d'en avoir assez).
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RedisBuckets:
+    """
+    Seaux à jetons partagés entre processus et serveurs, adossés à Redis
+    (dépendance optionnelle `redis`). Le remplissage et le retrait sont
+    atomiques (script Lua) et datés par l'horloge du serveur Redis.
+    """
+
+    SCRIPT = """
+    local capacity, rate, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url, prefix="library:ratelimit:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key, cost, capacity, rate):
+        allowed, tokens = self._script(keys=[self.prefix + key], args=[capacity, rate, cost])
+        tokens = float(tokens)
+        return bool(allowed), tokens, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RateLimiter:
+    """
+    Limitation du débit et délestage des requêtes coûteuses.
+
+    - Débit : un seau à jetons par client (identité JWT, sinon adresse IP) ;
+      chaque requête coûte le poids de sa route (`costs`, 1 par défaut).
+      Seau vide : `429 Too Many Requests` avec `Retry-After`.
+    - Délestage : au plus `max_in_flight` requêtes coûteuses (poids >=
+      `expensive_cost`) simultanées par processus ; au-delà : `503` avec
+      `Retry-After`, sans attendre ni solliciter MongoDB.
+
+    Attributs:
+    - buckets : Stockage des seaux (`MemoryBuckets`, `RedisBuckets` ou tout objet exposant `take`)
+    - capacity (int) : Jetons maximum par client (rafale tolérée)
+    - rate (float) : Jetons regagnés par seconde (débit soutenu)
+    - costs (dict) : Règle de routage, éventuellement précédée de la méthode (`GET /books`, `/search/books`, ...) -> poids
+    """
+
+    def __init__(self, buckets, capacity=100, rate=20.0, costs=None, expensive_cost=5, max_in_flight=16):
+        self.buckets = buckets
+        self.capacity = capacity
+        self.rate = rate
+        self.costs = costs or {}
+        self.expensive_cost = expensive_cost
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+
+    def cost(self, method, rule):
+        """ Poids de la requête : `"<MÉTHODE> <règle>"`, sinon `"<règle>"`, sinon 1 (plafonné à `capacity`) """
+        return min(self.costs.get(f"{method} {rule}", self.costs.get(rule, 1)), self.capacity)
+
+    def client_key(self):
+        """
+        Identité JWT si un token valide est présent, sinon adresse IP.
+
+        Le token n'est que décodé (signature, expiration) : la révocation, qui
+        coûte une lecture MongoDB, reste vérifiée par les routes protégées.
+        Sans en-tête `Authorization`, rien n'est décodé.
+        """
+        header = request.headers.get("Authorization", "")
+        identity = None
+        if header.startswith("Bearer "):
+            try:
+                identity = decode_token(header[7:]).get(current_app.config["JWT_IDENTITY_CLAIM"])
+            except Exception:
+                identity = None
+        return f"user:{identity}" if identity else f"ip:{request.remote_addr}"
+
+    def before_request(self):
+        if request.url_rule is None or request.endpoint in EXEMPT:
+            return None
+        cost = self.cost(request.method, request.url_rule.rule)
+        allowed, tokens, wait = self.buckets.take(self.client_key(), cost, self.capacity, self.rate)
+        g.ratelimit_remaining = int(tokens)
+        if not allowed:
+            logger.warning("Limite de débit atteinte : %s %s", request.method, request.path)
+            response = json_response({"message": "Trop de requêtes, réessayez plus tard"}, 429)
+            response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+            return response
+
+        if cost >= self.expensive_cost:
+            if not self._slots.acquire(blocking=False):
+                logger.warning("Délestage : trop de requêtes coûteuses en cours (%s)", request.path)
+                response = json_response({"message": "Serveur surchargé, réessayez dans quelques instants"}, 503)
+                response.headers["Retry-After"] = "1"
+                return response
+            g.ratelimit_slot = True
+        return None
+
+    def after_request(self, response):
+        if "ratelimit_remaining" in g:
+            response.headers["X-RateLimit-Limit"] = str(self.capacity)
+            response.headers["X-RateLimit-Remaining"] = str(g.ratelimit_remaining)
+        # Une réponse en streaming (export) occupe l'emplacement jusqu'à la fin de l'envoi
+        if g.pop("ratelimit_slot", False):
+            if response.is_streamed:
+                response.call_on_close(self._slots.release)
+            else:
+                self._slots.release()
+        return response
+
+    def teardown_request(self, exc=None):
+        # Exception non gérée : `after_request` n'a pas été appelé
+        if g.pop("ratelimit_slot", False):
+            self._slots.release()
+
+
+def init_ratelimit(app, buckets=None):
+    """
+    Applique la limitation de débit à toutes les routes de l'application selon la configuration :
+    - `RATE_LIMIT_ENABLED` : active la limitation
+    - `RATE_LIMIT_BACKEND` : `memory` (par processus, par défaut) ou `redis` (partagé)
+    - `RATE_LIMIT_CAPACITY` / `RATE_LIMIT_REFILL_PER_SECOND` : rafale et débit soutenu par client
+    - `RATE_LIMIT_COSTS` : poids des routes coûteuses
+    - `RATE_LIMIT_EXPENSIVE_COST` / `MAX_EXPENSIVE_IN_FLIGHT` : seuil de délestage par processus
+
+    `buckets` remplace le stockage configuré (tout objet exposant `take`).
+    """
+    if not app.config["RATE_LIMIT_ENABLED"]:
+        return None
+    if buckets is None:
+        if app.config["RATE_LIMIT_BACKEND"] == "redis":
+            buckets = RedisBuckets(app.config["RATE_LIMIT_REDIS_URL"])
+        else:
+            buckets = MemoryBuckets(max_keys=app.config["RATE_LIMIT_MAX_KEYS"])
+    limiter = RateLimiter(
+        buckets,
+        capacity=app.config["RATE_LIMIT_CAPACITY"],
+        rate=app.config["RATE_LIMIT_REFILL_PER_SECOND"],
+        costs=app.config["RATE_LIMIT_COSTS"],
+        expensive_cost=app.config["RATE_LIMIT_EXPENSIVE_COST"],
+        max_in_flight=app.config["MAX_EXPENSIVE_IN_FLIGHT"],
+    )
+    app.before_request(limiter.before_request)
+    app.after_request(limiter.after_request)
+    app.teardown_request(limiter.teardown_request)
+    app.extensions["ratelimit"] = limiter
+    return limiter
+
+
+def get_limiter():
+    """ Retourne le limiteur de l'application courante (None s'il est désactivé) """
+    return current_app.extensions.get("ratelimit")
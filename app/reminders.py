@@ -0,0 +1,188 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from app.config import Config
+from app.logger import get_logger
+from app.models import Book, Borrow, Checkpoint, User, due_date
+from app.utils import keyset_after
+
+logger = get_logger()
+
+# Ordre de parcours des emprunts échus, servi par l'index `(date_retour, date_echeance, _id)`
+ORDER = [("date_echeance", 1), ("_id", 1)]
+
+
+def checkpoint_name(niveau):
+    return f"relances.{niveau}"
+
+
+def _payloads(docs, niveau, now):
+    """ Construit les relances d'un lot ; utilisateurs et livres sont lus en une requête `$in` chacun """
+    users = {
+        u["_id"]: u for u in User._get_collection().find(
+            {"_id": {"$in": list({d["user"] for d in docs})}}, {"email": 1, "username": 1}
+        )
+    }
+    books = {
+        b["_id"]: b for b in Book._get_collection().find({"_id": {"$in": list({d["book"] for d in docs})}}, {"titre": 1})
+    }
+    return [
+        {
+            "borrow_id": str(doc["_id"]),
+            "user_id": str(doc["user"]),
+            "email": users.get(doc["user"], {}).get("email"),
+            "username": users.get(doc["user"], {}).get("username"),
+            "book_id": str(doc["book"]),
+            "titre": books.get(doc["book"], {}).get("titre"),
+            "date_echeance": doc["date_echeance"].isoformat(),
+            "jours_de_retard": (now - doc["date_echeance"]).days,
+            "niveau": niveau,
+        }
+        for doc in docs
+    ]
+
+
+def _process_level(notifier, niveau, upper, now, batch_size, report, unsent_ids):
+    """
+    Envoie les relances de niveau `niveau` aux emprunts en cours échus
+    avant `upper`, par lots, en reprenant au point de reprise du niveau.
+    Les emprunts dont l'envoi a échoué (`unsent_ids`) ne reçoivent pas de
+    relance de niveau inférieur pendant le même passage.
+
+    Une exception du canal d'envoi annule les réservations du lot comme un
+    envoi refusé, puis interrompt le niveau.
+
+    Returns:
+        bool: False si le canal a levé une exception (passage à interrompre).
+    """
+    borrows = Borrow._get_collection()
+    checkpoints = Checkpoint._get_collection()
+    name = checkpoint_name(niveau)
+    checkpoint = checkpoints.find_one({"_id": name}) or {}
+    failed = False
+
+    while True:
+        query = {"date_retour": None, "date_echeance": {"$lte": upper}}
+        if checkpoint.get("value"):
+            query = {"$and": [query, keyset_after(ORDER, [checkpoint["value"], checkpoint["position"]])]}
+        fields = {"user": 1, "book": 1, "date_echeance": 1, "relances": 1}
+        page = list(borrows.find(query, fields).sort(ORDER).limit(batch_size))
+        if not page:
+            return True
+        report["traites"] += len(page)
+        report["lots"] += 1
+
+        # Réservation atomique : un emprunt déjà relancé à ce niveau (passage
+        # précédent, niveau supérieur ou traitement concurrent) est ignoré.
+        due = [doc for doc in page if doc.get("relances", 0) < niveau and doc["_id"] not in unsent_ids]
+        if due:
+            lot = uuid.uuid4().hex
+            ids = [doc["_id"] for doc in due]
+            borrows.update_many(
+                {"_id": {"$in": ids}, "date_retour": None, "relances": {"$not": {"$gte": niveau}}},
+                {"$set": {"relances": niveau, "lot_relance": lot}},
+            )
+            claimed = {doc["_id"] for doc in borrows.find({"_id": {"$in": ids}, "lot_relance": lot}, {"_id": 1})}
+            docs = [doc for doc in due if doc["_id"] in claimed]
+            error = None
+            try:
+                sent = notifier.send(_payloads(docs, niveau, now)) if docs else set()
+            except Exception as e:
+                logger.error("Échec du canal de relances (niveau %s) : %s", niveau, e)
+                sent, error = set(), e
+            report["notifies"] += len(sent)
+
+            # Relances non envoyées : l'emprunt retrouve son état et sera proposé à nouveau
+            unsent = [doc for doc in docs if str(doc["_id"]) not in sent]
+            if unsent:
+                borrows.bulk_write([
+                    UpdateOne({"_id": doc["_id"], "lot_relance": lot}, {"$set": {"relances": doc.get("relances", 0)}})
+                    for doc in unsent
+                ], ordered=False)
+                report["echecs"] += len(unsent)
+                unsent_ids.update(doc["_id"] for doc in unsent)
+                failed = True
+            if error is not None:
+                report["erreur"] = str(error)
+                return False
+
+        last = page[-1]
+        checkpoint = {"value": last["date_echeance"], "position": last["_id"]}
+        if not failed:
+            checkpoints.update_one({"_id": name}, {"$set": dict(checkpoint, updated_at=now)}, upsert=True)
+
+
+def send_reminders(notifier, now=None, batch_size=None):
+    """
+    Envoie les relances des emprunts en retard.
+
+    Chaque niveau de relance correspond à un délai après l'échéance
+    (`REMINDER_DELAYS_DAYS`, par ex. 0, 7 et 14 jours). Pour chaque niveau,
+    du plus élevé au plus bas, les emprunts en cours échus avant
+    `now - délai` sont lus par lots bornés (plage de l'index
+    `(date_retour, date_echeance, _id)`, pagination par curseur) ; un emprunt
+    très en retard ne reçoit donc que la relance de plus haut niveau.
+
+    Le point de reprise de chaque niveau (dernière échéance et `_id` traités)
+    évite de reparcourir les emprunts déjà traités, et le compteur
+    `relances` de l'emprunt, réservé atomiquement avant l'envoi, empêche
+    toute double relance (passages concurrents ou point de reprise perdu).
+    Le point de reprise n'avance plus après un échec d'envoi : les relances
+    non envoyées sont reproposées au passage suivant. Si le canal lève une
+    exception (serveur SMTP indisponible...), les réservations du lot sont
+    annulées et le passage s'arrête : le rapport porte alors `erreur`.
+
+    Args:
+        notifier (Notifier): Canal d'envoi (voir `app.notifications`).
+        now (datetime): Heure de référence (UTC), par défaut l'heure courante.
+        batch_size (int): Emprunts lus par lot (`REMINDER_BATCH_SIZE` par défaut).
+
+    Returns:
+        dict: Emprunts traités et notifiés, échecs d'envoi, lots, durée et débit
+        (emprunts/s), et `erreur` si le canal a levé une exception.
+    """
+    now = now or datetime.utcnow()
+    batch_size = batch_size or Config.REMINDER_BATCH_SIZE
+    report = {"traites": 0, "notifies": 0, "echecs": 0, "lots": 0}
+    start = time.perf_counter()
+    levels = sorted(enumerate(Config.REMINDER_DELAYS_DAYS, start=1), reverse=True)
+    unsent_ids = set()
+    for niveau, delay in levels:
+        if not _process_level(notifier, niveau, now - timedelta(days=delay), now, batch_size, report, unsent_ids):
+            break
+    report["secondes"] = round(time.perf_counter() - start, 3)
+    report["par_seconde"] = round(report["traites"] / report["secondes"], 1) if report["secondes"] else None
+    logger.info(
+        "🔔 Relances : %s emprunt(s) traité(s), %s relance(s) envoyée(s), %s échec(s) en %ss (%s emprunts/s)",
+        report["traites"], report["notifies"], report["echecs"], report["secondes"], report["par_seconde"],
+    )
+    return report
+
+
+def backfill_due_dates(batch_size=None):
+    """
+    Renseigne `date_echeance` des emprunts en cours antérieurs à ce champ,
+    par lots, puis réinitialise les points de reprise des relances : ces
+    emprunts, échus dans le passé, sont ainsi examinés au passage suivant.
+
+    Returns:
+        int: Nombre d'emprunts mis à jour.
+    """
+    batch_size = batch_size or Config.REMINDER_BATCH_SIZE
+    borrows = Borrow._get_collection()
+    updated = 0
+    while True:
+        page = list(borrows.find({"date_retour": None, "date_echeance": None}, {"date_emprunt": 1}).limit(batch_size))
+        if not page:
+            break
+        borrows.bulk_write([
+            UpdateOne({"_id": doc["_id"]}, {"$set": {"date_echeance": due_date(doc.get("date_emprunt") or datetime.utcnow())}})
+            for doc in page
+        ], ordered=False)
+        updated += len(page)
+    if updated:
+        names = [checkpoint_name(niveau) for niveau in range(1, len(Config.REMINDER_DELAYS_DAYS) + 1)]
+        Checkpoint._get_collection().delete_many({"_id": {"$in": names}})
+    logger.info("🔔 Échéances renseignées pour %s emprunt(s) en cours", updated)
+    return updated
@@ -1,12 +1,80 @@
+import re
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+from bson import ObjectId
 from flask_restful import Resource, reqparse
-from flask import jsonify
+from flask import request
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from mongoengine.errors import ValidationError, DoesNotExist
 from app.models import Author, Book, Borrow, User
-from app.logger import setup_logger
-from app.utils import serialize_doc
+from app.logger import get_logger
+from app.config import Config
+from app.cache import get_cache
+from app.versions import conditional, current_version, invalidate
+from app.identity import current_user_record
+from app.bulk import FORMATS, import_books, read_rows
+from app.circulation import HISTORY, borrow_books, return_borrows, user_borrows
+from app import stats
+from app.utils import (
+    serialize_doc, serialize_raw, json_response, paginate, parse_fields, parse_expand, expand_references,
+    encode_cursor, decode_cursor,
+)
 
-logger = setup_logger()
+logger = get_logger()
+
+MONTH = re.compile(r"\d{4}-(0[1-9]|1[0-2])")
+
+
+def paginated_response(model, queryset, namespace=None):
+    """
+    Construit la réponse d'une liste paginée par curseur.
+
+    Paramètres de requête :
+    - `limit` : taille de la page (plafonnée à `Config.PAGE_SIZE_MAX`).
+    - `cursor` : curseur opaque renvoyé par la page précédente.
+    - `fields` : projection, ex. `fields=titre,stock`.
+    - `expand` : références à intégrer, ex. `expand=user,book` ; chaque
+      collection référencée est chargée en une seule requête `$in`.
+
+    Le corps reste une liste JSON ; le curseur de la page suivante est exposé
+    dans l'en-tête `X-Next-Cursor` (et `Link: rel="next"`). Si `namespace` est
+    fourni, la page est servie par le cache de lecture (voir `app.cache`).
+
+    Returns:
+        tuple: (réponse Flask, documents sérialisés de la page).
+
+    Raises:
+        ValueError: Si le curseur ou la projection sont invalides.
+    """
+    parser = reqparse.RequestParser()
+    parser.add_argument("limit", type=int, location="args", default=Config.PAGE_SIZE)
+    parser.add_argument("cursor", type=str, location="args")
+    parser.add_argument("fields", type=str, location="args")
+    parser.add_argument("expand", type=str, location="args")
+    args = parser.parse_args()
+
+    limit = max(1, min(args["limit"], Config.PAGE_SIZE_MAX))
+    fields = parse_fields(model, args["fields"])
+    expand = parse_expand(model, args["expand"])
+
+    def load():
+        page, next_cursor = paginate(queryset, args["cursor"], limit, fields)
+        return {"items": expand_references(model, serialize_raw(model, page), expand), "next": next_cursor}
+
+    if namespace:
+        query_key = f"{limit}:{args['cursor'] or ''}:{','.join(fields or [])}:{','.join(expand)}"
+        # Une page étendue dépend aussi des collections référencées
+        version = current_version() if expand else current_version(namespace)
+        data = get_cache().list(namespace, query_key, load, version=version)
+    else:
+        data = load()
+
+    response = json_response(data["items"])
+    if data["next"]:
+        query = dict(request.args, cursor=data["next"])
+        response.headers["X-Next-Cursor"] = data["next"]
+        response.headers["Link"] = f'<{request.base_url}?{urlencode(query)}>; rel="next"'
+    return response, data["items"]
 
 
 class AuthorResource(Resource):
@@ -17,21 +85,27 @@ class AuthorResource(Resource):
     - DELETE: Supprimer un auteur par ID.
     """
 
+    @conditional("authors")
     def get(self, id=None):
-        """ Récupère un ou plusieurs auteurs """
+        """ Récupère un ou plusieurs auteurs (ETag / 304 si inchangé) """
         try:
             if id:
-                author = Author.objects.get(id=id)
-                logger.info(f"Auteur récupéré: {author.nom} {author.prenom}")
-                return jsonify(serialize_doc(author))
-            authors = Author.objects.all()
-            logger.info(f"Nombre d'auteurs récupérés: {len(authors)}")
-            return jsonify(serialize_doc(authors))
+                author = get_cache().item(
+                    "authors", id, lambda: serialize_doc(Author.objects.get(id=id)), version=current_version("authors")
+                )
+                logger.info("Auteur récupéré: %s %s", author['nom'], author['prenom'])
+                return json_response(author)
+            response, page = paginated_response(Author, Author.objects, namespace="authors")
+            logger.info("Nombre d'auteurs récupérés: %s", len(page))
+            return response
         except DoesNotExist:
-            logger.warning(f"Auteur avec ID {id} non trouvé.")
+            logger.warning("Auteur avec ID %s non trouvé.", id)
             return {"message": "Auteur non trouvé"}, 404
+        except ValueError as e:
+            logger.warning("Paramètres de pagination invalides: %s", e)
+            return {"message": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des auteurs: {str(e)}")
+            logger.error("Erreur lors de la récupération des auteurs: %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
@@ -45,13 +119,14 @@ class AuthorResource(Resource):
         try:
             author = Author(nom=args["nom"], prenom=args["prenom"])
             author.save()
-            logger.info(f"Auteur ajouté: {author.nom} {author.prenom}")
+            invalidate("authors")
+            logger.info("Auteur ajouté: %s %s", author.nom, author.prenom)
             return {"message": "Auteur ajouté", "id": str(author.id)}, 201
         except ValidationError as e:
-            logger.error(f"Erreur de validation: {str(e)}")
+            logger.error("Erreur de validation: %s", e)
             return {"error": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de l'ajout d'un auteur: {str(e)}")
+            logger.error("Erreur lors de l'ajout d'un auteur: %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
@@ -60,13 +135,14 @@ class AuthorResource(Resource):
         try:
             author = Author.objects.get(id=id)
             author.delete()
-            logger.info(f"Auteur supprimé: {id}")
+            invalidate("authors", id)
+            logger.info("Auteur supprimé: %s", id)
             return {"message": "Auteur supprimé"}, 200
         except DoesNotExist:
-            logger.warning(f"Auteur avec ID {id} non trouvé.")
+            logger.warning("Auteur avec ID %s non trouvé.", id)
             return {"message": "Auteur non trouvé"}, 404
         except Exception as e:
-            logger.error(f"Erreur lors de la suppression d'un auteur: {str(e)}")
+            logger.error("Erreur lors de la suppression d'un auteur: %s", e)
             return {"message": "Erreur serveur"}, 500
 
 
@@ -78,21 +154,35 @@ class BookResource(Resource):
     - DELETE: Supprimer un livre par ID.
     """
 
+    @conditional("books", "authors")
     def get(self, id=None):
-        """ Récupère un ou plusieurs livres """
+        """
+        Récupère un ou plusieurs livres (ETag / 304 si inchangé).
+
+        `expand=auteur` intègre l'auteur au lieu de son identifiant.
+        """
         try:
             if id:
-                book = Book.objects.get(id=id)
-                logger.info(f"Livre récupéré: {book.titre}")
-                return jsonify(serialize_doc(book))
-            books = Book.objects.all()
-            logger.info(f"Nombre de livres récupérés: {len(books)}")
-            return jsonify(serialize_doc(books))
+                expand = parse_expand(Book, request.args.get("expand"))
+                book = get_cache().item(
+                    "books",
+                    f"{id}:{','.join(expand)}" if expand else id,
+                    lambda: expand_references(Book, [serialize_doc(Book.objects.get(id=id))], expand)[0],
+                    version=current_version() if expand else current_version("books"),
+                )
+                logger.info("Livre récupéré: %s", book['titre'])
+                return json_response(book)
+            response, page = paginated_response(Book, Book.objects, namespace="books")
+            logger.info("Nombre de livres récupérés: %s", len(page))
+            return response
         except DoesNotExist:
-            logger.warning(f"Livre avec ID {id} non trouvé.")
+            logger.warning("Livre avec ID %s non trouvé.", id)
             return {"message": "Livre non trouvé"}, 404
+        except ValueError as e:
+            logger.warning("Paramètres de pagination invalides: %s", e)
+            return {"message": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des livres: {str(e)}")
+            logger.error("Erreur lors de la récupération des livres: %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
@@ -108,16 +198,17 @@ class BookResource(Resource):
             auteur = Author.objects.get(id=args["auteur_id"])
             book = Book(titre=args["titre"], auteur=auteur, stock=args["stock"])
             book.save()
-            logger.info(f"Livre ajouté: {book.titre}")
+            invalidate("books")
+            logger.info("Livre ajouté: %s", book.titre)
             return {"message": "Livre ajouté", "id": str(book.id)}, 201
         except DoesNotExist:
-            logger.warning(f"Auteur avec ID {args['auteur_id']} non trouvé.")
+            logger.warning("Auteur avec ID %s non trouvé.", args['auteur_id'])
             return {"message": "Auteur non trouvé"}, 404
         except ValidationError as e:
-            logger.error(f"Erreur de validation: {str(e)}")
+            logger.error("Erreur de validation: %s", e)
             return {"error": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de l'ajout d'un livre: {str(e)}")
+            logger.error("Erreur lors de l'ajout d'un livre: %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
@@ -126,22 +217,96 @@ class BookResource(Resource):
         try:
             book = Book.objects.get(id=id)
             book.delete()
-            logger.info(f"Livre supprimé: {id}")
+            invalidate("books", id)
+            logger.info("Livre supprimé: %s", id)
             return {"message": "Livre supprimé"}, 200
         except DoesNotExist:
-            logger.warning(f"Livre avec ID {id} non trouvé.")
+            logger.warning("Livre avec ID %s non trouvé.", id)
             return {"message": "Livre non trouvé"}, 404
         except Exception as e:
-            logger.error(f"Erreur lors de la suppression d'un livre: {str(e)}")
+            logger.error("Erreur lors de la suppression d'un livre: %s", e)
             return {"message": "Erreur serveur"}, 500
 
 
+class BookBulkResource(Resource):
+    """
+    API REST d'import massif de livres.
+    - POST: Importe un flux CSV ou NDJSON de livres (JWT requis).
+    """
+
+    @jwt_required()
+    def post(self):
+        """
+        Importe des livres par lots depuis le corps de la requête, lu en streaming.
+
+        **Requête :**
+        ```
+        POST /books/bulk?format=csv&chunk_size=1000
+        Content-Type: text/csv
+
+        titre,stock,auteur_nom,auteur_prenom
+        Les Misérables,5,Hugo,Victor
+        ```
+
+        Le format est déduit du `Content-Type` (`text/csv` ou
+        `application/x-ndjson`) ou forcé par `format=csv|ndjson`.
+
+        **Réponse :**
+        - `200` : Rapport d'import (lignes insérées, erreurs par ligne, lignes/s).
+        - `400` : Format non supporté.
+        """
+        fmt = request.args.get("format") or ("csv" if request.mimetype == "text/csv" else "ndjson")
+        if fmt not in FORMATS:
+            return {"message": f"Format non supporté : {fmt}"}, 400
+        chunk_size = max(1, request.args.get("chunk_size", 1000, type=int))
+
+        try:
+            report = import_books(read_rows(request.stream, fmt), chunk_size=chunk_size)
+            return report, 200
+        except Exception as e:
+            logger.error("Erreur lors de l'import de livres: %s", e)
+            return {"message": "Erreur serveur"}, 500
+
+
+def resolve_borrower(email):
+    """
+    Résout l'emprunteur : l'utilisateur du token (claims ou cache), sans
+    requête supplémentaire, ou l'utilisateur dont l'`email` est fourni.
+
+    Returns:
+        tuple: (utilisateur `{"id", "email"}`, None) ou (None, réponse d'erreur).
+    """
+    user = current_user_record()
+    if email and (not user or user["email"] != email):
+        found = User.objects(email=email).only("id", "email").as_pymongo().first()
+        if not found:
+            logger.warning("Utilisateur avec email %s non trouvé.", email)
+            return None, ({"message": "Utilisateur non trouvé"}, 404)
+        user = {"id": found["_id"], "email": found["email"]}
+    elif not user:
+        return None, ({"message": {"email": "L'email de l'utilisateur est obligatoire"}}, 400)
+    if not ObjectId.is_valid(user["id"]):
+        # Token dont l'identité n'est pas un identifiant d'utilisateur
+        logger.warning("Identité d'emprunteur invalide : %s", user["id"])
+        return None, ({"message": "Utilisateur non trouvé"}, 404)
+    return user, None
+
+
+def _check_batch(ids):
+    """ Valide la taille d'un lot (non vide, au plus `Config.BORROW_BATCH_MAX`) """
+    if not ids:
+        return {"message": "La liste est vide"}, 400
+    if len(ids) > Config.BORROW_BATCH_MAX:
+        return {"message": f"Au plus {Config.BORROW_BATCH_MAX} éléments par lot"}, 400
+    return None
+
+
 class BorrowResource(Resource):
     """
     API REST pour la gestion des emprunts.
     - GET: Récupérer la liste des emprunts ou un emprunt spécifique.
     - POST: Ajouter un nouvel emprunt (Vérifie la disponibilité du livre).
-    - DELETE: Supprimer un emprunt (Retour du livre en stock).
+    - DELETE: Retourner un emprunt (`date_retour` renseignée, livre remis en stock).
     """
 
     def get(self, id=None):
@@ -149,22 +314,27 @@ class BorrowResource(Resource):
         Récupère un ou plusieurs emprunts. 
 
         - Si `id` est fourni, retourne l'emprunt correspondant.
-        - Sinon, retourne la liste de tous les emprunts enregistrés.
+        - Sinon, retourne une page de la liste des emprunts (voir `paginated_response`).
+        - `expand=user,book` intègre l'utilisateur et/ou le livre au lieu de leurs identifiants.
         """
         try:
             if id:
+                expand = parse_expand(Borrow, request.args.get("expand"))
                 borrow = Borrow.objects.get(id=id)
-                logger.info(f"Emprunt récupéré: {borrow.id}")
-                return jsonify(serialize_doc(borrow))
+                logger.info("Emprunt récupéré: %s", borrow.id)
+                return json_response(expand_references(Borrow, [serialize_doc(borrow)], expand)[0])
 
-            all_borrows = Borrow.objects.all()
-            logger.info(f"Nombre d'emprunts récupérés: {len(all_borrows)}")
-            return jsonify(serialize_doc(all_borrows))
+            response, page = paginated_response(Borrow, Borrow.objects)
+            logger.info("Nombre d'emprunts récupérés: %s", len(page))
+            return response
         except DoesNotExist:
-            logger.warning(f"Emprunt avec ID {id} non trouvé.")
+            logger.warning("Emprunt avec ID %s non trouvé.", id)
             return {"message": "Emprunt non trouvé"}, 404
+        except ValueError as e:
+            logger.warning("Paramètres de pagination invalides: %s", e)
+            return {"message": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de la récupération des emprunts: {str(e)}")
+            logger.error("Erreur lors de la récupération des emprunts: %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
@@ -180,7 +350,8 @@ class BorrowResource(Resource):
         }
         ```
 
-        **JWT Requis** : L'utilisateur doit être authentifié.
+        **JWT Requis** : L'utilisateur doit être authentifié. Sans `email`, le
+        livre est emprunté par l'utilisateur du token, sans requête supplémentaire.
 
         **Réponse :**
         - `201` : Emprunt enregistré avec succès.
@@ -189,77 +360,309 @@ class BorrowResource(Resource):
         - `500` : Erreur serveur.
         """
         parser = reqparse.RequestParser()
-        parser.add_argument("email", required=True, help="L'email de l'utilisateur est obligatoire")
+        parser.add_argument("email", required=False)
         parser.add_argument("book_id", required=True, help="L'ID du livre est obligatoire")
         args = parser.parse_args()
 
         try:
-            # Recherche de l'utilisateur par e-mail
-            user = User.objects(email=args["email"]).first()
-            if not user:
-                logger.warning(f"Utilisateur avec email {args['email']} non trouvé.")
-                return {"message": "Utilisateur non trouvé"}, 404
-
-            # Recherche du livre par ID
-            book = Book.objects.get(id=args["book_id"])
-            if book.stock <= 0:
-                logger.warning(f"Livre '{book.titre}' non disponible en stock.")
+            user, error = resolve_borrower(args["email"])
+            if error:
+                return error
+
+            # Décrément atomique et conditionnel du stock (find_one_and_update) :
+            # deux emprunts concurrents ne peuvent pas réserver le même exemplaire.
+            book = Book.objects(id=args["book_id"], stock__gt=0).modify(dec__stock=1, inc__en_pret=1, new=True)
+            if book is None:
+                if not Book.objects(id=args["book_id"]).only("id").first():
+                    raise DoesNotExist
+                logger.warning("Livre %s non disponible en stock.", args['book_id'])
                 return {"message": "Livre non disponible"}, 400
 
-            # Création de l'emprunt
-            borrow = Borrow(user=user, book=book)
-            borrow.save()
-
-            # Mise à jour du stock
-            book.stock -= 1
-            book.save()
-
-            logger.info(f"📖 Emprunt ajouté : {borrow.id} (Utilisateur: {user.email}, Livre: {book.titre})")
+            # Création de l'emprunt ; en cas d'échec, l'exemplaire réservé est restitué
+            try:
+                borrow = Borrow(user=ObjectId(user["id"]), book=book)
+                borrow.save()
+            except Exception:
+                Book.objects(id=book.id).update_one(inc__stock=1, dec__en_pret=1)
+                raise
+            finally:
+                invalidate("books", str(book.id))
+
+            logger.info("📖 Emprunt ajouté : %s (Utilisateur: %s, Livre: %s)", borrow.id, user["email"], book.titre)
             return {"message": "Emprunt enregistré avec succès", "borrow_id": str(borrow.id)}, 201
 
         except DoesNotExist:
             logger.error("Utilisateur ou livre non trouvé.")
             return {"message": "Utilisateur ou livre non trouvé"}, 404
         except ValidationError as e:
-            logger.error(f"Erreur de validation : {str(e)}")
+            logger.error("Erreur de validation : %s", e)
             return {"error": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de l'emprunt : {str(e)}")
+            logger.error("Erreur lors de l'emprunt : %s", e)
             return {"message": "Erreur serveur"}, 500
 
     @jwt_required()
     def delete(self, id):
-        """ Supprime un emprunt (Retourne le livre en stock) """
+        """ Retourne un emprunt : il est conservé avec sa `date_retour` et le livre revient en stock """
         try:
-            borrow = Borrow.objects.get(id=id)
-            book = borrow.book
-
-            # Réincrémenter le stock du livre
-            book.stock += 1
-            book.save()
-
-            borrow.delete()
-            return {"message": "Emprunt supprimé et livre retourné"}, 200
+            # Retour atomique (find_one_and_update) : un même emprunt ne peut être
+            # retourné qu'une seule fois, même en cas de requêtes concurrentes.
+            borrow = Borrow.objects(id=id, date_retour=None).no_dereference().modify(
+                set__date_retour=datetime.utcnow(), new=True
+            )
+            if borrow is None:
+                raise DoesNotExist
+
+            # Remettre l'exemplaire en stock
+            Book.objects(id=borrow.book.id).update_one(inc__stock=1, dec__en_pret=1)
+            invalidate("books", str(borrow.book.id))
+            return {"message": "Livre retourné", "date_retour": borrow.date_retour.isoformat()}, 200
         except DoesNotExist:
             return {"message": "Emprunt non trouvé"}, 404
 
-  
-class BookSearchResource(Resource):
+
+class BorrowBatchResource(Resource):
     """
-    API REST pour la recherche de livres par titre.
+    API d'emprunt groupé pour les postes de prêt : une pile de livres
+    empruntée par un même utilisateur en une seule requête.
     """
 
-    def get(self):
+    @jwt_required()
+    def post(self):
         """
-        Recherche des livres uniquement par **titre**.
+        Emprunte plusieurs livres pour un même utilisateur.
 
         **Requête :**
         ```json
         {
-            "titre": "Harry Potter"
+            "email": "user@example.com",
+            "book_ids": ["65ab13df...", "65ab13e0..."]
         }
         ```
 
+        L'utilisateur est résolu une seule fois (comme `POST /borrow`), les
+        livres sont lus en une requête `$in`, le stock de chaque livre est
+        réservé par une mise à jour conditionnelle et les emprunts sont
+        insérés en une opération groupée (voir `app.circulation.borrow_books`).
+        Chaque livre reçoit son propre résultat (`status`, `borrow_id` ou
+        `message`) : un livre indisponible n'empêche pas les autres emprunts.
+
+        **Réponse :**
+        - `201` : Tous les emprunts sont enregistrés.
+        - `207` : Au moins un livre a échoué (détail par livre).
+        - `400` : Validation incorrecte (liste vide ou trop longue).
+        - `404` : Utilisateur introuvable.
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument("email", required=False)
+        parser.add_argument("book_ids", type=list, location="json", required=True,
+                            help="La liste des IDs de livres est obligatoire")
+        args = parser.parse_args()
+
+        error = _check_batch(args["book_ids"])
+        if error:
+            return error
+        user, error = resolve_borrower(args["email"])
+        if error:
+            return error
+        try:
+            results = borrow_books(ObjectId(user["id"]), [str(b) for b in args["book_ids"]])
+        except Exception as e:
+            logger.error("Erreur lors de l'emprunt groupé : %s", e)
+            return {"message": "Erreur serveur"}, 500
+        return {"results": results}, 201 if all(r["status"] == 201 for r in results) else 207
+
+
+class BorrowReturnsResource(Resource):
+    """
+    API de retour groupé : une pile d'emprunts retournée en une seule requête.
+    """
+
+    @jwt_required()
+    def post(self):
+        """
+        Retourne plusieurs emprunts (les livres sont remis en stock).
+
+        **Requête :**
+        ```json
+        {"borrow_ids": ["65ab13df...", "65ab13e0..."]}
+        ```
+
+        Chaque emprunt ne peut être retourné qu'une fois, même par des
+        retours concurrents (voir `app.circulation.return_borrows`).
+
+        **Réponse :**
+        - `200` : Tous les emprunts sont retournés.
+        - `207` : Au moins un emprunt est introuvable (détail par emprunt).
+        - `400` : Validation incorrecte (liste vide ou trop longue).
+        """
+        parser = reqparse.RequestParser()
+        parser.add_argument("borrow_ids", type=list, location="json", required=True,
+                            help="La liste des IDs d'emprunts est obligatoire")
+        args = parser.parse_args()
+
+        error = _check_batch(args["borrow_ids"])
+        if error:
+            return error
+        try:
+            results = return_borrows([str(b) for b in args["borrow_ids"]])
+        except Exception as e:
+            logger.error("Erreur lors du retour groupé : %s", e)
+            return {"message": "Erreur serveur"}, 500
+        return {"results": results}, 200 if all(r["status"] == 200 for r in results) else 207
+
+
+class UserBorrowsResource(Resource):
+    """
+    API de l'historique des emprunts d'un utilisateur (portail usager).
+
+    - GET `/users/<id>/borrows?status=active|returned&since=...` : emprunts en
+      cours ou retournés de l'utilisateur, paginés par curseur.
+    """
+
+    @jwt_required()
+    def get(self, id):
+        """
+        Retourne une page des emprunts de l'utilisateur, du plus récent au plus ancien.
+
+        Paramètres de requête :
+        - `status` : `active` (en cours) ou `returned` (retournés) ; tous par défaut.
+        - `since` : date ISO 8601 ; emprunts (ou retours pour `returned`) postérieurs.
+        - `limit`, `cursor` : pagination (curseur suivant dans `X-Next-Cursor`).
+        - `expand=book` : intègre les livres (une requête `$in`).
+
+        **JWT Requis** : un utilisateur ne consulte que ses propres emprunts.
+
+        **Réponse :**
+        - `200` : Liste compacte (`_id`, `book`, `date_emprunt`, `date_retour`).
+        - `400` : Paramètre ou identifiant d'utilisateur invalide.
+        - `403` : Emprunts d'un autre utilisateur.
+        """
+        if not ObjectId.is_valid(id):
+            return {"message": "ID d'utilisateur invalide"}, 400
+        if get_jwt_identity() != id:
+            return {"message": "Accès refusé"}, 403
+
+        parser = reqparse.RequestParser()
+        parser.add_argument("status", type=str, location="args", choices=[s for s in HISTORY if s],
+                            help="Statut attendu : active ou returned")
+        parser.add_argument("since", type=str, location="args")
+        parser.add_argument("limit", type=int, location="args", default=Config.PAGE_SIZE)
+        parser.add_argument("cursor", type=str, location="args")
+        parser.add_argument("expand", type=str, location="args")
+        args = parser.parse_args()
+
+        try:
+            since = datetime.fromisoformat(args["since"]) if args["since"] else None
+            if since and since.tzinfo:
+                since = since.astimezone(timezone.utc).replace(tzinfo=None)
+            expand = parse_expand(Borrow, args["expand"])
+            limit = max(1, min(args["limit"], Config.PAGE_SIZE_MAX))
+            page, next_cursor = user_borrows(ObjectId(id), args["status"], since, args["cursor"], limit)
+        except ValueError as e:
+            logger.warning("Paramètres d'historique invalides: %s", e)
+            return {"message": str(e)}, 400
+
+        items = expand_references(Borrow, serialize_raw(Borrow, page), expand)
+        response = json_response(items)
+        if next_cursor:
+            query = dict(request.args, cursor=next_cursor)
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{request.base_url}?{urlencode(query)}>; rel="next"'
+        logger.info("Historique de l'utilisateur %s : %s emprunt(s)", id, len(items))
+        return response
+
+
+class StatsResource(Resource):
+    """
+    API de statistiques de circulation, servie depuis les agrégats précalculés
+    (`flask --app run refresh-stats`) et non depuis l'historique des emprunts.
+
+    - GET `/stats/books/top` : Livres les plus empruntés.
+    - GET `/stats/users/active` : Utilisateurs ayant le plus d'emprunts en cours.
+    - GET `/stats/overdue` : Total des emprunts en retard et utilisateurs concernés.
+    - GET `/stats/authors/monthly?auteur=&depuis=AAAA-MM&jusqu_a=AAAA-MM` : Emprunts par auteur et par mois.
+
+    La fraîcheur des agrégats est indiquée par l'en-tête `X-Stats-As-Of`.
+    """
+
+    REPORTS = {
+        "books/top": lambda args: stats.top_books(args["limit"]),
+        "users/active": lambda args: stats.active_users(args["limit"]),
+        "overdue": lambda args: stats.overdue(args["limit"]),
+        "authors/monthly": lambda args: stats.authors_monthly(
+            args["limit"], auteur=args["auteur"], depuis=args["depuis"], jusqu_a=args["jusqu_a"]
+        ),
+    }
+
+    @conditional("stats")
+    def get(self, report):
+        """
+        Retourne un rapport précalculé.
+
+        **Réponse :**
+        - `200` : Rapport demandé.
+        - `400` : Paramètre invalide.
+        - `404` : Rapport inconnu.
+        """
+        if report not in self.REPORTS:
+            return {"message": "Rapport inconnu", "rapports": sorted(self.REPORTS)}, 404
+
+        parser = reqparse.RequestParser()
+        parser.add_argument("limit", type=int, location="args", default=10)
+        parser.add_argument("auteur", type=str, location="args")
+        parser.add_argument("depuis", type=str, location="args")
+        parser.add_argument("jusqu_a", type=str, location="args")
+        args = parser.parse_args()
+        args["limit"] = max(1, min(args["limit"], Config.PAGE_SIZE_MAX))
+
+        for key in ("depuis", "jusqu_a"):
+            if args[key] and not MONTH.fullmatch(args[key]):
+                return {"message": {key: "Mois attendu au format AAAA-MM"}}, 400
+        if args["auteur"] and not ObjectId.is_valid(args["auteur"]):
+            return {"message": {"auteur": "ID d'auteur invalide"}}, 400
+
+        try:
+            response = json_response(self.REPORTS[report](args))
+        except Exception as e:
+            logger.error("Erreur lors du calcul du rapport %s : %s", report, e)
+            return {"message": "Erreur serveur"}, 500
+        as_of = stats.as_of()
+        if as_of:
+            response.headers["X-Stats-As-Of"] = as_of.isoformat()
+        return response
+
+
+class BookSearchResource(Resource):
+    """
+    API REST pour la recherche plein texte de livres par titre et/ou par auteur.
+
+    La recherche s'appuie sur les index texte MongoDB de `Book.titre` et de
+    `Author.nom`/`Author.prenom` : insensible à la casse et aux accents
+    ("Miserables" trouve "Les Misérables"), avec racinisation française et
+    tri par pertinence.
+    """
+
+    @conditional("books", "authors")
+    def get(self):
+        """
+        Recherche des livres par **titre** et/ou par **auteur**.
+
+        **Requête :**
+        ```
+        GET /search/books?titre=Miserables&auteur=Hugo&limit=20&cursor=...
+        ```
+
+        Au moins un des paramètres `titre` ou `auteur` est obligatoire. Avec
+        `titre`, les résultats sont triés par pertinence (`score`, puis `_id`
+        pour un ordre stable entre les pages) ; sinon par `_id`, paginés par
+        curseur sans `skip`. La page suivante est indiquée par l'en-tête
+        `X-Next-Cursor`.
+
+        `auteur` est résolu en au plus `SEARCH_AUTHORS_MAX` auteurs, les plus
+        pertinents ; au-delà, l'en-tête `X-Authors-Truncated: true` signale
+        que des livres d'auteurs moins pertinents sont omis.
+
         **Réponse :**
         - `200` : Liste des livres correspondants.
         - `404` : Aucun livre trouvé.
@@ -267,22 +670,64 @@ class BookSearchResource(Resource):
         - `500` : Erreur serveur.
         """
         parser = reqparse.RequestParser()
-        parser.add_argument("titre", type=str, location="args", required=True, help="Le titre est obligatoire pour la recherche")
+        parser.add_argument("titre", type=str, location="args")
+        parser.add_argument("auteur", type=str, location="args")
+        parser.add_argument("limit", type=int, location="args", default=Config.PAGE_SIZE)
+        parser.add_argument("cursor", type=str, location="args")
         args = parser.parse_args()
 
-        try:
-            books = Book.objects(titre__icontains=args["titre"])  # Recherche insensible à la casse
-            
-            if books:
-                logger.info(f"{len(books)} livre(s) trouvé(s) pour le titre '{args['titre']}'")
-                return jsonify(serialize_doc(books))
-
-            logger.warning(f"Aucun livre trouvé pour le titre '{args['titre']}'")
-            return {"message": "Aucun livre trouvé"}, 404
+        if not args["titre"] and not args["auteur"]:
+            return {"message": "Le titre ou l'auteur est obligatoire pour la recherche"}, 400
 
-        except ValidationError as e:
-            logger.error(f"Erreur de validation: {str(e)}")
+        try:
+            limit = max(1, min(args["limit"], Config.PAGE_SIZE_MAX))
+            # Curseur : rang (tri par pertinence) ou dernier `_id` (tri par `_id`)
+            position = decode_cursor(args["cursor"])[0] if args["cursor"] else None
+            if args["titre"]:
+                offset = position or 0
+                if not isinstance(offset, int) or offset < 0:
+                    raise ValueError("Curseur invalide")
+            elif position is not None and not isinstance(position, ObjectId):
+                raise ValueError("Curseur invalide")
+
+            books = Book.objects
+            truncated = False
+            if args["auteur"]:
+                # Résolution des auteurs par leur index texte, puis filtre indexé sur `auteur`
+                auteurs = Author.objects.search_text(args["auteur"]).order_by("$text_score", "id")
+                ids = list(auteurs.limit(Config.SEARCH_AUTHORS_MAX + 1).scalar("id"))
+                truncated = len(ids) > Config.SEARCH_AUTHORS_MAX
+                books = books.filter(auteur__in=ids[:Config.SEARCH_AUTHORS_MAX])
+            if args["titre"]:
+                # Le score n'est pas filtrable : pagination par rang, départagée par `_id`
+                books = books.search_text(args["titre"]).order_by("$text_score", "id").skip(offset)
+            else:
+                books = books.order_by("id")
+                if position is not None:
+                    books = books.filter(id__gt=position)
+
+            page = list(books.limit(limit + 1).no_dereference().as_pymongo())
+            if not page:
+                logger.warning("Aucun livre trouvé pour '%s' / '%s'", args['titre'] or '', args['auteur'] or '')
+                return {"message": "Aucun livre trouvé"}, 404
+
+            for raw in page:
+                if "_text_score" in raw:
+                    raw["score"] = raw.pop("_text_score")
+            response = json_response(serialize_raw(Book, page[:limit]))
+            if len(page) > limit:
+                next_position = offset + limit if args["titre"] else page[limit - 1]["_id"]
+                response.headers["X-Next-Cursor"] = encode_cursor([next_position])
+            if truncated:
+                response.headers["X-Authors-Truncated"] = "true"
+            logger.info(
+                "%s livre(s) trouvé(s) pour '%s' / '%s'", len(page[:limit]), args["titre"] or "", args["auteur"] or ""
+            )
+            return response
+
+        except (ValidationError, ValueError) as e:
+            logger.error("Erreur de validation: %s", e)
             return {"error": str(e)}, 400
         except Exception as e:
-            logger.error(f"Erreur lors de la recherche des livres: {str(e)}")
-            return {"message": "Erreur serveur"}, 500
\ No newline at end of file
+            logger.error("Erreur lors de la recherche des livres: %s", e)
+            return {"message": "Erreur serveur"}, 500
@@ -0,0 +1,282 @@
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.config import Config
+from app.logger import get_logger
+from app.models import Author, AuthorMonthStats, Book, BookStats, Borrow, Checkpoint, User, UserStats
+from app.versions import bump_version
+
+logger = get_logger()
+
+# Points de reprise : emprunts (`date_emprunt`), retours (`date_retour`), calcul des retards
+BORROWS = "stats.emprunts"
+RETURNS = "stats.retours"
+OVERDUE = "stats.retards"
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _to_millis(value):
+    """ Tronque à la milliseconde, précision des dates stockées par MongoDB """
+    return value.replace(microsecond=value.microsecond // 1000 * 1000)
+
+
+def _claim(name, upper):
+    """
+    Réserve la fenêtre à agréger pour le point de reprise `name`.
+
+    La fenêtre ]value, upper] est inscrite dans `pending` avant l'agrégation,
+    sans avancer `value` : si l'agrégation échoue, la même fenêtre est rejouée
+    au rafraîchissement suivant. La réservation est conditionnée à la valeur
+    lue : de deux rafraîchissements concurrents, un seul l'obtient.
+
+    Returns:
+        tuple: Bornes (inférieure exclue, supérieure incluse) de la fenêtre,
+        ou None si la fenêtre est vide ou réservée par un autre rafraîchissement.
+    """
+    checkpoints = Checkpoint._get_collection()
+    checkpoint = checkpoints.find_one({"_id": name}) or {}
+    current = checkpoint.get("value")
+    lower = current or EPOCH
+    if checkpoint.get("pending"):
+        # Fenêtre réservée mais non confirmée (rafraîchissement interrompu) : rejouée telle quelle
+        return lower, checkpoint["pending"]
+    if lower >= upper:
+        return None
+    try:
+        result = checkpoints.update_one(
+            {"_id": name, "value": current, "pending": None},
+            {"$set": {"pending": upper, "updated_at": datetime.utcnow()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return None
+    return (lower, upper) if result.matched_count or result.upserted_id is not None else None
+
+
+def _commit(name, upper):
+    """ Avance le point de reprise `name` jusqu'à la fenêtre réservée `upper`, une fois agrégée """
+    Checkpoint._get_collection().update_one(
+        {"_id": name, "pending": upper},
+        {"$set": {"value": upper, "updated_at": datetime.utcnow()}, "$unset": {"pending": ""}},
+    )
+
+
+def _bulk_apply(model, operations):
+    """
+    Applique des incréments marqués par fenêtre (voir `_increments`).
+
+    Un document déjà marqué pour la fenêtre ne correspond plus au filtre :
+    l'upsert tente alors une insertion refusée (clé dupliquée), ignorée ici.
+    """
+    if not operations:
+        return
+    try:
+        model._get_collection().bulk_write(operations, ordered=False)
+    except BulkWriteError as error:
+        if any(e.get("code") != 11000 for e in error.details.get("writeErrors", [])):
+            raise
+
+
+def _window_filter(_id, key, upper):
+    """ Filtre d'un agrégat qui n'a pas encore reçu la fenêtre `key` se terminant à `upper` """
+    return {"_id": _id, f"fenetres.{key}": {"$not": {"$gte": upper}}}
+
+
+def _increments(model, rows, key, upper, **fields):
+    """
+    Ajoute les comptes agrégés (`{"_id", "n"}`) aux compteurs de `model` en une écriture groupée.
+
+    Chaque document retient dans `fenetres.<key>` la borne de la dernière
+    fenêtre reçue : rejouer une fenêtre interrompue ne recompte pas les
+    documents déjà mis à jour.
+    """
+    _bulk_apply(model, [
+        UpdateOne(
+            _window_filter(row["_id"], key, upper),
+            {"$inc": {field: sign * row["n"] for field, sign in fields.items()}, "$set": {f"fenetres.{key}": upper}},
+            upsert=True,
+        )
+        for row in rows if row["_id"] is not None
+    ])
+    return sum(row["n"] for row in rows)
+
+
+def _apply_borrows(lower, upper):
+    """ Agrège les emprunts de la fenêtre ]lower, upper] dans les trois agrégats """
+    borrows = Borrow._get_collection()
+    window = {"$match": {"date_emprunt": {"$gt": lower, "$lte": upper}}}
+
+    count = _increments(BookStats, list(borrows.aggregate([
+        window, {"$group": {"_id": "$book", "n": {"$sum": 1}}},
+    ])), "emprunts", upper, emprunts=1)
+    _increments(UserStats, list(borrows.aggregate([
+        window, {"$group": {"_id": "$user", "n": {"$sum": 1}}},
+    ])), "emprunts", upper, emprunts=1, en_cours=1)
+
+    months = list(borrows.aggregate([
+        window,
+        {"$lookup": {"from": Book._get_collection_name(), "localField": "book", "foreignField": "_id", "as": "livre"}},
+        {"$unwind": "$livre"},
+        {"$group": {
+            "_id": {"auteur": "$livre.auteur", "mois": {"$dateToString": {"format": "%Y-%m", "date": "$date_emprunt"}}},
+            "n": {"$sum": 1},
+        }},
+    ]))
+    _bulk_apply(AuthorMonthStats, [
+        UpdateOne(
+            _window_filter(f"{row['_id']['auteur']}:{row['_id']['mois']}", "emprunts", upper),
+            {"$inc": {"emprunts": row["n"]}, "$set": {"fenetres.emprunts": upper}, "$setOnInsert": row["_id"]},
+            upsert=True,
+        )
+        for row in months
+    ])
+    return count
+
+
+def _apply_returns(lower, upper):
+    """ Retire des emprunts en cours les retours de la fenêtre ]lower, upper] """
+    rows = list(Borrow._get_collection().aggregate([
+        {"$match": {"date_retour": {"$gt": lower, "$lte": upper}}},
+        {"$group": {"_id": "$user", "n": {"$sum": 1}}},
+    ]))
+    return _increments(UserStats, rows, "retours", upper, en_cours=-1)
+
+
+def _refresh_overdue(now):
+    """
+    Recalcule les emprunts en retard par utilisateur (dépend de l'heure, donc
+    non incrémental) : seuls les emprunts en cours échus sont lus, via l'index
+    `(date_retour, date_echeance, _id)`.
+    """
+    rows = list(Borrow._get_collection().aggregate([
+        {"$match": {"date_retour": None, "date_echeance": {"$lt": now}}},
+        {"$group": {"_id": "$user", "n": {"$sum": 1}}},
+    ]))
+    stats = UserStats._get_collection()
+    late = [row["_id"] for row in rows]
+    stats.update_many({"en_retard": {"$gt": 0}, "_id": {"$nin": late}}, {"$set": {"en_retard": 0}})
+    if rows:
+        stats.bulk_write(
+            [UpdateOne({"_id": row["_id"]}, {"$set": {"en_retard": row["n"]}}, upsert=True) for row in rows],
+            ordered=False,
+        )
+    Checkpoint.objects(name=OVERDUE).update_one(set__value=now, set__updated_at=now, upsert=True)
+    return sum(row["n"] for row in rows)
+
+
+def refresh_stats(rebuild=False, now=None):
+    """
+    Rafraîchit incrémentalement les agrégats de circulation.
+
+    Seuls les emprunts dont `date_emprunt` (et les retours dont `date_retour`)
+    est postérieure au point de reprise sont agrégés, puis le point de reprise
+    avance. La fenêtre s'arrête `STATS_SAFETY_LAG` secondes avant l'heure
+    courante : un emprunt horodaté par l'application mais inséré un peu plus
+    tard n'est pas manqué. Les retards sont recalculés à chaque passage.
+
+    Le point de reprise n'avance qu'une fois la fenêtre agrégée : une fenêtre
+    interrompue est rejouée au passage suivant, sans recompter les agrégats
+    déjà mis à jour.
+
+    Args:
+        rebuild (bool): Vide les agrégats et les recalcule depuis l'origine.
+        now (datetime): Heure de référence (UTC), par défaut l'heure courante.
+
+    Returns:
+        dict: Emprunts et retours agrégés, emprunts en retard, borne de la fenêtre.
+    """
+    now = now or datetime.utcnow()
+    if rebuild:
+        for model in (BookStats, UserStats, AuthorMonthStats):
+            model._get_collection().delete_many({})
+        Checkpoint.objects(name__in=[BORROWS, RETURNS, OVERDUE]).delete()
+
+    upper = _to_millis(now - timedelta(seconds=Config.STATS_SAFETY_LAG))
+    report = {"emprunts": 0, "retours": 0, "jusqu_a": upper}
+    for name, key, apply in ((BORROWS, "emprunts", _apply_borrows), (RETURNS, "retours", _apply_returns)):
+        # Une fenêtre interrompue est d'abord rejouée, puis la suivante réservée
+        window = _claim(name, upper)
+        while window is not None:
+            report[key] += apply(*window)
+            _commit(name, window[1])
+            window = _claim(name, upper) if window[1] < upper else None
+    report["en_retard"] = _refresh_overdue(now)
+
+    bump_version("stats")
+    logger.info(
+        "📊 Statistiques rafraîchies jusqu'au %s : %s emprunt(s), %s retour(s), %s en retard",
+        upper.isoformat(), report["emprunts"], report["retours"], report["en_retard"],
+    )
+    return report
+
+
+def as_of():
+    """ Borne de la dernière fenêtre agrégée (fraîcheur des statistiques), ou None """
+    checkpoint = Checkpoint.objects(name=BORROWS).only("value").as_pymongo().first()
+    return checkpoint.get("value") if checkpoint else None
+
+
+def _names(model, ids, fields):
+    """ Charge en une requête `$in` les champs d'affichage des documents référencés """
+    return {doc.pop("_id"): doc for doc in model.objects(id__in=list(ids)).only(*fields).as_pymongo()}
+
+
+def top_books(limit):
+    """ Livres les plus empruntés """
+    rows = list(BookStats.objects.order_by("-emprunts").limit(limit).as_pymongo())
+    titles = _names(Book, [row["_id"] for row in rows], ["titre"])
+    return [
+        {"book_id": str(row["_id"]), "titre": titles.get(row["_id"], {}).get("titre"), "emprunts": row["emprunts"]}
+        for row in rows
+    ]
+
+
+def _user_rows(rows):
+    users = _names(User, [row["_id"] for row in rows], ["username"])
+    return [
+        {
+            "user_id": str(row["_id"]),
+            "username": users.get(row["_id"], {}).get("username"),
+            "en_cours": row.get("en_cours", 0),
+            "en_retard": row.get("en_retard", 0),
+        }
+        for row in rows
+    ]
+
+
+def active_users(limit):
+    """ Utilisateurs ayant le plus d'emprunts en cours """
+    return _user_rows(list(UserStats.objects(en_cours__gt=0).order_by("-en_cours").limit(limit).as_pymongo()))
+
+
+def overdue(limit):
+    """ Nombre total d'emprunts en retard et utilisateurs les plus en retard """
+    total = next(iter(UserStats._get_collection().aggregate([
+        {"$match": {"en_retard": {"$gt": 0}}},
+        {"$group": {"_id": None, "n": {"$sum": "$en_retard"}}},
+    ])), {}).get("n", 0)
+    rows = list(UserStats.objects(en_retard__gt=0).order_by("-en_retard").limit(limit).as_pymongo())
+    return {"total": total, "utilisateurs": _user_rows(rows)}
+
+
+def authors_monthly(limit, auteur=None, depuis=None, jusqu_a=None):
+    """ Emprunts par auteur et par mois (`depuis`/`jusqu_a` au format `AAAA-MM`, inclus) """
+    query = AuthorMonthStats.objects
+    if auteur:
+        query = query.filter(auteur=auteur)
+    if depuis:
+        query = query.filter(mois__gte=depuis)
+    if jusqu_a:
+        query = query.filter(mois__lte=jusqu_a)
+    rows = list(query.order_by("mois", "-emprunts").limit(limit).as_pymongo())
+    authors = _names(Author, {row["auteur"] for row in rows}, ["nom", "prenom"])
+    return [
+        {
+            "auteur_id": str(row["auteur"]),
+            "auteur": " ".join(filter(None, (authors.get(row["auteur"], {}).get(k) for k in ("prenom", "nom")))),
+            "mois": row["mois"],
+            "emprunts": row["emprunts"],
+        }
+        for row in rows
+    ]
@@ -1,12 +1,269 @@
-from bson import ObjectId
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from bson import DBRef, ObjectId, json_util
+from flask import Response
+from mongoengine import Document, DateTimeField, ObjectIdField, ReferenceField
+from mongoengine.queryset import QuerySet
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - backend optionnel
+    orjson = None
 
 
 def serialize_doc(doc):
     """ Convertit un document MongoDB en JSON sérialisable """
+    if isinstance(doc, QuerySet):
+        return serialize_queryset(doc)
+    if isinstance(doc, Document):
+        return serialize_raw(type(doc), [doc.to_mongo()])[0]
     if isinstance(doc, list):
         return [serialize_doc(d) for d in doc]
     if isinstance(doc, dict):
         return {k: serialize_doc(v) for k, v in doc.items()}
     if isinstance(doc, ObjectId):
         return str(doc)
+    if isinstance(doc, DBRef):
+        return str(doc.id)
+    if isinstance(doc, datetime):
+        return doc.isoformat()
     return doc
+
+
+def _convert_id(value):
+    """ ObjectId ou DBRef (référence) -> chaîne """
+    if isinstance(value, DBRef):
+        return str(value.id)
+    return str(value) if value is not None else None
+
+
+def _convert_datetime(value):
+    return value.isoformat() if value is not None else None
+
+
+# Plans de sérialisation précompilés par modèle : {champ_bson: convertisseur}
+_FIELD_PLANS = {}
+
+# Marqueur des champs jamais exposés par l'API (ex. mot de passe haché)
+_HIDDEN = object()
+HIDDEN_FIELDS = {"User": {"password"}}
+
+
+def field_plan(model):
+    """
+    Retourne le plan de sérialisation d'un modèle : pour chaque champ BSON, la
+    fonction de conversion à appliquer (`None` si la valeur est déjà
+    sérialisable). Le plan est calculé une seule fois par modèle.
+    """
+    plan = _FIELD_PLANS.get(model)
+    if plan is None:
+        plan = {}
+        hidden = HIDDEN_FIELDS.get(model.__name__, set())
+        for name, field in model._fields.items():
+            if name in hidden:
+                converter = _HIDDEN
+            elif isinstance(field, (ObjectIdField, ReferenceField)):
+                converter = _convert_id
+            elif isinstance(field, DateTimeField):
+                converter = _convert_datetime
+            elif getattr(field, "field", None) is not None or hasattr(field, "document_type"):
+                # Champs composés (listes, documents imbriqués) : conversion générique
+                converter = serialize_doc
+            else:
+                converter = None
+            plan[field.db_field] = converter
+        _FIELD_PLANS[model] = plan
+    return plan
+
+
+def serialize_raw(model, raw_docs):
+    """
+    Sérialise des documents BSON bruts (`as_pymongo()`) selon le plan du modèle,
+    sans hydrater d'objets MongoEngine.
+    """
+    plan = field_plan(model)
+    result = []
+    for raw in raw_docs:
+        item = {}
+        for key, value in raw.items():
+            converter = plan.get(key, serialize_doc)
+            if converter is _HIDDEN:
+                continue
+            item[key] = converter(value) if converter is not None else value
+        result.append(item)
+    return result
+
+
+def serialize_queryset(queryset):
+    """
+    Sérialise un QuerySet en lisant directement le BSON brut, sans
+    déréférencement des `ReferenceField`.
+    """
+    return serialize_raw(queryset._document, queryset.no_dereference().as_pymongo())
+
+
+def parse_expand(model, expand):
+    """
+    Convertit le paramètre `expand=user,book` en liste de `ReferenceField` du modèle.
+
+    Raises:
+        ValueError: Si un champ n'existe pas ou n'est pas une référence.
+    """
+    names = parse_fields(model, expand) or []
+    invalid = [n for n in names if not isinstance(model._fields[n], ReferenceField)]
+    if invalid:
+        raise ValueError(f"Champ(s) non extensible(s) : {', '.join(invalid)}")
+    return names
+
+
+def expand_references(model, items, fields):
+    """
+    Remplace, dans des documents déjà sérialisés, les identifiants des
+    références `fields` par les documents référencés.
+
+    Chaque collection référencée est chargée en une seule requête `$in`
+    (au lieu d'un déréférencement par document). Une référence orpheline
+    est remplacée par None.
+    """
+    for name in fields:
+        field = model._fields[name]
+        target = field.document_type
+        key = field.db_field
+        ids = {item[key] for item in items if item.get(key)}
+        if not ids:
+            continue
+        queryset = target.objects(id__in=[ObjectId(i) for i in ids])
+        hidden = HIDDEN_FIELDS.get(target.__name__)
+        if hidden:
+            queryset = queryset.exclude(*hidden)
+        by_id = {doc["_id"]: doc for doc in serialize_queryset(queryset)}
+        for item in items:
+            if item.get(key):
+                item[key] = by_id.get(item[key])
+    return items
+
+
+def dumps(data):
+    """ Encode en JSON (bytes) avec orjson s'il est installé, sinon `json` """
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def json_response(data, status=200):
+    """ Construit une réponse Flask JSON à partir de données déjà sérialisées """
+    return Response(dumps(data), status=status, mimetype="application/json")
+
+
+def duplicates_pipeline(fields, limit=20):
+    """
+    Agrégation listant les valeurs de `fields` portées par plusieurs documents
+    (ce qui empêche de construire un index unique) : `_id` (valeurs), `ids`, `count`.
+    """
+    pipeline = [
+        {"$group": {"_id": {field: f"${field}" for field in fields}, "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"count": -1}},
+    ]
+    return pipeline + [{"$limit": limit}] if limit else pipeline
+
+
+def encode_cursor(values):
+    """
+    Encode les valeurs de la clé de tri du dernier élément d'une page
+    en un curseur opaque (base64 URL-safe).
+    """
+    payload = json_util.dumps(list(values)).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """
+    Décode un curseur produit par `encode_cursor`.
+
+    Raises:
+        ValueError: Si le curseur est invalide.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError("Curseur invalide") from e
+    if not isinstance(values, list) or not values:
+        raise ValueError("Curseur invalide")
+    return values
+
+
+def parse_fields(model, fields):
+    """
+    Convertit le paramètre `fields=titre,stock` en liste de champs du modèle.
+
+    Raises:
+        ValueError: Si un champ n'existe pas dans le modèle.
+    """
+    if not fields:
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in names if f not in model._fields]
+    if unknown:
+        raise ValueError(f"Champ(s) inconnu(s) : {', '.join(unknown)}")
+    return names
+
+
+def paginate(queryset, cursor=None, limit=50, fields=None):
+    """
+    Pagination par curseur (keyset) sur `_id`.
+
+    Chaque page est une plage d'index `_id > curseur` triée et limitée : aucun
+    `count()` ni `skip()`, le coût est le même à la première et à la
+    dix-millième page.
+
+    Args:
+        queryset: QuerySet MongoEngine à paginer.
+        cursor (str): Curseur opaque renvoyé par la page précédente.
+        limit (int): Nombre maximal de documents à retourner.
+        fields (list): Champs à projeter avec `.only()` (`id` toujours inclus).
+
+    Returns:
+        tuple: (documents BSON bruts de la page, curseur suivant ou None).
+    """
+    if cursor:
+        last_id = decode_cursor(cursor)[0]
+        if not isinstance(last_id, ObjectId):
+            raise ValueError("Curseur invalide")
+        queryset = queryset.filter(id__gt=last_id)
+    if fields:
+        queryset = queryset.only("id", *fields)
+
+    # On lit un document de plus pour savoir s'il existe une page suivante
+    page = list(queryset.order_by("id").limit(limit + 1).no_dereference().as_pymongo())
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_cursor([page[-1]["_id"]])
+    return page, next_cursor
+
+
+def keyset_after(sort, values):
+    """
+    Condition MongoDB sélectionnant les documents situés après `values` dans
+    l'ordre `sort` (pagination par curseur sur une clé de tri composée).
+
+    Args:
+        sort (list): Clé de tri `[(champ, 1 ou -1), ...]`, terminée par un champ unique (`_id`).
+        values (list): Valeurs de la clé de tri du dernier document de la page précédente.
+
+    Returns:
+        dict: Filtre `$or` : `k1 > v1`, ou `k1 = v1 et k2 > v2`, ... (`<` pour un tri décroissant).
+    """
+    if len(values) != len(sort):
+        raise ValueError("Curseur invalide")
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: v for (f, _), v in zip(sort[:i], values[:i])}
+        clause[field] = {"$gt" if direction > 0 else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
@@ -0,0 +1,105 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+from flask import Response, g, request
+from app.cache import get_cache
+from app.models import CollectionVersion
+
+
+def get_versions(*namespaces):
+    """
+    Lit en une requête les versions des espaces demandés.
+
+    Returns:
+        dict: Espace -> (version, date de dernière écriture ou None).
+    """
+    found = {
+        doc["_id"]: (doc.get("version", 0), doc.get("updated_at"))
+        for doc in CollectionVersion.objects(name__in=namespaces).as_pymongo()
+    }
+    return {name: found.get(name, (0, None)) for name in namespaces}
+
+
+def bump_version(namespace):
+    """ Incrémente atomiquement la version d'un espace (upsert), avec la date précise de l'écriture """
+    now = datetime.utcnow()
+    CollectionVersion.objects(name=namespace).update_one(inc__version=1, set__updated_at=now, upsert=True)
+
+
+def invalidate(namespace, id=None, ids=()):
+    """
+    Signale une écriture sur un espace : invalide le cache de lecture et
+    incrémente la version utilisée par les ETag (une seule fois, quel que
+    soit le nombre d'éléments `ids` modifiés).
+    """
+    get_cache().invalidate(namespace, id, ids)
+    bump_version(namespace)
+
+
+def http_last_modified(last_write):
+    """
+    Valeur de `Last-Modified` (précision : la seconde) pour une dernière
+    écriture `last_write` : arrondie à la seconde supérieure, et None tant
+    que cette seconde n'est pas écoulée. Une écriture ultérieure est ainsi
+    toujours postérieure à la date annoncée.
+    """
+    if last_write is None:
+        return None
+    ceiling = last_write.replace(microsecond=0) + timedelta(seconds=1 if last_write.microsecond else 0)
+    return ceiling.replace(tzinfo=timezone.utc) if ceiling <= datetime.utcnow() else None
+
+
+def current_version(*namespaces):
+    """
+    Version des espaces lue par `conditional` pour la requête courante, sinon
+    None. Sans argument : version composite de tous les espaces de la
+    requête, pour une réponse qui dépend de plusieurs collections (`expand`).
+    """
+    versions = getattr(g, "collection_versions", {})
+    namespaces = namespaces or tuple(sorted(versions))
+    if not namespaces or any(name not in versions for name in namespaces):
+        return None
+    return ".".join(str(versions[name]) for name in namespaces)
+
+
+def conditional(*namespaces):
+    """
+    Décorateur de requêtes conditionnelles HTTP (ETag / If-None-Match,
+    Last-Modified / If-Modified-Since).
+
+    L'ETag est dérivé de l'URL demandée et des versions des espaces dont
+    dépend la réponse : une requête dont l'ETag correspond reçoit un
+    `304 Not Modified` sans qu'aucun document ne soit lu.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            versions = get_versions(*namespaces)
+            g.collection_versions = {name: version for name, (version, _) in versions.items()}
+
+            key = f"{request.full_path}|" + "|".join(f"{n}:{v}" for n, (v, _) in sorted(versions.items()))
+            etag = hashlib.sha1(key.encode()).hexdigest()[:20]
+            dates = [d for _, d in versions.values() if d is not None]
+            last_write = max(dates).replace(tzinfo=timezone.utc) if dates else None
+            last_modified = http_last_modified(max(dates) if dates else None)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                # Comparaison avec la date précise : une écriture dans la seconde
+                # annoncée par `If-Modified-Since` invalide la copie du client
+                since = request.if_modified_since
+                not_modified = bool(since and last_write and last_write <= since)
+            if not_modified:
+                response = Response(status=304)
+            else:
+                response = func(*args, **kwargs)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,396 @@
+"""
+Banc de charge de tous les endpoints de l'API.
+
+1. **Jeu de données** : insère `--scale` livres (10k, 100k, 1M...), un auteur
+   et un utilisateur pour 10 livres et un emprunt pour 2 livres, par lots
+   `insert_many`, puis construit les index (`ensure_indexes`). `--skip-seed`
+   réutilise une base déjà remplie.
+2. **Charge** : sert l'application dans un serveur WSGI multithreadé local
+   (ou vise `--url`) et, pour chaque endpoint, maintient `--concurrency`
+   requêtes en vol pendant `--duration` secondes, sur des identifiants tirés
+   au hasard dans la base. Les scénarios qui consomment des données
+   (suppressions, retours, emprunts, déconnexion) reçoivent avant leur mesure,
+   hors chronométrage, un lot de `--pool` documents ou tokens neufs : chaque
+   requête vise une cible intacte et les scénarios suivants ne sont pas
+   faussés.
+3. **Résultats** : req/s, p50/p95/p99 et répartition des codes HTTP par
+   endpoint, écrits en JSON (`--output`) ; avec `--baseline`, chaque endpoint
+   est comparé à un run précédent et le script échoue (code 1) si le débit
+   baisse ou si p95 augmente de plus de `--max-regression`, ou si de
+   nouvelles erreurs apparaissent.
+
+Avec `--mongomock`, la base est simulée en mémoire (aucun `mongod` requis) :
+les chiffres ne sont alors comparables qu'entre eux, et la recherche plein
+texte (`$text`) n'est pas disponible. Nécessite `pip install mongomock`.
+
+Usage :
+    python -m benchmarks.bench_api --scale 100k --uri mongodb://localhost:27017/library_bench \\
+        --concurrency 32 --duration 10 --output bench.json
+    python -m benchmarks.bench_api --scale 10k --mongomock --endpoint books_list --endpoint book_get
+    python -m benchmarks.bench_api --skip-seed --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import random
+import subprocess
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+from werkzeug.serving import make_server
+
+from benchmarks.load_http import drive
+
+BATCH_SIZE = 10000
+SAMPLE_SIZE = 10000
+# Livres par requête des scénarios groupés (`/borrow/batch`, `/borrow/returns`, `/books/bulk`)
+BATCH_BOOKS = 5
+BULK_ROWS = 100
+# Utilisateurs dont le token est préparé pour `/users/<id>/borrows`
+TOKEN_USERS = 1000
+PASSWORD = "bench-password"
+WORDS = ("misérables", "château", "océan", "mémoire", "forêt", "été", "histoire", "voyage", "nuit", "guerre")
+NOMS = ("Hugo", "Zola", "Camus", "Sand", "Verne", "Dumas", "Proust", "Colette", "Balzac", "Duras")
+
+
+def parse_scale(value):
+    """ Convertit `10k`, `100k`, `1M` ou `5000` en nombre de livres """
+    units = {"k": 1000, "m": 1000000}
+    value = value.strip().lower()
+    return int(float(value[:-1]) * units[value[-1]]) if value[-1] in units else int(value)
+
+
+def insert_batches(collection, docs):
+    """ Insère un générateur de documents par lots de `BATCH_SIZE` et retourne les identifiants """
+    ids, batch = [], []
+    for doc in docs:
+        batch.append(doc)
+        if len(batch) == BATCH_SIZE:
+            ids += collection.insert_many(batch, ordered=False).inserted_ids
+            batch = []
+    if batch:
+        ids += collection.insert_many(batch, ordered=False).inserted_ids
+    return ids
+
+
+def seed(scale, rng):
+    """ Vide puis remplit la base ; retourne le nombre de documents par collection """
+    from app.commands import ensure_indexes
+    from app.models import Author, Book, Borrow, CollectionVersion, User
+
+    for model in (Author, Book, User, Borrow, CollectionVersion):
+        model._get_collection().delete_many({})
+
+    n_authors = n_users = max(1, scale // 10)
+    password = generate_password_hash(PASSWORD)
+    authors = insert_batches(Author._get_collection(), (
+        {"nom": f"{rng.choice(NOMS)} {i}", "prenom": f"Prénom {i}"} for i in range(n_authors)
+    ))
+    books = insert_batches(Book._get_collection(), (
+        {
+            "titre": f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {i}",
+            "auteur": rng.choice(authors),
+            "stock": rng.randint(0, 20),
+        }
+        for i in range(scale)
+    ))
+    users = insert_batches(User._get_collection(), (
+        {"username": f"bench{i}", "email": f"bench{i}@example.com", "password": password} for i in range(n_users)
+    ))
+    now = datetime.utcnow()
+
+    def borrow():
+        emprunt = now - timedelta(days=rng.randint(0, 365))
+        retour = emprunt + timedelta(days=rng.randint(1, 30)) if rng.random() < 0.5 else None
+        return {"user": rng.choice(users), "book": rng.choice(books), "date_emprunt": emprunt, "date_retour": retour}
+
+    borrows = insert_batches(Borrow._get_collection(), (borrow() for _ in range(scale // 2)))
+    ensure_indexes()
+    return {"authors": len(authors), "books": len(books), "users": len(users), "borrows": len(borrows)}
+
+
+def book_doc(rng, authors, titre, stock=0, en_pret=0):
+    """ Livre prêt à insérer, compteurs cohérents (`exemplaires` = `stock` + `en_pret`) """
+    return {"titre": titre, "auteur": rng.choice(authors), "stock": stock, "exemplaires": stock + en_pret,
+            "en_pret": en_pret}
+
+
+def open_borrows(data, rng, count):
+    """ Insère `count` emprunts en cours sur des livres dédiés (`en_pret` à jour) et retourne leurs identifiants """
+    from app.models import Book, Borrow
+
+    authors = [a["_id"] for a in data["authors"]]
+    n_books = max(1, min(count, 1000))
+    loans = [count // n_books + (i < count % n_books) for i in range(n_books)]
+    books = insert_batches(Book._get_collection(), (
+        book_doc(rng, authors, f"Prêté {i}", en_pret=n) for i, n in enumerate(loans)
+    ))
+    now = datetime.utcnow()
+    return insert_batches(Borrow._get_collection(), (
+        {
+            "user": rng.choice(data["users"])["_id"],
+            "book": books[i % n_books],
+            "date_emprunt": now,
+            "date_echeance": now + timedelta(days=21),
+            "date_retour": None,
+        }
+        for i in range(count)
+    ))
+
+
+def prepare(name, data, rng, size):
+    """
+    Prépare, hors chronométrage, les données consommées par le scénario `name`
+    (dans `data["pool"]`) : auteurs et livres à supprimer, emprunts à
+    retourner, livres en stock, tokens à révoquer, agrégats des statistiques.
+    """
+    from flask_jwt_extended import create_access_token
+    from app.models import Author, Book
+    from app.stats import refresh_stats
+
+    authors = [a["_id"] for a in data["authors"]]
+    if name == "register":
+        data["run"] = uuid.uuid4().hex[:8]
+    elif name == "logout":
+        data["pool"] = [create_access_token(identity=str(rng.choice(data["users"])["_id"])) for _ in range(size)]
+    elif name == "author_delete":
+        data["pool"] = insert_batches(Author._get_collection(), (
+            {"nom": f"Éphémère {i}", "prenom": "Bench"} for i in range(size)
+        ))
+    elif name == "book_delete":
+        data["pool"] = insert_batches(Book._get_collection(), (
+            book_doc(rng, authors, f"Éphémère {i}", stock=1) for i in range(size)
+        ))
+    elif name == "borrow_batch":
+        # Livres largement approvisionnés : les emprunts ne tombent pas en rupture pendant la mesure
+        data["pool"] = insert_batches(Book._get_collection(), (
+            book_doc(rng, authors, f"Stock {i}", stock=size) for i in range(min(size, 1000))
+        ))
+    elif name == "borrow_return":
+        data["pool"] = open_borrows(data, rng, size)
+    elif name == "borrow_returns":
+        data["pool"] = open_borrows(data, rng, size * BATCH_BOOKS)
+    elif name == "books_bulk":
+        data["pool"] = b"".join(
+            json.dumps({"titre": f"Import {i}", "stock": 1, "auteur_nom": rng.choice(NOMS), "auteur_prenom": "Bench"})
+            .encode() + b"\n"
+            for i in range(BULK_ROWS)
+        )
+    elif name == "user_borrows":
+        data["pool"] = [
+            (user["_id"], create_access_token(identity=str(user["_id"]))) for user in data["users"][:TOKEN_USERS]
+        ]
+    elif name.startswith("stats_") and not data.get("stats"):
+        data["stats"] = refresh_stats(rebuild=True)
+
+
+def sample():
+    """ Tire des identifiants et des valeurs existants pour construire les requêtes """
+    from app.models import Author, Book, Borrow, User
+
+    def docs(model, projection):
+        return list(model._get_collection().find({}, projection).limit(SAMPLE_SIZE))
+
+    return {
+        "authors": docs(Author, {"nom": 1}),
+        "books": docs(Book, {"titre": 1}),
+        "users": docs(User, {"email": 1}),
+        "borrows": docs(Borrow, {"_id": 1}),
+    }
+
+
+def scenarios(data, rng):
+    """
+    Endpoint -> fonction `i -> (méthode, chemin, kwargs)`.
+
+    Les scénarios qui lisent `data["pool"]` sont préparés par `prepare` ; la
+    requête `i` consomme le `i`-ème élément du lot (au-delà, le lot est
+    reparcouru et les cibles déjà consommées répondent 404 ou 207).
+    """
+    pick = rng.choice
+
+    def pool(i, n=1):
+        items = data["pool"]
+        return [items[(i * n + k) % len(items)] for k in range(n)]
+
+    def bearer(token):
+        return {"headers": {"Authorization": f"Bearer {token}"}}
+
+    return {
+        "authors_list": lambda i: ("GET", "/authors?limit=50", {}),
+        "author_get": lambda i: ("GET", f"/authors/{pick(data['authors'])['_id']}", {}),
+        "books_list": lambda i: ("GET", "/books?limit=50", {}),
+        "books_list_expand": lambda i: ("GET", "/books?limit=50&expand=auteur", {}),
+        "book_get": lambda i: ("GET", f"/books/{pick(data['books'])['_id']}", {}),
+        "search_titre": lambda i: ("GET", f"/search/books?titre={pick(WORDS)}", {}),
+        "search_auteur": lambda i: ("GET", f"/search/books?auteur={pick(NOMS)}", {}),
+        "borrows_list": lambda i: ("GET", "/borrow?limit=50", {}),
+        "borrow_get": lambda i: ("GET", f"/borrow/{pick(data['borrows'])['_id']}", {}),
+        "borrow_create": lambda i: ("POST", "/borrow", {"json": {
+            "email": pick(data["users"])["email"],
+            "book_id": str(pick(data["books"])["_id"]),
+        }}),
+        "login": lambda i: ("POST", "/login", {"json": {
+            "email": (user := pick(data["users"]))["email"],
+            "username": user["email"].split("@")[0],
+            "password": PASSWORD,
+        }}),
+        "register": lambda i: ("POST", "/register", {"json": {
+            "username": f"bench-{data['run']}-{i}",
+            "email": f"bench-{data['run']}-{i}@example.com",
+            "password": PASSWORD,
+        }}),
+        "logout": lambda i: ("POST", "/logout", bearer(pool(i)[0])),
+        "author_create": lambda i: ("POST", "/authors", {"json": {"nom": f"{pick(NOMS)} {i}", "prenom": "Bench"}}),
+        "author_delete": lambda i: ("DELETE", f"/authors/{pool(i)[0]}", {}),
+        "book_create": lambda i: ("POST", "/books", {"json": {
+            "titre": f"{pick(WORDS).capitalize()} {i}",
+            "auteur_id": str(pick(data["authors"])["_id"]),
+            "stock": 1,
+        }}),
+        "book_delete": lambda i: ("DELETE", f"/books/{pool(i)[0]}", {}),
+        "books_bulk": lambda i: ("POST", "/books/bulk?format=ndjson", {"content": data["pool"]}),
+        "export_authors": lambda i: ("GET", "/export/authors", {}),
+        "export_books": lambda i: ("GET", "/export/books", {}),
+        "borrow_return": lambda i: ("DELETE", f"/borrow/{pool(i)[0]}", {}),
+        "borrow_batch": lambda i: ("POST", "/borrow/batch", {"json": {
+            "email": pick(data["users"])["email"],
+            "book_ids": [str(book) for book in rng.sample(data["pool"], min(BATCH_BOOKS, len(data["pool"])))],
+        }}),
+        "borrow_returns": lambda i: ("POST", "/borrow/returns", {"json": {
+            "borrow_ids": [str(borrow) for borrow in pool(i, BATCH_BOOKS)],
+        }}),
+        "user_borrows": lambda i: (
+            "GET", f"/users/{(user := pick(data['pool']))[0]}/borrows?limit=50", bearer(user[1]),
+        ),
+        "stats_books_top": lambda i: ("GET", "/stats/books/top", {}),
+        "stats_users_active": lambda i: ("GET", "/stats/users/active", {}),
+        "stats_overdue": lambda i: ("GET", "/stats/overdue", {}),
+        "stats_authors_monthly": lambda i: ("GET", "/stats/authors/monthly?limit=50", {}),
+    }
+
+
+def compare(results, baseline, max_regression):
+    """ Affiche l'écart avec la référence ; retourne False en cas de régression """
+    ok = True
+    print("\nComparaison avec la référence :")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before or not before["rps"] or not before["p95_ms"]:
+            continue
+        rps = (result["rps"] - before["rps"]) / before["rps"]
+        p95 = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"]
+        flag = ""
+        if rps < -max_regression or p95 > max_regression or result["errors"] > before["errors"]:
+            flag, ok = "  RÉGRESSION", False
+        print(f"{name:22} req/s {rps:+7.0%}  p95 {p95:+7.0%}{flag}")
+    return ok
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", default="10k", help="Nombre de livres (10k, 100k, 1M...)")
+    parser.add_argument("--uri", default="mongodb://localhost:27017/library_bench", help="URI MongoDB (vidée !)")
+    parser.add_argument("--mongomock", action="store_true", help="Base simulée en mémoire (mongomock)")
+    parser.add_argument("--skip-seed", action="store_true", help="Réutilise les données déjà présentes")
+    parser.add_argument("--url", help="Serveur déjà lancé sur la même base (sinon serveur WSGI local)")
+    parser.add_argument("--endpoint", action="append", help="Endpoint à mesurer (répétable, tous par défaut)")
+    parser.add_argument("--concurrency", type=int, default=32, help="Requêtes simultanées en vol")
+    parser.add_argument("--duration", type=float, default=10, help="Durée de la mesure par endpoint (s)")
+    parser.add_argument("--timeout", type=float, default=30, help="Délai maximal par requête (s)")
+    parser.add_argument("--pool", type=int, default=20000,
+                        help="Documents neufs préparés pour chaque scénario qui en consomme")
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire (reproductibilité)")
+    parser.add_argument("--output", help="Fichier JSON où écrire les résultats")
+    parser.add_argument("--baseline", help="Résultats JSON de référence")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Baisse de débit / hausse de p95 tolérée (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    from flask_jwt_extended import create_access_token
+    from app.app import create_app
+    from app.config import Config
+
+    Config.MONGODB_SETTINGS["host"] = args.uri
+    # Un seul client mesuré : la limitation de débit fausserait les résultats
+    Config.RATE_LIMIT_ENABLED = False
+    if args.mongomock:
+        import mongomock
+        Config.MONGODB_SETTINGS["mongo_client_class"] = mongomock.MongoClient
+    app = create_app()
+    rng = random.Random(args.seed)
+
+    with app.app_context():
+        if args.skip_seed:
+            counts = None
+        else:
+            start = time.perf_counter()
+            counts = seed(parse_scale(args.scale), rng)
+            print(f"Jeu de données : {counts} en {time.perf_counter() - start:.1f} s")
+        data = sample()
+        token = create_access_token(identity=str(data["users"][0]["_id"]))
+
+    server = None
+    base_url = args.url
+    if not base_url:
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+        server = make_server("127.0.0.1", 0, app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{server.server_port}"
+
+    available = scenarios(data, rng)
+    selected = args.endpoint or list(available)
+    results = {}
+    print(f"{'endpoint':22} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}  codes")
+    try:
+        for name in selected:
+            with app.app_context():
+                prepare(name, data, rng, args.pool)
+            result = asyncio.run(drive(
+                base_url, available[name], args.concurrency, args.duration, args.timeout,
+                headers={"Authorization": f"Bearer {token}"},
+            ))
+            results[name] = result
+            print(f"{name:22} {result['rps']:10,.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+                  f"{result['p99_ms']:9.2f} {result['errors']:8}  {result['status']}")
+    finally:
+        if server:
+            server.shutdown()
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "backend": "mongomock" if args.mongomock else "mongod",
+            "scale": args.scale,
+            "counts": counts,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "pool": args.pool,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            if not compare(results, json.load(baseline), args.max_regression):
+                raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
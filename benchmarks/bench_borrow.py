@@ -0,0 +1,82 @@
+"""
+Stress test des emprunts concurrents.
+
+Lance T threads qui empruntent le même livre jusqu'à épuisement du stock et
+compare :
+- **ancien chemin** : lecture du stock, `Borrow.save()`, puis `book.stock -= 1`
+  et `book.save()` (trois allers-retours, mises à jour perdues) ;
+- **nouveau chemin** : `find_one_and_update` conditionnel (`stock > 0`,
+  `$inc: -1`) puis insertion de l'emprunt.
+
+Affiche les emprunts/s et le nombre de sur-emprunts (emprunts enregistrés
+au-delà du stock initial). Nécessite un serveur MongoDB ; la base utilisée
+est vidée des données du benchmark à la fin.
+
+Usage :
+    python -m benchmarks.bench_borrow --uri mongodb://localhost:27017/library_bench
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mongoengine import connect
+
+from app.models import Author, Book, Borrow, User
+
+
+def legacy_borrow(user, book_id):
+    """ Reproduit l'ancien `BorrowResource.post` """
+    book = Book.objects.get(id=book_id)
+    if book.stock <= 0:
+        return False
+    Borrow(user=user, book=book).save()
+    book.stock -= 1
+    book.save()
+    return True
+
+
+def atomic_borrow(user, book_id):
+    """ Chemin actuel : décrément conditionnel atomique """
+    book = Book.objects(id=book_id, stock__gt=0).modify(dec__stock=1, new=True)
+    if book is None:
+        return False
+    Borrow(user=user, book=book).save()
+    return True
+
+
+def run(func, user, author, stock, threads, attempts):
+    """ Exécute `attempts` emprunts concurrents et retourne (durée, emprunts, sur-emprunts) """
+    book = Book(titre="Benchmark", auteur=author, stock=stock).save()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda _: func(user, book.id), range(attempts)))
+    elapsed = time.perf_counter() - start
+    borrowed = Borrow.objects(book=book).count()
+    return elapsed, sum(results), max(0, borrowed - stock)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/library_bench", help="URI MongoDB")
+    parser.add_argument("--threads", type=int, default=32, help="Nombre de threads")
+    parser.add_argument("--stock", type=int, default=1000, help="Stock initial du livre")
+    parser.add_argument("--attempts", type=int, default=2000, help="Nombre de tentatives d'emprunt")
+    args = parser.parse_args()
+
+    connect(host=args.uri)
+    user = User(username="bench_borrow", password="-", email="bench_borrow@example.com").save()
+    author = Author(nom="Bench", prenom="Borrow").save()
+    try:
+        for name, func in (("Ancien chemin", legacy_borrow), ("Nouveau chemin", atomic_borrow)):
+            elapsed, ok, oversold = run(func, user, author, args.stock, args.threads, args.attempts)
+            print(f"{name:15}: {ok / elapsed:8,.0f} emprunts/s, {ok} emprunts, {oversold} sur-emprunt(s)")
+    finally:
+        books = Book.objects(auteur=author)
+        Borrow.objects(book__in=books).delete()
+        books.delete()
+        author.delete()
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
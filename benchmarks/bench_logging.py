@@ -0,0 +1,95 @@
+"""
+Latence d'une requête Flask selon le mode de journalisation.
+
+Compare, sur une route qui écrit 3 lignes de log par requête :
+- **sans log** : niveau du logger au-dessus de INFO ;
+- **synchrone** : `RotatingFileHandler` appelé sur le thread de la requête
+  (ancienne configuration) ;
+- **file d'attente** : `QueueHandler` + `QueueListener` (configuration de
+  `app.logger.setup_logger`).
+
+Les fichiers de log sont écrits dans un répertoire temporaire.
+
+Usage :
+    python -m benchmarks.bench_logging --requests 5000
+"""
+import argparse
+import logging
+import os
+import queue
+import statistics
+import tempfile
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from flask import Flask
+
+FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+def make_app(logger):
+    """ Application minimale dont la route journalise comme `BorrowResource.post` """
+    app = Flask(__name__)
+
+    @app.route("/borrow")
+    def borrow():
+        logger.info("Recherche de l'utilisateur %s", "user@example.com")
+        logger.info("Livre %s réservé", "65ab13df0000000000000000")
+        logger.info("📖 Emprunt ajouté : %s (Utilisateur: %s, Livre: %s)", 42, "user@example.com", "1984")
+        return {"message": "ok"}
+
+    return app
+
+
+def configure(mode, log_file):
+    """ Retourne (logger, fonction d'arrêt) pour le mode demandé """
+    logger = logging.getLogger(f"bench_{mode}")
+    logger.propagate = False
+    logger.handlers.clear()
+    handler = RotatingFileHandler(log_file, maxBytes=100000, backupCount=3)
+    handler.setFormatter(logging.Formatter(FORMAT))
+
+    if mode == "sans log":
+        logger.setLevel(logging.WARNING)
+        logger.addHandler(handler)
+        return logger, handler.close
+    logger.setLevel(logging.INFO)
+    if mode == "synchrone":
+        logger.addHandler(handler)
+        return logger, handler.close
+    log_queue = queue.SimpleQueue()
+    logger.addHandler(QueueHandler(log_queue))
+    listener = QueueListener(log_queue, handler)
+    listener.start()
+    return logger, lambda: (listener.stop(), handler.close())
+
+
+def measure(mode, requests, directory):
+    logger, stop = configure(mode, os.path.join(directory, f"{mode.replace(' ', '_')}.log"))
+    client = make_app(logger).test_client()
+    latencies = []
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get("/borrow")
+            latencies.append((time.perf_counter() - start) * 1e6)
+    finally:
+        stop()
+    latencies.sort()
+    return statistics.mean(latencies), latencies[len(latencies) // 2], latencies[int(len(latencies) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000, help="Nombre de requêtes par mode")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        print(f"{'Mode':16} {'moyenne':>10} {'p50':>10} {'p99':>10}  (µs)")
+        for mode in ("sans log", "synchrone", "file d'attente"):
+            mean, p50, p99 = measure(mode, args.requests, directory)
+            print(f"{mode:16} {mean:10.1f} {p50:10.1f} {p99:10.1f}")
+
+
+if __name__ == "__main__":
+    main()
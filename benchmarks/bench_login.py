@@ -0,0 +1,100 @@
+"""
+Débit de connexion selon les paramètres de hachage et la taille du pool.
+
+Pour chaque méthode (`--method`, répétable), simule une rafale de connexions :
+`--clients` threads vérifient en boucle un mot de passe via `PasswordHasher`
+(pool de `--workers` threads, file de `--queue` attentes). Affiche les
+vérifications/s, les latences p50/p99 des connexions acceptées et le nombre
+de connexions rejetées (503) quand le pool est saturé.
+
+Pendant la rafale, un thread mesure la latence d'une tâche courte (1 ms de
+travail Python) pour vérifier que les autres endpoints ne sont pas affamés.
+
+Usage :
+    python -m benchmarks.bench_login --method pbkdf2:sha256:600000 \\
+        --method pbkdf2:sha256:260000 --method pbkdf2:sha512:600000 --clients 64 --workers 4
+"""
+import argparse
+import os
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app.passwords import HashingBusy, PasswordHasher
+from benchmarks.load_http import summarize
+
+PASSWORD = "mot-de-passe-de-test"
+
+
+def busy_work(duration=0.001):
+    """ Tâche courte représentant un autre endpoint (travail Python pur) """
+    end = time.perf_counter() + duration
+    while time.perf_counter() < end:
+        pass
+
+
+def run(method, args):
+    """ Retourne (résumé des connexions, rejets, p99 de la tâche courte en ms) """
+    hasher = PasswordHasher(method, workers=args.workers, queue_size=args.queue)
+    password_hash = generate_password_hash(PASSWORD, method)
+    latencies, rejected, other = [], 0, []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def client():
+        nonlocal rejected
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                hasher.verify(password_hash, PASSWORD)
+            except HashingBusy:
+                with lock:
+                    rejected += 1
+                time.sleep(0.01)  # le client attend avant de réessayer (Retry-After)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    def other_endpoint():
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            busy_work()
+            other.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client) for _ in range(args.clients)]
+    threads.append(threading.Thread(target=other_endpoint))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    hasher.shutdown()
+    other.sort()
+    return (
+        summarize(latencies, 0, time.perf_counter() - start),
+        rejected,
+        other[int(len(other) * 0.99)] * 1000 if other else 0.0,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--method", action="append", help="Méthode werkzeug (répétable)")
+    parser.add_argument("--clients", type=int, default=64, help="Connexions simultanées")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Taille du pool de hachage")
+    parser.add_argument("--queue", type=int, default=64, help="Attentes tolérées avant rejet (503)")
+    parser.add_argument("--duration", type=float, default=5, help="Durée de la rafale par méthode (s)")
+    args = parser.parse_args()
+
+    methods = args.method or ["pbkdf2:sha256:600000", "pbkdf2:sha256:260000", "pbkdf2:sha256:100000"]
+    print(f"{'méthode':24} {'connexions/s':>13} {'p50 ms':>9} {'p99 ms':>9} {'rejets':>7} {'autre p99 ms':>13}")
+    for method in methods:
+        result, rejected, other_p99 = run(method, args)
+        print(f"{method:24} {result['rps']:13,.1f} {result['p50_ms']:9.2f} {result['p99_ms']:9.2f} "
+              f"{rejected:7} {other_p99:13.2f}")
+
+
+if __name__ == "__main__":
+    main()
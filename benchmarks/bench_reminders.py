@@ -0,0 +1,105 @@
+"""
+Débit du traitement des relances de retard (emprunts traités par seconde).
+
+Crée `--loans` emprunts en cours dont les échéances sont réparties sur les
+`--days` derniers jours (une part `--returned` étant déjà retournée), puis
+exécute `send_reminders` pour chaque taille de lot (`--batch-size`,
+répétable) avec un canal qui ne fait que compter les relances. Un second
+passage vérifie que le point de reprise évite tout reparcours (0 emprunt
+traité, 0 relance).
+
+Avec `--mongomock`, la base est simulée en mémoire : les chiffres ne sont
+alors comparables qu'entre eux. La base utilisée est vidée.
+
+Usage :
+    python -m benchmarks.bench_reminders --uri mongodb://localhost:27017/library_bench \\
+        --loans 1000000 --batch-size 500 --batch-size 5000
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+from app.notifications import Notifier
+
+SEED_BATCH = 10_000
+
+
+class CountingNotifier(Notifier):
+    """ Canal de mesure : accepte toutes les relances sans les envoyer """
+
+    def __init__(self):
+        self.count = 0
+
+    def send(self, reminders):
+        self.count += len(reminders)
+        return {reminder["borrow_id"] for reminder in reminders}
+
+
+def seed(loans, days, returned, rng):
+    """ Vide puis remplit la base d'emprunts aux échéances passées """
+    from app.commands import ensure_indexes
+    from app.models import Author, Book, Borrow, Checkpoint, User
+
+    for model in (User, Author, Book, Borrow, Checkpoint):
+        model._get_collection().delete_many({})
+    ensure_indexes()
+    users = [ObjectId() for _ in range(max(1, loans // 20))]
+    User._get_collection().insert_many(
+        [{"_id": u, "username": f"u{i}", "email": f"u{i}@example.com", "password": "-"} for i, u in enumerate(users)]
+    )
+    author = Author._get_collection().insert_one({"nom": "Bench", "prenom": "Relances"}).inserted_id
+    books = [ObjectId() for _ in range(max(1, loans // 100))]
+    Book._get_collection().insert_many([{"_id": b, "titre": f"Livre {i}", "auteur": author} for i, b in enumerate(books)])
+
+    now = datetime.utcnow()
+    borrows = Borrow._get_collection()
+    for start in range(0, loans, SEED_BATCH):
+        docs = []
+        for _ in range(min(SEED_BATCH, loans - start)):
+            due = now - timedelta(seconds=rng.uniform(0, days * 86400))
+            docs.append({
+                "user": rng.choice(users), "book": rng.choice(books),
+                "date_emprunt": due - timedelta(days=21), "date_echeance": due,
+                "date_retour": now if rng.random() < returned else None,
+            })
+        borrows.insert_many(docs, ordered=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default="mongodb://localhost:27017/library_bench", help="URI MongoDB")
+    parser.add_argument("--mongomock", action="store_true", help="Base simulée en mémoire (mongomock)")
+    parser.add_argument("--loans", type=int, default=100_000, help="Nombre d'emprunts créés")
+    parser.add_argument("--days", type=int, default=30, help="Échéances réparties sur les N derniers jours")
+    parser.add_argument("--returned", type=float, default=0.5, help="Part des emprunts déjà retournés")
+    parser.add_argument("--batch-size", type=int, action="append", help="Taille des lots (répétable)")
+    parser.add_argument("--seed", type=int, default=42, help="Graine aléatoire (reproductibilité)")
+    args = parser.parse_args()
+
+    from app.app import create_app
+    from app.config import Config
+    from app.models import Borrow
+    from app.reminders import send_reminders
+
+    Config.MONGODB_SETTINGS["host"] = args.uri
+    if args.mongomock:
+        import mongomock
+        Config.MONGODB_SETTINGS["mongo_client_class"] = mongomock.MongoClient
+    app = create_app()
+
+    print(f"{'lot':>7} {'traités':>10} {'relances':>10} {'durée s':>9} {'emprunts/s':>12} {'reprise':>8}")
+    with app.app_context():
+        for batch_size in args.batch_size or [1000]:
+            seed(args.loans, args.days, args.returned, random.Random(args.seed))
+            notifier = CountingNotifier()
+            report = send_reminders(notifier, batch_size=batch_size)
+            rerun = send_reminders(notifier, batch_size=batch_size)
+            print(f"{batch_size:7} {report['traites']:10,} {report['notifies']:10,} {report['secondes']:9.2f} "
+                  f"{report['par_seconde'] or 0:12,.0f} {rerun['traites']:8}")
+        Borrow._get_collection().delete_many({})
+
+
+if __name__ == "__main__":
+    main()
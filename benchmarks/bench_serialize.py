@@ -0,0 +1,76 @@
+"""
+Micro-benchmark de la sérialisation des livres.
+
+Compare, sur N documents `Book` (100 000 par défaut) :
+- **ancien chemin** : hydratation de chaque document MongoEngine puis
+  encodeur JSON de flask_mongoengine (`to_mongo()` + `json_util`) ;
+- **nouveau chemin** : BSON brut (`as_pymongo()`) converti par le plan de
+  champs précompilé de `app.utils`, puis `dumps` (orjson si installé).
+
+Les documents BSON sont générés en mémoire : le benchmark mesure uniquement le
+coût CPU de la sérialisation, sans base MongoDB.
+
+Usage :
+    python -m benchmarks.bench_serialize --count 100000
+"""
+import argparse
+import json
+import time
+
+from bson import ObjectId
+from flask_mongoengine.json import _make_encoder
+
+from app.models import Book
+from app.utils import dumps, serialize_raw, orjson
+
+
+def make_raw_books(count):
+    """ Génère `count` livres au format BSON brut renvoyé par pymongo """
+    auteurs = [ObjectId() for _ in range(100)]
+    return [
+        {"_id": ObjectId(), "titre": f"Livre {i}", "auteur": auteurs[i % 100], "stock": i % 10}
+        for i in range(count)
+    ]
+
+
+def legacy_path(raw_books):
+    """ Hydratation MongoEngine + encodeur flask_mongoengine """
+    encoder = _make_encoder(json.JSONEncoder)
+    books = [Book._from_son(raw) for raw in raw_books]
+    return json.dumps(books, cls=encoder).encode()
+
+
+def fast_path(raw_books):
+    """ Plan de champs précompilé sur le BSON brut """
+    return dumps(serialize_raw(Book, raw_books))
+
+
+def measure(func, raw_books, repeat):
+    """ Retourne la meilleure durée (s) sur `repeat` exécutions """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw_books)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100_000, help="Nombre de livres")
+    parser.add_argument("--repeat", type=int, default=3, help="Nombre de répétitions")
+    args = parser.parse_args()
+
+    raw_books = make_raw_books(args.count)
+    legacy = measure(legacy_path, raw_books, args.repeat)
+    fast = measure(fast_path, raw_books, args.repeat)
+
+    print(f"Documents          : {args.count}")
+    print(f"Backend JSON       : {'orjson' if orjson is not None else 'json'}")
+    print(f"Ancien chemin      : {legacy:.3f} s ({args.count / legacy:,.0f} docs/s)")
+    print(f"Nouveau chemin     : {fast:.3f} s ({args.count / fast:,.0f} docs/s)")
+    print(f"Accélération       : x{legacy / fast:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Dimensionnement du serveur de production : workers, threads et pool MongoDB.
+
+Pour chaque combinaison (workers x threads x taille de pool), lance
+`gunicorn -c gunicorn.conf.py wsgi:app`, attend qu'il réponde, maintient
+`--concurrency` requêtes en vol pendant `--duration` secondes, puis arrête le
+serveur. Le tableau final donne le débit et les percentiles de latence de
+chaque combinaison.
+
+Lecture des résultats :
+- tant que le débit augmente avec `threads`, les workers attendent MongoDB
+  (E/S) : augmenter les threads plutôt que les workers ;
+- si p99 explose alors que le débit plafonne, les threads attendent une
+  connexion : le pool (`MONGO_MAX_POOL_SIZE`) doit être >= threads ;
+- `workers x pool` ne doit pas dépasser le nombre de connexions que le
+  serveur MongoDB accepte (`db.serverStatus().connections`).
+
+Usage :
+    python -m benchmarks.bench_sizing --workers 2,4 --threads 4,8,16 --pool 10,50 \\
+        --uri mongodb://localhost:27017/library --concurrency 200 --duration 15
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks.load_http import load
+
+
+def wait_ready(url, timeout=30):
+    """ Attend que le serveur réponde sur `url` """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Le serveur ne répond pas sur {url}")
+
+
+def run(workers, threads, pool, args):
+    """ Lance gunicorn avec une combinaison donnée et mesure la charge """
+    env = dict(
+        os.environ,
+        MONGODB_URI=args.uri,
+        GUNICORN_BIND=f"127.0.0.1:{args.port}",
+        GUNICORN_WORKERS=str(workers),
+        GUNICORN_THREADS=str(threads),
+        MONGO_MAX_POOL_SIZE=str(pool),
+        RATE_LIMIT_ENABLED="false",
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "wsgi:app"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        wait_ready(base_url + args.path[0])
+        return asyncio.run(load(base_url, args.path, args.concurrency, args.duration, args.timeout))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", default="2,4", help="Nombres de workers à tester (liste)")
+    parser.add_argument("--threads", default="4,8", help="Nombres de threads par worker à tester (liste)")
+    parser.add_argument("--pool", default="10,100", help="Tailles de pool MongoDB à tester (liste)")
+    parser.add_argument("--uri", default=os.getenv("MONGODB_URI", "mongodb://localhost:27017/library"),
+                        help="URI MongoDB")
+    parser.add_argument("--path", action="append", help="Chemin interrogé (répétable, /books?limit=50 par défaut)")
+    parser.add_argument("--port", type=int, default=5099, help="Port d'écoute de gunicorn")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requêtes simultanées en vol")
+    parser.add_argument("--duration", type=float, default=15, help="Durée de la mesure par combinaison (s)")
+    parser.add_argument("--timeout", type=float, default=30, help="Délai maximal par requête (s)")
+    args = parser.parse_args()
+    args.path = args.path or ["/books?limit=50"]
+
+    def numbers(value):
+        return [int(n) for n in value.split(",")]
+
+    print(f"{'workers':>7} {'threads':>7} {'pool':>5} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+    for workers, threads, pool in itertools.product(numbers(args.workers), numbers(args.threads), numbers(args.pool)):
+        result = run(workers, threads, pool, args)
+        print(f"{workers:7} {threads:7} {pool:5} {result['rps']:10,.1f} {result['p50_ms']:9.2f} "
+              f"{result['p95_ms']:9.2f} {result['p99_ms']:9.2f} {result['errors']:8}")
+
+
+if __name__ == "__main__":
+    main()
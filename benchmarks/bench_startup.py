@@ -0,0 +1,129 @@
+"""
+Rapport de démarrage à froid : temps d'import, `create_app()` et première requête.
+
+Chaque mesure est faite dans un nouveau processus Python (démarrage à froid,
+comme un worker fraîchement lancé) :
+- **interpréteur** : durée totale du processus, vue de l'extérieur ;
+- **import** : `from app.app import create_app` ;
+- **create_app** : construction de l'application (extensions, routes) ;
+- **première requête** : premier appel à `--path` via le client de test,
+  connexion MongoDB comprise.
+
+Un passage supplémentaire avec `python -X importtime` liste les modules les
+plus coûteux à importer. Avec `--output`, le rapport est écrit en JSON ; avec
+`--baseline`, il est comparé à un rapport précédent et le script échoue
+(code 1) si le démarrage régresse de plus de `--max-regression`.
+
+Usage :
+    python -m benchmarks.bench_startup --runs 5 --output startup.json
+    python -m benchmarks.bench_startup --baseline startup.json --max-regression 0.2
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+CHILD = """
+import json, time
+start = time.perf_counter()
+from app.app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+response = app.test_client().get({path!r})
+served = time.perf_counter()
+print(json.dumps({{
+    "import": imported - start,
+    "create_app": created - imported,
+    "first_request": served - created,
+    "status": response.status_code,
+}}))
+"""
+
+PHASES = ("total", "import", "create_app", "first_request")
+
+
+def measure(path):
+    """ Démarre un processus à froid et retourne la durée de chaque phase (s) """
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(path=path)], capture_output=True, text=True, check=True
+    ).stdout
+    total = time.perf_counter() - start
+    result = json.loads(output.strip().splitlines()[-1])
+    result["total"] = total
+    return result
+
+
+def import_profile(top):
+    """ Modules les plus coûteux (temps cumulé, en ms) d'après `-X importtime` """
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "from app.app import create_app; create_app()"],
+        capture_output=True, text=True, check=True,
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Seuls les modules importés directement (profondeur 0 ou 1) sont retenus
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 1:
+            modules.append((int(cumulative) / 1000, name.strip()))
+    return [{"module": name, "ms": round(ms, 1)} for ms, name in sorted(modules, reverse=True)[:top]]
+
+
+def compare(report, baseline, max_regression):
+    """ Affiche l'écart avec la référence et retourne False en cas de régression """
+    ok = True
+    print("\nComparaison avec la référence :")
+    for phase in PHASES:
+        before, after = baseline["median_ms"][phase], report["median_ms"][phase]
+        change = (after - before) / before if before else 0.0
+        flag = ""
+        if change > max_regression:
+            flag, ok = "  RÉGRESSION", False
+        print(f"{phase:15} {before:9.1f} -> {after:9.1f} ms ({change:+.0%}){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Nombre de démarrages à froid mesurés")
+    parser.add_argument("--path", default="/books?limit=1", help="Chemin de la première requête")
+    parser.add_argument("--top", type=int, default=15, help="Nombre de modules listés")
+    parser.add_argument("--output", help="Fichier JSON où écrire le rapport")
+    parser.add_argument("--baseline", help="Rapport JSON de référence")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="Hausse relative tolérée par rapport à la référence (0.2 = 20 %%)")
+    args = parser.parse_args()
+
+    runs = [measure(args.path) for _ in range(args.runs)]
+    report = {
+        "runs": args.runs,
+        "path": args.path,
+        "status": runs[-1]["status"],
+        "median_ms": {phase: round(statistics.median(r[phase] for r in runs) * 1000, 1) for phase in PHASES},
+        "imports": import_profile(args.top),
+    }
+
+    print(f"Démarrage à froid (médiane sur {args.runs} processus, {args.path} -> {report['status']}) :")
+    for phase in PHASES:
+        print(f"{phase:15} {report['median_ms'][phase]:9.1f} ms")
+    print("\nImports les plus coûteux (cumulé) :")
+    for entry in report["imports"]:
+        print(f"{entry['ms']:9.1f} ms  {entry['module']}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            if not compare(report, json.load(baseline), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
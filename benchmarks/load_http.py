@@ -0,0 +1,110 @@
+"""
+Test de charge HTTP : API synchrone (Flask) vs variante ASGI asynchrone.
+
+Maintient `--concurrency` requêtes en vol pendant `--duration` secondes sur
+chaque cible, en parcourant les chemins donnés (`GET` uniquement), puis
+affiche le débit, les percentiles de latence et les erreurs.
+
+Les serveurs doivent être lancés au préalable sur la même base (limitation
+de débit désactivée, toutes les requêtes venant du même client), par exemple :
+    RATE_LIMIT_ENABLED=false python run.py                         # :5000
+    uvicorn --factory app.asgi:create_asgi_app --port 8000 --workers 1
+
+Usage :
+    python -m benchmarks.load_http --target sync=http://127.0.0.1:5000 \\
+        --target async=http://127.0.0.1:8000 --concurrency 500 --duration 20
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(values, p):
+    """ Percentile `p` (0-100) d'une liste triée, par rang le plus proche """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, round(p / 100 * len(values)) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    """ Résume une série de latences (en secondes) : débit et percentiles en ms """
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+async def drive(base_url, make_request, concurrency, duration, timeout, headers=None):
+    """
+    Exécute `concurrency` clients en boucle pendant `duration` secondes.
+
+    Args:
+        make_request: Fonction `i -> (méthode, chemin, kwargs httpx)` appelée pour chaque requête.
+
+    Returns:
+        dict: Résumé (voir `summarize`) et répartition des codes HTTP (`status`).
+    """
+    latencies, errors, status = [], 0, {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout, headers=headers) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                method, path, kwargs = make_request(i)
+                i += concurrency
+                start = time.perf_counter()
+                try:
+                    response = await client.request(method, path, **kwargs)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                status[response.status_code] = status.get(response.status_code, 0) + 1
+                if response.status_code >= 500:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(n) for n in range(concurrency)))
+        result = summarize(latencies, errors, time.perf_counter() - start)
+        result["status"] = {str(code): count for code, count in sorted(status.items())}
+        return result
+
+
+async def load(base_url, paths, concurrency, duration, timeout):
+    """ Requêtes `GET` en boucle sur `paths` (voir `drive`) """
+    return await drive(base_url, lambda i: ("GET", paths[i % len(paths)], {}), concurrency, duration, timeout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", action="append", required=True, metavar="NOM=URL",
+                        help="Cible à mesurer (répétable)")
+    parser.add_argument("--path", action="append", metavar="CHEMIN",
+                        help="Chemin interrogé (répétable, /books?limit=50 par défaut)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Requêtes simultanées en vol")
+    parser.add_argument("--duration", type=float, default=20, help="Durée de la mesure par cible (s)")
+    parser.add_argument("--timeout", type=float, default=30, help="Délai maximal par requête (s)")
+    args = parser.parse_args()
+
+    paths = args.path or ["/books?limit=50"]
+    print(f"{'cible':10} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'erreurs':>8}")
+    for target in args.target:
+        name, _, url = target.partition("=")
+        result = asyncio.run(load(url, paths, args.concurrency, args.duration, args.timeout))
+        print(f"{name:10} {result['rps']:10,.1f} {result['p50_ms']:9.2f} {result['p95_ms']:9.2f} "
+              f"{result['p99_ms']:9.2f} {result['errors']:8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+"""
+Configuration Gunicorn de production :
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Chaque worker (processus) sert `threads` requêtes en parallèle et possède son
+propre pool MongoDB (`MONGO_MAX_POOL_SIZE` connexions au plus). Voir
+`benchmarks/bench_sizing.py` pour choisir ces valeurs.
+"""
+import multiprocessing
+import os
+from app.config import Config
+
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5000")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.getenv("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 30))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", 5))
+accesslog = os.getenv("GUNICORN_ACCESSLOG")  # "-" pour la sortie standard
+
+# L'application (et donc le client MongoDB) est créée dans chaque worker,
+# après le fork : aucun pool de connexions n'est partagé entre processus.
+preload_app = False
+
+
+def on_starting(server):
+    if Config.MONGO_MAX_POOL_SIZE < threads:
+        server.log.warning(
+            "MONGO_MAX_POOL_SIZE (%s) < GUNICORN_THREADS (%s) : des threads attendront une connexion",
+            Config.MONGO_MAX_POOL_SIZE, threads,
+        )
+
+
+def post_fork(server, worker):
+    server.log.info("Worker %s démarré (%s threads, pool MongoDB <= %s)", worker.pid, threads, Config.MONGO_MAX_POOL_SIZE)
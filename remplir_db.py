@@ -21,29 +21,30 @@ def seed_database():
     User.objects.delete()
     Borrow.objects.delete()
 
-    # Création des auteurs
-    authors = [
-        Author(nom="Victor", prenom="Hugo").save(),
-        Author(nom="J.K.", prenom="Rowling").save(),
-        Author(nom="George", prenom="Orwell").save()
-    ]
+    # Création des auteurs (une seule insertion groupée)
+    authors = Author.objects.insert([
+        Author(nom="Victor", prenom="Hugo"),
+        Author(nom="J.K.", prenom="Rowling"),
+        Author(nom="George", prenom="Orwell")
+    ])
     
     print(f" {len(authors)} auteurs ajoutés ")
 
-    # Création des livres
-    books = [
-        Book(titre="Les Misérables", auteur=authors[0], stock=5).save(),
-        Book(titre="Harry Potter", auteur=authors[1], stock=10).save(),
-        Book(titre="1984", auteur=authors[2], stock=7).save()
-    ]
+    # Création des livres : `insert` n'appelle pas `clean()`, les compteurs
+    # (`exemplaires` = `stock` + `en_pret`) sont donc renseignés explicitement
+    books = Book.objects.insert([
+        Book(titre="Les Misérables", auteur=authors[0], stock=5, exemplaires=5, en_pret=0),
+        Book(titre="Harry Potter", auteur=authors[1], stock=10, exemplaires=10, en_pret=0),
+        Book(titre="1984", auteur=authors[2], stock=7, exemplaires=7, en_pret=0)
+    ])
     
     print(f"📖 {len(books)} livres ajoutés ")
 
     # Création des utilisateurs
-    users = [
-        User(username="admin_nasri", password=generate_password_hash("admin123"),email="admin@example.com").save(),
-        User(username="user1_nasri", password=generate_password_hash("password"),email="user1@example.com").save()
-    ]
+    users = User.objects.insert([
+        User(username="admin_nasri", password=generate_password_hash("admin123"),email="admin@example.com"),
+        User(username="user1_nasri", password=generate_password_hash("password"),email="user1@example.com")
+    ])
     print(f" {len(users)} utilisateurs ajoutés ")
 
     print(" Base de données initialisée avec succès ! ")
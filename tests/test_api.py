@@ -1,7 +1,25 @@
+import gzip
+import io
+import json
+import logging
+import queue
+import threading
+from datetime import datetime, timedelta
+from logging.handlers import QueueListener
 import pytest
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.security import generate_password_hash
 from flask_jwt_extended import create_access_token
 from app.app import create_app
-from app.models import User, Author, Book, Borrow
+from app.models import User, Author, Book, Borrow, BookStats, UserStats, AuthorMonthStats, Checkpoint, CollectionVersion
+from app.passwords import PasswordHasher
+from app.circulation import reconcile_counters
+from app.commands import dedupe_users, ensure_indexes
+from app.stats import refresh_stats
+from app.reminders import send_reminders
+from app.notifications import StreamNotifier, load_notifier
+from app.config import Config
+from app.logger import JsonFormatter, TracebackQueueHandler
 import warnings
 
 warnings.filterwarnings("ignore", category=DeprecationWarning)
@@ -17,6 +35,8 @@ def client():
         Author.objects.delete()
         Book.objects.delete()
         Borrow.objects.delete()
+        for model in (BookStats, UserStats, AuthorMonthStats, Checkpoint):
+            model.objects.delete()
 
         with app.test_client() as client:
             yield client
@@ -90,6 +110,29 @@ def test_create_book(client):
     assert "Livre ajouté" in response.json["message"]
 
 
+def test_bulk_import_books(client):
+    """ Test de l'import massif CSV avec création d'auteurs et erreurs par ligne """
+    headers = {"Authorization": f"Bearer {create_access_token(identity='any')}", "Content-Type": "text/csv"}
+    author = Author(nom="Hugo", prenom="Victor").save()
+    csv_data = (
+        "titre,stock,auteur_id,auteur_nom,auteur_prenom\n"
+        f"Les Misérables,5,{author.id},,\n"
+        "1984,7,,Orwell,George\n"
+        "La Ferme des animaux,3,,Orwell,George\n"
+        "Stock négatif,-1,,Orwell,George\n"
+        "Auteur inconnu,1,65ab13df0000000000000000,,\n"
+    )
+
+    response = client.post("/books/bulk?chunk_size=2", data=csv_data, headers=headers)
+    assert response.status_code == 200
+    report = response.json
+    assert report["total"] == 5
+    assert report["inserted"] == 3
+    assert report["authors_created"] == 1
+    assert [e["ligne"] for e in report["errors"]] == [4, 5]
+    assert Book.objects(auteur=Author.objects.get(nom="Orwell")).count() == 2
+
+
 def test_get_books(client):
     """ Test de récupération des livres """
     response = client.get("/books")
@@ -97,6 +140,114 @@ def test_get_books(client):
     assert isinstance(response.json, list)
 
 
+def test_get_books_paginated(client):
+    """ Test de la pagination par curseur de la liste des livres """
+    author = Author(nom="George", prenom="Orwell").save()
+    for i in range(5):
+        Book(titre=f"Livre {i}", auteur=author, stock=1).save()
+
+    response = client.get("/books?limit=2&fields=titre")
+    assert response.status_code == 200
+    assert len(response.json) == 2
+    assert "stock" not in response.json[0]
+    cursor = response.headers["X-Next-Cursor"]
+
+    titres = [b["titre"] for b in response.json]
+    while cursor:
+        response = client.get(f"/books?limit=2&cursor={cursor}")
+        titres += [b["titre"] for b in response.json]
+        cursor = response.headers.get("X-Next-Cursor")
+    assert titres == [f"Livre {i}" for i in range(5)]
+
+
+def test_get_book_cache_invalidated_on_borrow(client):
+    """ Vérifie que le cache d'un livre est invalidé quand son stock change """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    assert client.get(f"/books/{book.id}").json["stock"] == 5
+    assert client.get(f"/books/{book.id}").json["stock"] == 5
+    client.post("/borrow", json={"email": user.email, "book_id": str(book.id)}, headers=headers)
+    assert client.get(f"/books/{book.id}").json["stock"] == 4
+
+    stats = client.get("/dashboard/cache").json
+    assert stats["hits"] >= 1
+    assert stats["misses"] >= 2
+
+
+
+def test_expanded_book_cache_follows_author_writes(client):
+    """ Vérifie qu'un livre étendu (`expand=auteur`) reflète la modification de son auteur """
+    from app.versions import bump_version
+
+    author = Author(nom="Hugo", prenom="Victor").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    assert client.get(f"/books/{book.id}?expand=auteur").json["auteur"]["nom"] == "Hugo"
+    assert client.get("/books?expand=auteur").json[0]["auteur"]["nom"] == "Hugo"
+
+    # Écriture faite par un autre processus : seule la version des auteurs change
+    Author.objects(id=author.id).update_one(set__nom="HUGO")
+    bump_version("authors")
+    assert client.get(f"/books/{book.id}?expand=auteur").json["auteur"]["nom"] == "HUGO"
+    assert client.get("/books?expand=auteur").json[0]["auteur"]["nom"] == "HUGO"
+
+def test_get_books_etag_not_modified(client):
+    """ Vérifie le 304 sur If-None-Match et le changement d'ETag après écriture """
+    author = Author(nom="Victor", prenom="Hugo").save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity='any')}"}
+
+    response = client.get("/books")
+    etag = response.headers["ETag"]
+    response = client.get("/books", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    client.post("/books", json={"titre": "Les Misérables", "auteur_id": str(author.id), "stock": 1}, headers=headers)
+    response = client.get("/books", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json) == 1
+
+
+
+def test_last_modified_not_reused_within_same_second(client, monkeypatch):
+    """ Vérifie qu'une écriture dans la seconde d'une lecture invalide `If-Modified-Since` """
+    import app.versions as versions
+
+    clock = {"now": datetime(2026, 1, 1, 10, 0, 0, 200000)}
+
+    class Clock(datetime):
+        @classmethod
+        def utcnow(cls):
+            return clock["now"]
+
+    monkeypatch.setattr(versions, "datetime", Clock)
+    CollectionVersion.objects.delete()
+    versions.bump_version("books")
+    clock["now"] = datetime(2026, 1, 1, 10, 0, 0, 300000)
+    response = client.get("/books")
+    # La seconde de l'écriture n'est pas écoulée : pas de Last-Modified à réutiliser
+    assert response.last_modified is None
+
+    clock["now"] = datetime(2026, 1, 1, 10, 0, 0, 800000)
+    versions.bump_version("books")
+    response = client.get("/books", headers={"If-Modified-Since": "Thu, 01 Jan 2026 10:00:00 GMT"})
+    assert response.status_code == 200
+
+    clock["now"] = datetime(2026, 1, 1, 10, 0, 5)
+    response = client.get("/books")
+    assert response.headers["Last-Modified"] == "Thu, 01 Jan 2026 10:00:01 GMT"
+    response = client.get("/books", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+    assert response.status_code == 304
+
+def test_get_books_invalid_cursor(client):
+    """ Vérifie qu'un curseur invalide est refusé """
+    response = client.get("/books?cursor=invalide")
+    assert response.status_code == 400
+
+
 #  RECHERCHE DE LIVRES
 def test_search_books(client):
     """ Test de recherche d'un livre """
@@ -104,6 +255,27 @@ def test_search_books(client):
     assert response.status_code in [200, 404]
 
 
+def test_search_books_accent_insensitive(client):
+    """ Test de la recherche plein texte sans accents ni majuscules """
+    author = Author(nom="Hugo", prenom="Victor").save()
+    Book(titre="Les Misérables", auteur=author, stock=5).save()
+    Book(titre="Notre-Dame de Paris", auteur=author, stock=2).save()
+
+    response = client.get("/search/books?titre=miserables")
+    assert response.status_code == 200
+    assert [b["titre"] for b in response.json] == ["Les Misérables"]
+
+    response = client.get("/search/books?auteur=hugo")
+    assert response.status_code == 200
+    assert len(response.json) == 2
+
+
+def test_search_books_requires_criteria(client):
+    """ Vérifie qu'une recherche sans titre ni auteur est refusée """
+    response = client.get("/search/books")
+    assert response.status_code == 400
+
+
 #  GESTION DES EMPRUNTS
 def test_create_borrow(client):
     """ Test d'ajout d'un emprunt """
@@ -123,6 +295,59 @@ def test_create_borrow(client):
     assert "Emprunt enregistré avec succès" in response.json["message"]
 
 
+def test_concurrent_borrows_never_oversell(client):
+    """ Vérifie qu'aucun exemplaire n'est sur-emprunté sous charge concurrente """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    def borrow(_):
+        with client.application.test_client() as c:
+            return c.post("/borrow", json={"email": user.email, "book_id": str(book.id)}, headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=10) as pool:
+        statuses = list(pool.map(borrow, range(20)))
+
+    assert statuses.count(201) == 5
+    assert statuses.count(400) == 15
+    assert Book.objects.get(id=book.id).stock == 0
+    assert Borrow.objects(book=book).count() == 5
+
+
+def test_delete_borrow_restores_stock_once(client):
+    """ Vérifie qu'un emprunt ne peut être retourné qu'une seule fois """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=0).save()
+    borrow = Borrow(user=user, book=book).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    assert client.delete(f"/borrow/{borrow.id}", headers=headers).status_code == 200
+    assert client.delete(f"/borrow/{borrow.id}", headers=headers).status_code == 404
+    assert Book.objects.get(id=book.id).stock == 1
+
+
+def test_get_borrows_expand(client):
+    """ Vérifie l'intégration des références sans exposer le mot de passe """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    Borrow(user=user, book=book).save()
+
+    response = client.get("/borrow")
+    assert response.json[0]["book"] == str(book.id)
+
+    response = client.get("/borrow?expand=user,book")
+    assert response.status_code == 200
+    borrow = response.json[0]
+    assert borrow["book"]["titre"] == "Les Misérables"
+    assert borrow["user"]["email"] == "test@example.com"
+    assert "password" not in borrow["user"]
+
+    assert client.get("/borrow?expand=date_emprunt").status_code == 400
+
+
 def test_return_borrow(client):
     """ Test du retour d'un emprunt """
 
@@ -146,6 +371,34 @@ def test_return_borrow(client):
     assert borrow.id is not None, "L'emprunt n'a pas été enregistré"
 
 
+# EXPORT NDJSON
+def test_export_books_ndjson(client):
+    """ Test de l'export NDJSON en streaming, brut puis compressé """
+    headers = {"Authorization": f"Bearer {create_access_token(identity='any')}"}
+    author = Author(nom="George", prenom="Orwell").save()
+    for i in range(5):
+        Book(titre=f"Livre {i}", auteur=author, stock=1).save()
+
+    response = client.get("/export/books?batch_size=2", headers=headers)
+    assert response.status_code == 200
+    lines = response.data.decode().splitlines()
+    assert [json.loads(line)["titre"] for line in lines] == [f"Livre {i}" for i in range(5)]
+
+    response = client.get("/export/users", headers={**headers, "Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(response.data) == b""
+
+    assert client.get("/export/inconnue", headers=headers).status_code == 404
+    # Autre identité : le seau de limitation de débit du premier token est presque vide
+    headers = {"Authorization": f"Bearer {create_access_token(identity='other')}"}
+    for batch_size in ("0", "-1", "abc"):
+        assert client.get(f"/export/books?batch_size={batch_size}", headers=headers).status_code == 400
+    # Au-delà du plafond, la taille des lots est ramenée à `EXPORT_BATCH_SIZE_MAX`
+    response = client.get("/export/books?batch_size=100000000", headers=headers)
+    assert response.status_code == 200
+    assert len(response.data.decode().splitlines()) == 5
+
+
 # TABLEAU DE BORD (LOGS)
 def test_get_dashboard_logs(client):
     """ Test de récupération des logs """
@@ -154,6 +407,54 @@ def test_get_dashboard_logs(client):
     assert "logs" in response.json
 
 
+def test_get_dashboard_logs_since_offset(client, tmp_path, monkeypatch):
+    """ Test de la lecture incrémentale des logs, y compris après rotation """
+    import os
+    import app.dashboard
+
+    log_file = tmp_path / "app.log"
+    monkeypatch.setattr(app.dashboard, "LOG_FILE", str(log_file))
+    log_file.write_text("ligne 1\nligne 2\n")
+
+    data = client.get("/dashboard/logs").json
+    assert data["logs"] == ["ligne 1", "ligne 2"]
+
+    with open(log_file, "a") as f:
+        f.write("ligne 3\nligne incomplète")
+    data = client.get(f"/dashboard/logs?since={data['offset']}&inode={data['inode']}").json
+    assert data["logs"] == ["ligne 3"]
+    # Une ligne en cours d'écriture ne déclenche pas de rappel immédiat
+    assert data["more"] is False
+
+    # Rotation : la fin de l'ancien fichier est lue avant le nouveau
+    with open(log_file, "a") as f:
+        f.write("\n")
+    os.rename(log_file, f"{log_file}.1")
+    log_file.write_text("ligne 4\n")
+    data = client.get(f"/dashboard/logs?since={data['offset']}&inode={data['inode']}").json
+    assert data["logs"] == ["ligne incomplète", "ligne 4"]
+
+
+def test_get_dashboard_logs_splits_long_lines(client, tmp_path, monkeypatch):
+    """ Test qu'une ligne plus longue que `MAX_CHUNK` est découpée au lieu de bloquer la lecture """
+    import app.dashboard
+
+    log_file = tmp_path / "app.log"
+    monkeypatch.setattr(app.dashboard, "LOG_FILE", str(log_file))
+    monkeypatch.setattr(app.dashboard, "MAX_CHUNK", 8)
+    log_file.write_text("")
+    data = client.get("/dashboard/logs").json
+    log_file.write_text("x" * 12 + "\nfin\n")
+
+    chunks = []
+    for _ in range(5):
+        data = client.get(f"/dashboard/logs?since={data['offset']}&inode={data['inode']}").json
+        chunks += data["logs"]
+        if not data["more"]:
+            break
+    assert chunks == ["x" * 8, "x" * 4, "fin"]
+    assert data["more"] is False
+
 
 def test_protected_route_without_token(client):
     """ Vérifie qu'un accès non authentifié échoue """
@@ -172,3 +473,480 @@ def test_protected_route_with_token(client):
     }, headers=headers)
     
     assert response.status_code == 201
+
+
+def test_register_duplicate_user(client):
+    """ Test qu'une inscription en double est rejetée par l'index unique """
+    user = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    assert client.post("/register", json=user).status_code == 201
+    response = client.post("/register", json=dict(user, email="autre@example.com"))
+    assert response.status_code == 400
+    assert response.json["message"] == "Utilisateur déjà existant"
+
+
+def test_login_rehashes_outdated_password(client):
+    """ Test que le hash est recalculé à la connexion si les paramètres ont changé """
+    User(username="testuser", email="admin@example.com",
+         password=generate_password_hash("testpass", "pbkdf2:sha256:1000")).save()
+
+    response = client.post("/login", json={"username": "testuser", "password": "testpass", "email": "admin@example.com"})
+    assert response.status_code == 200
+    method = client.application.config["PASSWORD_HASH_METHOD"]
+    assert User.objects.get(username="testuser").password.startswith(method + "$")
+
+
+
+def test_needs_rehash_uses_canonical_method():
+    """ Test que la forme abrégée d'une méthode ne force pas de recalcul, contrairement à un autre sel """
+    stored = generate_password_hash("testpass", "pbkdf2:sha256:260000", 16)
+    assert not PasswordHasher("pbkdf2:sha256", salt_length=16, workers=1).needs_rehash(stored)
+    assert PasswordHasher("pbkdf2:sha256:260000", salt_length=24, workers=1).needs_rehash(stored)
+    assert PasswordHasher("pbkdf2:sha512:1000", salt_length=16, workers=1).needs_rehash(stored)
+
+def test_login_rejected_when_hashing_saturated(client):
+    """ Test qu'une rafale de connexions au-delà du pool de hachage reçoit 503 """
+    client.post("/register", json={"username": "testuser", "password": "testpass", "email": "admin@example.com"})
+
+    hasher = PasswordHasher(client.application.config["PASSWORD_HASH_METHOD"], workers=1, queue_size=0)
+    client.application.extensions["hasher"] = hasher
+    release = threading.Event()
+    hasher.submit(release.wait)
+    try:
+        response = client.post("/login", json={"username": "testuser", "password": "testpass", "email": "admin@example.com"})
+    finally:
+        release.set()
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_ensure_indexes_reports_duplicate_users(client):
+    """ Test que des doublons existants sont signalés par `ensure_indexes`, puis corrigés par `dedupe_users` """
+    users = User._get_collection()
+    users.drop_indexes()
+    first = users.insert_one({"username": "victor", "email": "vh@example.com", "password": "-"}).inserted_id
+    second = users.insert_one({"username": "hugo", "email": "vh@example.com", "password": "-"}).inserted_id
+
+    _, conflicts = ensure_indexes()
+    assert conflicts["user.email"][0]["_id"] == {"email": "vh@example.com"}
+    assert "user.username" not in conflicts
+
+    assert [r["_id"] for r in dedupe_users(dry_run=True)] == [second]
+    assert users.find_one({"_id": second})["email"] == "vh@example.com"
+    dedupe_users()
+    assert users.find_one({"_id": first})["email"] == "vh@example.com"
+    assert users.find_one({"_id": second})["email"] == f"vh@example.com~doublon-{second}"
+    assert ensure_indexes()[1] == {}
+
+
+def test_borrow_defaults_to_authenticated_user(client):
+    """ Test qu'un emprunt sans email est attribué à l'utilisateur du token """
+    credentials = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    client.post("/register", json=credentials)
+    token = client.post("/login", json=credentials).json["access_token"]
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=1).save()
+
+    response = client.post("/borrow", json={"book_id": str(book.id)}, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 201
+    assert Borrow.objects.get(id=response.json["borrow_id"]).user.email == "admin@example.com"
+
+
+def test_logout_revokes_token(client):
+    """ Test qu'un token révoqué par /logout est refusé """
+    credentials = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    client.post("/register", json=credentials)
+    headers = {"Authorization": f"Bearer {client.post('/login', json=credentials).json['access_token']}"}
+
+    assert client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"}, headers=headers).status_code == 201
+    assert client.post("/logout", headers=headers).status_code == 200
+    response = client.post("/authors", json={"nom": "Zola", "prenom": "Émile"}, headers=headers)
+    assert response.status_code == 401
+    assert response.json["msg"] == "Token has been revoked"
+
+
+def test_borrow_batch_partial_failure(client):
+    """ Test d'un emprunt groupé : un résultat par livre, sans bloquer les autres """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    available = Book(titre="Les Misérables", auteur=author, stock=2).save()
+    last_copy = Book(titre="Notre-Dame de Paris", auteur=author, stock=1).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    book_ids = [str(available.id), str(last_copy.id), str(last_copy.id), "000000000000000000000000", "invalide"]
+    response = client.post("/borrow/batch", json={"email": user.email, "book_ids": book_ids}, headers=headers)
+
+    assert response.status_code == 207
+    statuses = [r["status"] for r in response.json["results"]]
+    assert statuses == [201, 400, 400, 404, 404]
+    assert Book.objects.get(id=available.id).stock == 1
+    assert Book.objects.get(id=last_copy.id).stock == 1
+    assert Book.objects.count() == 2
+    assert Borrow.objects(user=user).count() == 1
+
+    response = client.post("/borrow/batch", json={"book_ids": [str(last_copy.id)]}, headers=headers)
+    assert response.status_code == 201
+    assert Borrow.objects.get(id=response.json["results"][0]["borrow_id"]).book.id == last_copy.id
+
+    assert client.post("/borrow/batch", json={"book_ids": []}, headers=headers).status_code == 400
+    # Token dont l'identité n'est pas un ObjectId : 404, pas d'erreur serveur
+    invalid = {"Authorization": f"Bearer {create_access_token(identity='any', additional_claims={'email': user.email})}"}
+    response = client.post("/borrow/batch", json={"book_ids": [str(available.id)]}, headers=invalid)
+    assert response.status_code == 404
+
+
+def test_return_batch_restores_stock_once(client):
+    """ Test d'un retour groupé : chaque emprunt n'est retourné qu'une fois """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=0).save()
+    borrows = [str(Borrow(user=user, book=book).save().id) for _ in range(2)]
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    response = client.post("/borrow/returns", json={"borrow_ids": borrows + [borrows[0]]}, headers=headers)
+    assert response.status_code == 207
+    assert [r["status"] for r in response.json["results"]] == [200, 200, 404]
+    assert Book.objects.get(id=book.id).stock == 2
+    assert Borrow.objects(date_retour=None).count() == 0
+
+    response = client.post("/borrow/returns", json={"borrow_ids": borrows}, headers=headers)
+    assert [r["status"] for r in response.json["results"]] == [404, 404]
+    assert Book.objects.get(id=book.id).stock == 2
+
+    response = client.post("/borrow/returns", json={"borrow_ids": ["invalide", 42, None]}, headers=headers)
+    assert response.status_code == 207
+    assert [r["status"] for r in response.json["results"]] == [404, 404, 404]
+
+
+def test_borrow_and_return_maintain_counters(client):
+    """ Test des compteurs de disponibilité et du retour enregistré sur l'emprunt """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=3).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    borrow_id = client.post("/borrow", json={"email": user.email, "book_id": str(book.id)}, headers=headers).json["borrow_id"]
+    client.post("/borrow/batch", json={"email": user.email, "book_ids": [str(book.id)]}, headers=headers)
+    book.reload()
+    assert (book.exemplaires, book.en_pret, book.stock) == (3, 2, 1)
+
+    response = client.delete(f"/borrow/{borrow_id}", headers=headers)
+    assert response.status_code == 200
+    assert Borrow.objects.get(id=borrow_id).date_retour is not None
+    book.reload()
+    assert (book.exemplaires, book.en_pret, book.stock) == (3, 1, 2)
+
+
+def test_reconcile_counters_repairs_drift(client):
+    """ Test de la réconciliation des compteurs à partir des emprunts en cours """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    drifted = Book(titre="Les Misérables", auteur=author, stock=5, exemplaires=5, en_pret=0).save()
+    consistent = Book(titre="Notre-Dame de Paris", auteur=author, stock=1, exemplaires=2, en_pret=1).save()
+    Borrow(user=user, book=drifted).save()
+    Borrow(user=user, book=drifted).save()
+    Borrow(user=user, book=consistent).save()
+    Borrow(user=user, book=consistent, date_retour=datetime.utcnow()).save()
+    Book._get_collection().update_one({"_id": consistent.id}, {"$unset": {"exemplaires": 1}})
+
+    report = reconcile_counters(batch_size=1, dry_run=True, grace=0)
+    assert report["checked"] == 2
+    assert Book.objects.get(id=drifted.id).stock == 5
+
+    report = reconcile_counters(batch_size=1, grace=0)
+    assert [r["book_id"] for r in report["repaired"]] == [str(drifted.id), str(consistent.id)]
+    drifted.reload()
+    assert (drifted.exemplaires, drifted.en_pret, drifted.stock) == (5, 2, 3)
+    assert Book.objects.get(id=consistent.id).exemplaires == 2
+    assert reconcile_counters(grace=0)["repaired"] == []
+
+
+def test_reconcile_counters_ignores_borrow_in_flight(client, monkeypatch):
+    """ Test qu'un emprunt dont le document n'est pas encore inséré n'est pas « réparé » """
+    import app.circulation as circulation
+
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=2, exemplaires=2, en_pret=0).save()
+
+    # L'emprunt a décompté le livre ; son document est inséré pendant le délai de grâce
+    Book._get_collection().update_one({"_id": book.id}, circulation.lend())
+    monkeypatch.setattr(circulation.time, "sleep", lambda seconds: Borrow(user=user, book=book).save())
+    report = reconcile_counters(grace=1)
+    assert (report["repaired"], report["skipped"]) == ([], 1)
+    book.reload()
+    assert (book.stock, book.en_pret) == (1, 1)
+
+
+def test_stats_refreshed_incrementally(client):
+    """ Test des statistiques précalculées et de leur rafraîchissement incrémental """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Hugo", prenom="Victor").save()
+    popular = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    other = Book(titre="Notre-Dame de Paris", auteur=author, stock=5).save()
+    now = datetime.utcnow()
+    Borrow(user=user, book=popular, date_emprunt=now - timedelta(days=40)).save()
+    Borrow(user=user, book=popular, date_emprunt=now - timedelta(days=2), date_retour=now - timedelta(days=1)).save()
+    Borrow(user=user, book=other, date_emprunt=now - timedelta(days=1)).save()
+    # Trop récent : laissé au rafraîchissement suivant (STATS_SAFETY_LAG)
+    Borrow(user=user, book=other, date_emprunt=now).save()
+
+    report = refresh_stats(rebuild=True, now=now)
+    assert (report["emprunts"], report["retours"], report["en_retard"]) == (3, 1, 1)
+
+    response = client.get("/stats/books/top")
+    assert response.status_code == 200
+    assert response.headers["X-Stats-As-Of"]
+    assert [(b["titre"], b["emprunts"]) for b in response.json] == [("Les Misérables", 2), ("Notre-Dame de Paris", 1)]
+    assert client.get("/stats/users/active").json[0]["en_cours"] == 2
+    assert client.get("/stats/overdue").json["total"] == 1
+    months = client.get(f"/stats/authors/monthly?auteur={author.id}").json
+    assert sum(m["emprunts"] for m in months) == 3
+    assert months[0]["auteur"] == "Victor Hugo"
+
+    etag = response.headers["ETag"]
+    assert client.get("/stats/books/top", headers={"If-None-Match": etag}).status_code == 304
+    report = refresh_stats(now=now + timedelta(minutes=5))
+    assert (report["emprunts"], report["retours"]) == (1, 0)
+    response = client.get("/stats/books/top", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json[1]["emprunts"] == 2
+
+    assert client.get("/stats/authors/monthly?depuis=2026-13").status_code == 400
+    assert client.get("/stats/inconnu").status_code == 404
+    assert client.get("/dashboard/stats").json["retards"]["total"] == 1
+
+
+def test_stats_interrupted_refresh_is_replayed(client, monkeypatch):
+    """ Test d'un rafraîchissement interrompu : la fenêtre est rejouée sans recompter """
+    import app.stats as stats
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Hugo", prenom="Victor").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    now = datetime.utcnow()
+    Borrow(user=user, book=book, date_emprunt=now - timedelta(days=2)).save()
+    refresh_stats(rebuild=True, now=now)
+    Borrow(user=user, book=book, date_emprunt=now + timedelta(minutes=1)).save()
+
+    # Panne après la mise à jour de BookStats et UserStats, avant AuthorMonthStats
+    bulk_apply = stats._bulk_apply
+
+    def failing(model, operations):
+        if model is AuthorMonthStats:
+            raise RuntimeError("panne")
+        bulk_apply(model, operations)
+
+    monkeypatch.setattr(stats, "_bulk_apply", failing)
+    with pytest.raises(RuntimeError):
+        refresh_stats(now=now + timedelta(minutes=5))
+    checkpoint = Checkpoint.objects.get(name=stats.BORROWS)
+    assert checkpoint.value < now and checkpoint.pending is not None
+
+    monkeypatch.setattr(stats, "_bulk_apply", bulk_apply)
+    report = refresh_stats(now=now + timedelta(minutes=10))
+    assert report["emprunts"] == 1
+    assert Checkpoint.objects.get(name=stats.BORROWS).pending is None
+    assert BookStats.objects.get(book=book.id).emprunts == 2
+    assert UserStats.objects.get(user=user.id).en_cours == 2
+    assert sum(m.emprunts for m in AuthorMonthStats.objects(auteur=author.id)) == 2
+
+
+def test_user_borrow_history(client):
+    """ Test de l'historique paginé des emprunts d'un utilisateur """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    other = User(username="autre", email="autre@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    now = datetime.utcnow().replace(microsecond=0)
+    active = [Borrow(user=user, book=book, date_emprunt=now - timedelta(days=d)).save() for d in (1, 2, 3)]
+    returned = Borrow(user=user, book=book, date_emprunt=now - timedelta(days=9), date_retour=now - timedelta(days=5)).save()
+    Borrow(user=other, book=book, date_emprunt=now).save()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(user.id))}"}
+
+    response = client.get(f"/users/{user.id}/borrows?status=active&limit=2", headers=headers)
+    assert response.status_code == 200
+    assert [b["_id"] for b in response.json] == [str(active[0].id), str(active[1].id)]
+    assert set(response.json[0]) <= {"_id", "book", "date_emprunt", "date_retour"}
+    response = client.get(f"/users/{user.id}/borrows?status=active&limit=2&cursor={response.headers['X-Next-Cursor']}",
+                          headers=headers)
+    assert [b["_id"] for b in response.json] == [str(active[2].id)]
+    assert "X-Next-Cursor" not in response.headers
+
+    response = client.get(f"/users/{user.id}/borrows?status=returned&expand=book", headers=headers)
+    assert [b["_id"] for b in response.json] == [str(returned.id)]
+    assert response.json[0]["book"]["titre"] == "Les Misérables"
+
+    since = (now - timedelta(days=2, hours=1)).isoformat()
+    response = client.get(f"/users/{user.id}/borrows", query_string={"since": since}, headers=headers)
+    assert len(response.json) == 2
+
+    assert client.get(f"/users/{user.id}/borrows?status=perdu", headers=headers).status_code == 400
+    assert client.get(f"/users/{user.id}/borrows?since=hier", headers=headers).status_code == 400
+    assert client.get(f"/users/{other.id}/borrows", headers=headers).status_code == 403
+    invalid = {"Authorization": f"Bearer {create_access_token(identity='any')}"}
+    assert client.get("/users/any/borrows", headers=invalid).status_code == 400
+
+
+def test_send_reminders_checkpointed(client, tmp_path):
+    """ Test des relances de retard : par niveau, sans double envoi ni reparcours """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    now = datetime.utcnow()
+    late = [Borrow(user=user, book=book, date_echeance=now - timedelta(days=d)).save() for d in (1, 2, 10)]
+    soon = Borrow(user=user, book=book).save()
+    Borrow(user=user, book=book, date_echeance=now - timedelta(days=5), date_retour=now).save()
+    assert soon.date_echeance > now
+
+    # Délais par défaut : 0, 7 et 14 jours après l'échéance
+    notifier = load_notifier(f"file:{tmp_path / 'relances.ndjson'}")
+    report = send_reminders(notifier, now=now, batch_size=1)
+    assert (report["traites"], report["notifies"]) == (4, 3)
+    report = send_reminders(notifier, now=now, batch_size=1)
+    assert (report["traites"], report["notifies"]) == (0, 0)
+    notifier.close()
+
+    lines = (tmp_path / "relances.ndjson").read_text().splitlines()
+    sent = [(r["borrow_id"], r["niveau"]) for r in map(json.loads, lines)]
+    assert sent == [(str(late[2].id), 2), (str(late[1].id), 1), (str(late[0].id), 1)]
+    assert json.loads(lines[0])["email"] == "test@example.com"
+    assert json.loads(lines[0])["titre"] == "Les Misérables"
+
+    class Flaky(StreamNotifier):
+        """ Canal n'envoyant que la première relance de chaque lot """
+        def send(self, reminders):
+            return super().send(reminders[:1])
+
+    stream = io.StringIO()
+    later = now + timedelta(days=25)
+    report = send_reminders(Flaky(stream), now=later, batch_size=2)
+    assert report["echecs"] > 0
+    report = send_reminders(StreamNotifier(stream), now=later, batch_size=2)
+    assert report["echecs"] == 0
+    sent = [(r["borrow_id"], r["niveau"]) for r in map(json.loads, stream.getvalue().splitlines())]
+    assert sorted(sent) == sorted([(str(b.id), 3) for b in late] + [(str(soon.id), 1)])
+
+
+@pytest.fixture
+def limited_client(client, monkeypatch):
+    """ Application avec une limite de débit réduite : 10 jetons, sans remplissage notable """
+    monkeypatch.setattr(Config, "RATE_LIMIT_CAPACITY", 10)
+    monkeypatch.setattr(Config, "RATE_LIMIT_REFILL_PER_SECOND", 0.01)
+    monkeypatch.setattr(Config, "MAX_EXPENSIVE_IN_FLIGHT", 1)
+    app = create_app()
+    app.config["TESTING"] = True
+    with app.test_client() as limited:
+        yield limited
+
+
+def test_rate_limit_per_client(limited_client):
+    """ Test qu'un client dont le seau est vide reçoit 429, sans pénaliser les autres clients """
+    for remaining in (5, 0):
+        response = limited_client.get("/books")
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == str(remaining)
+
+    response = limited_client.get("/books")
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+    assert limited_client.get("/metrics").status_code == 200
+
+    # Un utilisateur authentifié a son propre seau, même depuis la même adresse
+    user = User(username="testuser", email="admin@example.com", password="-").save()
+    with limited_client.application.app_context():
+        token = create_access_token(identity=str(user.id))
+    response = limited_client.get("/books", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 200
+    assert response.headers["X-RateLimit-Remaining"] == "5"
+
+
+def test_rate_limit_behind_proxy(client, monkeypatch):
+    """ Test que les clients anonymes sont distingués par `X-Forwarded-For` derrière un proxy de confiance """
+    monkeypatch.setattr(Config, "RATE_LIMIT_CAPACITY", 10)
+    monkeypatch.setattr(Config, "RATE_LIMIT_REFILL_PER_SECOND", 0.01)
+
+    app = create_app()
+    with app.test_client() as direct:
+        for _ in range(2):
+            direct.get("/books", headers={"X-Forwarded-For": "203.0.113.1"})
+        # Sans proxy de confiance, l'en-tête est ignoré : même seau
+        assert direct.get("/books", headers={"X-Forwarded-For": "203.0.113.2"}).status_code == 429
+
+    monkeypatch.setattr(Config, "PROXY_FIX_X_FOR", 1)
+    app = create_app()
+    with app.test_client() as proxied:
+        for _ in range(2):
+            proxied.get("/books", headers={"X-Forwarded-For": "203.0.113.1"})
+        assert proxied.get("/books", headers={"X-Forwarded-For": "203.0.113.1"}).status_code == 429
+        response = proxied.get("/books", headers={"X-Forwarded-For": "203.0.113.2"})
+        assert response.status_code == 200
+        assert response.headers["X-RateLimit-Remaining"] == "5"
+
+
+def test_expensive_requests_shed_when_saturated(limited_client):
+    """ Test qu'une requête coûteuse au-delà de `MAX_EXPENSIVE_IN_FLIGHT` reçoit 503, pas les requêtes légères """
+    author = Author(nom="Victor", prenom="Hugo").save()
+    Book(titre="Les Misérables", auteur=author, stock=1).save()
+    user = User(username="testuser", email="admin@example.com", password="-").save()
+    with limited_client.application.app_context():
+        token = create_access_token(identity=str(user.id))
+
+    # L'export en streaming occupe l'unique emplacement jusqu'à la fin de l'envoi
+    export = limited_client.get("/export/books", headers={"Authorization": f"Bearer {token}"}, buffered=False)
+    assert export.status_code == 200
+    try:
+        response = limited_client.get("/books", environ_base={"REMOTE_ADDR": "10.0.0.2"})
+        assert response.status_code == 503
+        assert response.headers["Retry-After"] == "1"
+        assert limited_client.get(f"/authors/{author.id}", environ_base={"REMOTE_ADDR": "10.0.0.2"}).status_code == 200
+    finally:
+        export.close()
+    assert limited_client.get("/books", environ_base={"REMOTE_ADDR": "10.0.0.3"}).status_code == 200
+
+
+def test_send_reminders_rolled_back_when_notifier_raises(client):
+    """ Test qu'un canal qui lève une exception ne laisse aucun emprunt marqué comme relancé """
+    user = User(username="test_user", email="test@example.com", password="password").save()
+    author = Author(nom="Victor", prenom="Hugo").save()
+    book = Book(titre="Les Misérables", auteur=author, stock=5).save()
+    now = datetime.utcnow()
+    late = [Borrow(user=user, book=book, date_echeance=now - timedelta(days=d)).save() for d in (1, 2, 3)]
+
+    class Broken(StreamNotifier):
+        def send(self, reminders):
+            raise ConnectionError("SMTP indisponible")
+
+    report = send_reminders(Broken(), now=now, batch_size=2)
+    assert report["erreur"] == "SMTP indisponible"
+    assert (report["notifies"], report["echecs"]) == (0, 2)
+    assert all(b.reload().relances == 0 for b in late)
+
+    stream = io.StringIO()
+    report = send_reminders(StreamNotifier(stream), now=now, batch_size=2)
+    assert "erreur" not in report
+    assert sorted(json.loads(line)["borrow_id"] for line in stream.getvalue().splitlines()) == sorted(str(b.id) for b in late)
+
+
+def test_json_log_keeps_exception_through_queue():
+    """ Test qu'une exception journalisée via la file garde sa trace dans le champ `exception` des logs JSON """
+    log_queue = queue.SimpleQueue()
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    listener = QueueListener(log_queue, handler)
+    logger = logging.getLogger("library_management.test_json")
+    logger.propagate = False
+    logger.addHandler(TracebackQueueHandler(log_queue))
+    listener.start()
+    try:
+        try:
+            1 / 0
+        except ZeroDivisionError:
+            logger.exception("Échec du calcul %s", "test")
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    entry = json.loads(stream.getvalue())
+    assert entry["message"] == "Échec du calcul test"
+    assert entry["level"] == "ERROR"
+    assert "ZeroDivisionError" in entry["exception"]
@@ -0,0 +1,118 @@
+import pytest
+from flask_jwt_extended import create_access_token, decode_token
+from starlette.testclient import TestClient
+from app.app import create_app
+from app.asgi import create_asgi_app, create_access_token as create_async_token
+from app.models import User, Author, Book, Borrow
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+@pytest.fixture
+def flask_app():
+    """ Application Flask, pour vérifier la compatibilité des tokens """
+    app = create_app()
+    with app.app_context():
+        User.objects.delete()
+        Author.objects.delete()
+        Book.objects.delete()
+        Borrow.objects.delete()
+        yield app
+
+
+@pytest.fixture
+def client(flask_app):
+    """ Client de test de la variante ASGI """
+    with TestClient(create_asgi_app()) as client:
+        yield client
+
+
+def test_asgi_requires_jwt(client):
+    """ Test que les écritures exigent un token, avec les messages de flask_jwt_extended """
+    response = client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"})
+    assert response.status_code == 401
+    assert response.json()["msg"] == "Missing Authorization Header"
+
+
+def test_asgi_tokens_are_interchangeable(client, flask_app):
+    """ Test qu'un token émis par une variante est accepté par l'autre """
+    headers = {"Authorization": f"Bearer {create_access_token(identity='any')}"}
+    response = client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"}, headers=headers)
+    assert response.status_code == 201
+
+    assert decode_token(create_async_token("any"))["sub"] == "any"
+
+
+def test_asgi_register_login(client):
+    """ Test d'inscription et de connexion sur la variante ASGI """
+    user = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    assert client.post("/register", json=user).status_code == 201
+    assert client.post("/register", json=user).status_code == 400
+
+    response = client.post("/login", json=user)
+    assert response.status_code == 200
+    assert "access_token" in response.json()
+
+
+def test_asgi_books_and_borrow(client):
+    """ Test de la pagination des livres et de l'emprunt atomique sur la variante ASGI """
+    user = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    client.post("/register", json=user)
+    headers = {"Authorization": f"Bearer {client.post('/login', json=user).json()['access_token']}"}
+
+    author_id = client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"}, headers=headers).json()["id"]
+    ids = [
+        client.post("/books", json={"titre": f"Livre {i}", "auteur_id": author_id, "stock": 1}, headers=headers).json()["id"]
+        for i in range(3)
+    ]
+
+    response = client.get("/books?limit=2")
+    assert [b["_id"] for b in response.json()] == ids[:2]
+    response = client.get(f"/books?limit=2&cursor={response.headers['X-Next-Cursor']}")
+    assert [b["_id"] for b in response.json()] == ids[2:]
+    assert "X-Next-Cursor" not in response.headers
+
+    borrow = {"email": user["email"], "book_id": ids[0]}
+    response = client.post("/borrow", json=borrow, headers=headers)
+    assert response.status_code == 201
+    assert client.get(f"/books/{ids[0]}").json()["stock"] == 0
+    assert client.post("/borrow", json=borrow, headers=headers).status_code == 400
+
+    borrow_id = response.json()["borrow_id"]
+    assert client.delete(f"/borrow/{borrow_id}", headers=headers).status_code == 200
+    assert client.get(f"/books/{ids[0]}").json()["stock"] == 1
+    assert client.delete(f"/borrow/{borrow_id}", headers=headers).status_code == 404
+    assert client.get(f"/borrow/{borrow_id}").json()["date_retour"] is not None
+
+
+def test_asgi_logout_and_default_borrower(client):
+    """ Test de l'emprunt par l'utilisateur du token et de la révocation sur la variante ASGI """
+    user = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    client.post("/register", json=user)
+    headers = {"Authorization": f"Bearer {client.post('/login', json=user).json()['access_token']}"}
+    author_id = client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"}, headers=headers).json()["id"]
+    book_id = client.post("/books", json={"titre": "Livre", "auteur_id": author_id, "stock": 1}, headers=headers).json()["id"]
+
+    response = client.post("/borrow", json={"book_id": book_id}, headers=headers)
+    assert response.status_code == 201
+
+    assert client.post("/logout", headers=headers).status_code == 200
+    response = client.post("/borrow", json={"book_id": book_id}, headers=headers)
+    assert response.status_code == 401
+    assert response.json()["msg"] == "Token has been revoked"
+
+
+
+def test_asgi_borrow_with_token_without_email_claim(client):
+    """ Test qu'un token sans claim `email` (émis avant ce claim) emprunte pour l'utilisateur de son identité """
+    user = {"username": "testuser", "password": "testpass", "email": "admin@example.com"}
+    client.post("/register", json=user)
+    user_id = decode_token(client.post("/login", json=user).json()["access_token"])["sub"]
+    headers = {"Authorization": f"Bearer {create_access_token(identity=user_id)}"}
+    author_id = client.post("/authors", json={"nom": "Hugo", "prenom": "Victor"}, headers=headers).json()["id"]
+    book_id = client.post("/books", json={"titre": "Livre", "auteur_id": author_id, "stock": 1}, headers=headers).json()["id"]
+
+    response = client.post("/borrow", json={"book_id": book_id}, headers=headers)
+    assert response.status_code == 201
+    assert client.get(f"/borrow/{response.json()['borrow_id']}").json()["user"] == user_id
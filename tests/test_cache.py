@@ -0,0 +1,46 @@
+import time
+from app.cache import LRUCache, Cache
+
+
+def test_lru_hit_and_miss():
+    """ Vérifie le comptage des hits et des misses """
+    cache = LRUCache(max_entries=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_lru_eviction():
+    """ Vérifie que l'entrée la moins récemment utilisée est évincée """
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.stats()["evictions"] == 1
+
+
+def test_lru_expiration():
+    """ Vérifie qu'une entrée expirée n'est plus servie """
+    cache = LRUCache(max_entries=10, ttl=60)
+    cache.set("a", 1, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_cache_invalidate_namespace():
+    """ Vérifie que l'invalidation rend obsolètes les listes et l'élément ciblé """
+    cache = Cache(LRUCache())
+    assert cache.list("books", "page1", lambda: [1]) == [1]
+    assert cache.list("books", "page1", lambda: [2]) == [1]
+    assert cache.item("books", "42", lambda: {"titre": "A"}) == {"titre": "A"}
+
+    cache.invalidate("books", "42")
+    assert cache.list("books", "page1", lambda: [2]) == [2]
+    assert cache.item("books", "42", lambda: {"titre": "B"}) == {"titre": "B"}
@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+import pytest
+from app.app import create_app
+from app.metrics import Metrics, RequestStats, _request_stats, command_listener, registry
+from app.models import Author, Book
+import warnings
+
+warnings.filterwarnings("ignore", category=DeprecationWarning)
+
+
+@pytest.fixture
+def app():
+    """ Application Flask avec un registre de métriques vide """
+    app = create_app()
+    app.config["TESTING"] = True
+    registry.clear()
+    with app.app_context():
+        Author.objects.delete()
+        Book.objects.delete()
+        yield app
+
+
+def test_metrics_render_prometheus():
+    """ Test du format d'exposition Prometheus (bornes cumulées, somme, total) """
+    metrics = Metrics()
+    metrics.observe("http_request_duration_seconds", 0.003, endpoint="/books", method="GET")
+    metrics.observe("http_request_duration_seconds", 0.2, endpoint="/books", method="GET")
+    metrics.inc("http_requests_total", endpoint="/books", method="GET", status=200)
+
+    text = metrics.render()
+    assert "# TYPE http_request_duration_seconds histogram" in text
+    assert 'http_request_duration_seconds_bucket{endpoint="/books",method="GET",le="0.005"} 1' in text
+    assert 'http_request_duration_seconds_bucket{endpoint="/books",method="GET",le="+Inf"} 2' in text
+    assert 'http_request_duration_seconds_count{endpoint="/books",method="GET"} 2' in text
+    assert 'http_requests_total{endpoint="/books",method="GET",status="200"} 1' in text
+
+
+def test_command_listener_counts_per_request():
+    """ Test que l'écouteur pymongo attribue les commandes à la requête en cours """
+    token = _request_stats.set(RequestStats())
+    try:
+        for name in ("find", "find"):
+            command_listener.succeeded(SimpleNamespace(command_name=name, duration_micros=1500))
+        stats = _request_stats.get()
+    finally:
+        _request_stats.reset(token)
+    assert stats.commands == 2
+    assert stats.mongo_seconds == pytest.approx(0.003)
+
+
+def test_metrics_endpoint(app):
+    """ Test de l'exposition des histogrammes par endpoint sur /metrics """
+    client = app.test_client()
+    response = client.get("/books")
+    assert "Server-Timing" in response.headers
+
+    text = client.get("/metrics").get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="/books",method="GET"} 1' in text
+    assert 'http_request_mongo_commands_count{endpoint="/books"} 1' in text
+
+
+def test_profile_opt_in(app):
+    """ Test que `?profile=1` n'est actif que si PROFILING est activé """
+    client = app.test_client()
+    assert client.get("/books?profile=1").is_json
+
+    app.config["PROFILING"] = True
+    response = client.get("/books?profile=1")
+    assert response.mimetype == "text/plain"
+    assert "function calls" in response.get_data(as_text=True)
@@ -0,0 +1,19 @@
+import json
+import subprocess
+import sys
+
+CHECK = """
+import json, logging, sys
+import app.app
+print(json.dumps({
+    "handlers": len(logging.getLogger("library_management").handlers),
+    "pydantic": "pydantic" in sys.modules,
+    "connections": len(__import__("mongoengine.connection").connection._connections),
+}))
+"""
+
+
+def test_import_has_no_side_effects():
+    """ Vérifie qu'importer l'application n'installe aucun handler, ni connexion, ni dépendance lourde """
+    output = subprocess.run([sys.executable, "-c", CHECK], capture_output=True, text=True, check=True).stdout
+    assert json.loads(output) == {"handlers": 0, "pydantic": False, "connections": 0}
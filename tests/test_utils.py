@@ -1,6 +1,8 @@
 import pytest
-from bson import ObjectId
-from app.utils import serialize_doc
+from datetime import datetime
+from bson import DBRef, ObjectId
+from app.models import Book, Borrow, User
+from app.utils import serialize_doc, serialize_raw, encode_cursor, decode_cursor, keyset_after
 
 def test_serialize_objectid():
     """ Vérifie la conversion d'un ObjectId en chaîne """
@@ -35,3 +37,49 @@ def test_serialize_primitive():
     assert serialize_doc("hello") == "hello"
     assert serialize_doc(3.14) == 3.14
     assert serialize_doc(True) == True
+
+def test_serialize_datetime_and_dbref():
+    """ Vérifie la conversion des dates et des DBRef """
+    obj_id = ObjectId()
+    assert serialize_doc(datetime(2025, 3, 1, 12, 30)) == "2025-03-01T12:30:00"
+    assert serialize_doc(DBRef("book", obj_id)) == str(obj_id)
+
+def test_serialize_document():
+    """ Vérifie la sérialisation d'un Document sans requête de déréférencement """
+    auteur_id = ObjectId()
+    book = Book(id=ObjectId(), titre="1984", auteur=DBRef("author", auteur_id), stock=7)
+    assert serialize_doc(book) == {"_id": str(book.id), "titre": "1984", "auteur": str(auteur_id), "stock": 7, "en_pret": 0}
+
+def test_serialize_raw_with_field_plan():
+    """ Vérifie la sérialisation de documents BSON bruts selon le plan du modèle """
+    raw = {"_id": ObjectId(), "user": ObjectId(), "book": ObjectId(),
+           "date_emprunt": datetime(2025, 3, 1), "date_retour": None}
+    item = serialize_raw(Borrow, [raw])[0]
+    assert item["_id"] == str(raw["_id"])
+    assert item["book"] == str(raw["book"])
+    assert item["date_emprunt"] == "2025-03-01T00:00:00"
+    assert item["date_retour"] is None
+
+def test_serialize_raw_hides_password():
+    """ Vérifie que le mot de passe haché n'est jamais sérialisé """
+    raw = {"_id": ObjectId(), "username": "alice", "email": "a@example.com", "password": "pbkdf2:..."}
+    assert "password" not in serialize_raw(User, [raw])[0]
+
+def test_cursor_roundtrip():
+    """ Vérifie qu'un curseur encodé se décode en valeurs identiques """
+    obj_id = ObjectId()
+    assert decode_cursor(encode_cursor([obj_id])) == [obj_id]
+
+def test_decode_invalid_cursor():
+    """ Vérifie qu'un curseur corrompu lève une ValueError """
+    with pytest.raises(ValueError):
+        decode_cursor("pas-un-curseur")
+
+def test_keyset_after_compound_sort():
+    """ Vérifie la condition de page suivante pour une clé de tri composée """
+    last_id = ObjectId()
+    assert keyset_after([("date", -1), ("_id", -1)], ["d", last_id]) == {
+        "$or": [{"date": {"$lt": "d"}}, {"date": "d", "_id": {"$lt": last_id}}]
+    }
+    with pytest.raises(ValueError):
+        keyset_after([("date", -1), ("_id", -1)], ["d"])
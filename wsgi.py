@@ -0,0 +1,8 @@
+"""
+Point d'entrée WSGI de production.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+from app.app import create_app
+
+app = create_app()